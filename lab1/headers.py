@@ -0,0 +1,106 @@
+import socket
+import struct
+from typing import Optional
+
+ETH_TYPE_IP = 0x0800
+ETH_TYPE_ARP = 0x0806
+ETH_TYPE_8021Q = 0x8100
+ETH_TYPE_LLDP = 0x88CC
+
+_ETH_HEADER_LEN = 14
+_VLAN_TAG_LEN = 4
+_ARP_LEN = 28
+_IPV4_MIN_LEN = 20
+_UNPACK_ETH_TYPE = struct.Struct("!H").unpack_from
+
+
+class Headers:
+    """The addresses in the headers of a packet, read straight from its bytes
+    at fixed offsets (Ethernet, an optional VLAN tag, then ARP or IPv4)
+    instead of parsing the whole packet with ryu.lib.packet.
+
+    Nothing is copied up front: each field is read from the buffer when it
+    is asked for. Fields of a protocol the packet does not carry are None.
+    """
+    __slots__ = ("_view", "ethertype", "_offset")
+
+    def __init__(self, view: memoryview, ethertype: int, offset: int) -> None:
+        self._view = view
+        self.ethertype = ethertype
+        # Start of the header after Ethernet (and VLAN)
+        self._offset = offset
+
+    @property
+    def eth_dst(self) -> str:
+        return _mac(self._view, 0)
+
+    @property
+    def eth_src(self) -> str:
+        return _mac(self._view, 6)
+
+    @property
+    def is_arp(self) -> bool:
+        return self.ethertype == ETH_TYPE_ARP
+
+    @property
+    def is_ipv4(self) -> bool:
+        return self.ethertype == ETH_TYPE_IP
+
+    @property
+    def arp_opcode(self) -> Optional[int]:
+        if not self.is_arp:
+            return None
+        return _UNPACK_ETH_TYPE(self._view, self._offset + 6)[0]
+
+    @property
+    def arp_src_mac(self) -> Optional[str]:
+        if not self.is_arp:
+            return None
+        return _mac(self._view, self._offset + 8)
+
+    @property
+    def src_ip(self) -> Optional[str]:
+        """Sender IP of an ARP packet or source of an IPv4 packet."""
+        if self.is_arp:
+            return _ip(self._view, self._offset + 14)
+        if self.is_ipv4:
+            return _ip(self._view, self._offset + 12)
+        return None
+
+    @property
+    def dst_ip(self) -> Optional[str]:
+        """Target IP of an ARP packet or destination of an IPv4 packet."""
+        if self.is_arp:
+            return _ip(self._view, self._offset + 24)
+        if self.is_ipv4:
+            return _ip(self._view, self._offset + 16)
+        return None
+
+
+def decode(data) -> Optional[Headers]:
+    """The Headers of the packet in data (bytes or another buffer, e.g. the
+    data of a packet-in), None if it is too short for its headers.
+    """
+    view = memoryview(data)
+    if len(view) < _ETH_HEADER_LEN:
+        return None
+    ethertype = _UNPACK_ETH_TYPE(view, 12)[0]
+    offset = _ETH_HEADER_LEN
+    if ethertype == ETH_TYPE_8021Q:
+        if len(view) < offset + _VLAN_TAG_LEN:
+            return None
+        ethertype = _UNPACK_ETH_TYPE(view, offset + 2)[0]
+        offset += _VLAN_TAG_LEN
+    if ethertype == ETH_TYPE_ARP and len(view) < offset + _ARP_LEN:
+        return None
+    if ethertype == ETH_TYPE_IP and (len(view) < offset + _IPV4_MIN_LEN or view[offset] >> 4 != 4):
+        return None
+    return Headers(view, ethertype, offset)
+
+
+def _mac(view: memoryview, offset: int) -> str:
+    return "%02x:%02x:%02x:%02x:%02x:%02x" % tuple(view[offset:offset + 6])
+
+
+def _ip(view: memoryview, offset: int) -> str:
+    return socket.inet_ntoa(view[offset:offset + 4])
@@ -19,9 +19,8 @@ from ryu.controller import ofp_event
 from ryu.controller.handler import CONFIG_DISPATCHER, MAIN_DISPATCHER
 from ryu.controller.handler import set_ev_cls
 from ryu.ofproto import ofproto_v1_3
-from ryu.lib.packet import packet
-from ryu.lib.packet import ethernet
-from ryu.lib.packet import ether_types
+
+from headers import ETH_TYPE_LLDP, decode
 
 
 class SimpleSwitch13(app_manager.RyuApp):
@@ -77,15 +76,14 @@ class SimpleSwitch13(app_manager.RyuApp):
         parser = datapath.ofproto_parser
         in_port = msg.match['in_port']
 
-        pkt = packet.Packet(msg.data)
-        eth = pkt.get_protocols(ethernet.ethernet)[0]
-
-        if eth.ethertype == ether_types.ETH_TYPE_LLDP:
+        # Read the addresses straight from the packet, without parsing all of it
+        headers = decode(msg.data)
+        if headers is None or headers.ethertype == ETH_TYPE_LLDP:
             # ignore lldp packet
             return
         
-        dst = eth.dst
-        src = eth.src
+        dst = headers.eth_dst
+        src = headers.eth_src
 
         # If IPv6 multicast, ignore packet
         if (dst.startswith("33:33")):
@@ -95,18 +93,18 @@ class SimpleSwitch13(app_manager.RyuApp):
         self.mac_to_port.setdefault(dpid, {})
 
         # If incoming frame is ARP, instead of IP, simply flood
-        if eth.ethertype == ether_types.ETH_TYPE_ARP:
+        if headers.is_arp:
             # print("ARP packet discovered, flooding..")
             out_port = ofproto.OFPP_FLOOD
         else:
             # learn a mac address to avoid FLOOD next time.
             self.mac_to_port[dpid][src] = in_port
-            self.logger.info("IP packet in \tsw: %s src: %s dst: %s in_port: %s", dpid, src, dst, in_port)
+            self.logger.debug("IP packet in \tsw: %s src: %s dst: %s in_port: %s", dpid, src, dst, in_port)
             if dst in self.mac_to_port[dpid]:
-                print(f"dst {dst} that is in mac_to_port with port {in_port}")
+                self.logger.debug("dst %s is in mac_to_port with port %s", dst, self.mac_to_port[dpid][dst])
                 out_port = self.mac_to_port[dpid][dst]
             else:
-                print("unknown dst, flooding..")
+                self.logger.debug("unknown dst, flooding..")
                 out_port = ofproto.OFPP_FLOOD
 
 
@@ -123,7 +121,7 @@ class SimpleSwitch13(app_manager.RyuApp):
                 return
             else:
                 self.add_flow(datapath, 1, match, actions)
-            print(f"Added flow in_port|dst_mac->out_port = {in_port}|{dst}->{out_port}")
+            self.logger.debug("Added flow in_port|dst_mac->out_port = %s|%s->%s", in_port, dst, out_port)
         data = None
         if msg.buffer_id == ofproto.OFP_NO_BUFFER:
             data = msg.data
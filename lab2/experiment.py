@@ -0,0 +1,62 @@
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import topo
+
+
+def instance_seeds(seed: int, n_instances: int) -> list:
+    """Deterministic, well separated seeds for n_instances from one base seed."""
+    return [int(x) for x in np.random.SeedSequence(seed).generate_state(n_instances)]
+
+
+def _run_instance(args):
+    """Worker: build one random Jellyfish instance and return metric(instance) as an array."""
+    metric, seed, num_servers, num_switches, num_ports = args
+    random.seed(seed)
+    jf_topo = topo.Jellyfish(num_servers, num_switches, num_ports)
+    return np.asarray(metric(jf_topo))
+
+
+def _pad(result, length, pad_start):
+    """Zero-pad the last axis of result to length, at the start or at the end."""
+    missing = length - result.shape[-1]
+    widths = [(0, 0)] * (result.ndim - 1) + [(missing, 0) if pad_start else (0, missing)]
+    return np.pad(result, widths)
+
+
+def run_jellyfish_instances(metric, n_instances, num_servers, num_switches, num_ports,
+                            seed=0, max_workers=None, pad_start=False):
+    """Average a metric over independent random Jellyfish instances, in parallel.
+
+    Every instance is generated and measured in a worker process with its own seed
+    (see instance_seeds), so results only depend on seed and not on scheduling.
+    Workers only send back the metric array, which is summed here.
+
+    Args:
+        metric (callable): module level function taking a topology and returning
+            an array, e.g. path_lengths.path_length_histogram
+        n_instances (int): number of Jellyfish instances to average over
+        num_servers, num_switches, num_ports: Jellyfish parameters
+        seed (int): base seed
+        max_workers (int): number of worker processes, defaults to the number of cores
+        pad_start (bool): results of unequal length are zero-padded on their last
+            axis; at the start if set (e.g. for sorted rank arrays), else at the end
+
+    Returns:
+        np.ndarray: element-wise mean of the metric over all instances
+    """
+    jobs = [(metric, s, num_servers, num_switches, num_ports) for s in instance_seeds(seed, n_instances)]
+    max_workers = max_workers or os.cpu_count() or 1
+
+    total = None
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        for result in executor.map(_run_instance, jobs):
+            result = result.astype(np.float64)
+            if total is None:
+                total = result
+                continue
+            length = max(total.shape[-1], result.shape[-1])
+            total = _pad(total, length, pad_start) + _pad(result, length, pad_start)
+    return total / n_instances
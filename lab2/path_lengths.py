@@ -0,0 +1,106 @@
+import numpy as np
+from topo import NodeType
+
+# Number of BFS sources that are expanded together, bounds the memory used per level
+# to BLOCK_SIZE * (2 * number of switch links) booleans.
+BLOCK_SIZE = 256
+
+
+def switch_graph(topology):
+    """Extract the switch-level graph of a topology as NumPy arrays.
+
+    Returns:
+        tuple: (offsets, neighbors, servers_per_switch). Switches are numbered
+            0 .. S-1 in node id order; offsets/neighbors is the CSR adjacency of
+            the switch-to-switch links and servers_per_switch[s] the number of
+            servers attached to switch s.
+    """
+    graph = topology.graph
+    node_types = np.frombuffer(bytes(graph.node_types), dtype=np.uint8)
+    is_switch = node_types == NodeType.SWITCH.value
+    # Position of every node among the switches, -1 for servers
+    switch_pos = np.full(len(node_types), -1, dtype=np.int64)
+    switch_pos[is_switch] = np.arange(int(is_switch.sum()))
+    num_switches = int(is_switch.sum())
+
+    alive = np.frombuffer(bytes(graph.alive), dtype=np.uint8).astype(bool)
+    src = np.frombuffer(graph.edge_src, dtype=np.int64)[alive]
+    dst = np.frombuffer(graph.edge_dst, dtype=np.int64)[alive]
+    src_pos = switch_pos[src]
+    dst_pos = switch_pos[dst]
+
+    # Server access links: count the servers hanging off each switch
+    access = (src_pos < 0) != (dst_pos < 0)
+    access_switch = np.where(src_pos[access] >= 0, src_pos[access], dst_pos[access])
+    servers_per_switch = np.bincount(access_switch, minlength=num_switches)
+
+    # Switch links, stored in both directions and sorted by source switch
+    core = (src_pos >= 0) & (dst_pos >= 0)
+    heads = np.concatenate([src_pos[core], dst_pos[core]])
+    tails = np.concatenate([dst_pos[core], src_pos[core]])
+    order = np.argsort(heads, kind="stable")
+    neighbors = tails[order]
+    offsets = np.zeros(num_switches + 1, dtype=np.int64)
+    np.cumsum(np.bincount(heads, minlength=num_switches), out=offsets[1:])
+    return offsets, neighbors, servers_per_switch
+
+
+def switch_distances(offsets, neighbors, sources):
+    """Multi-source BFS on the switch-level graph.
+
+    Args:
+        offsets, neighbors: CSR adjacency as returned by switch_graph
+        sources (np.ndarray): switch positions to start a BFS from
+
+    Returns:
+        np.ndarray: len(sources) x S matrix of hop counts, -1 if unreachable
+    """
+    num_switches = len(offsets) - 1
+    dist = np.full((len(sources), num_switches), -1, dtype=np.int32)
+    # reduceat needs the start of every non-empty neighbor segment
+    has_neighbors = offsets[1:] > offsets[:-1]
+    starts = offsets[:-1][has_neighbors]
+
+    for begin in range(0, len(sources), BLOCK_SIZE):
+        block = sources[begin:begin + BLOCK_SIZE]
+        rows = np.arange(len(block))
+        frontier = np.zeros((len(block), num_switches), dtype=bool)
+        frontier[rows, block] = True
+        visited = frontier.copy()
+        block_dist = dist[begin:begin + len(block)]
+        block_dist[frontier] = 0
+
+        level = 0
+        while frontier.any() and len(starts):
+            level += 1
+            # A switch is reached if any of its neighbors is in the frontier
+            reached = np.zeros_like(frontier)
+            reached[:, has_neighbors] = np.logical_or.reduceat(frontier[:, neighbors], starts, axis=1)
+            frontier = reached & ~visited
+            visited |= frontier
+            block_dist[frontier] = level
+    return dist
+
+
+def path_length_histogram(topology):
+    """Count the server pairs per shortest path length (in hops, server to server).
+
+    Server to server distances are derived from the switch distance matrix plus the
+    two access links, so only switches with servers are used as BFS sources.
+    Unordered pairs of distinct servers are counted once; unreachable pairs are left out.
+
+    Returns:
+        np.ndarray: counts, where counts[length] is the number of server pairs
+    """
+    offsets, neighbors, servers_per_switch = switch_graph(topology)
+    with_servers = np.flatnonzero(servers_per_switch)
+    dist = switch_distances(offsets, neighbors, with_servers)[:, with_servers]
+    counts = servers_per_switch[with_servers].astype(np.float64)
+
+    reachable = dist >= 0
+    # Every pair of switches (a, b) contributes counts[a] * counts[b] ordered server pairs
+    pair_weights = np.outer(counts, counts)
+    histogram = np.bincount(dist[reachable] + 2, weights=pair_weights[reachable])
+    # The diagonal includes each server paired with itself, remove those and halve the ordered pairs
+    histogram[2] -= counts.sum()
+    return np.rint(histogram / 2).astype(np.int64)
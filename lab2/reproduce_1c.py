@@ -1,10 +1,9 @@
 # License for the specific language governing permissions and limitations
 # under the License.
 
-from typing import Sequence
-from topo import Node
+from path_lengths import path_length_histogram
+from experiment import run_jellyfish_instances
 import topo
-import sys
 import pandas as pd
 import matplotlib.pyplot as plt
 
@@ -18,101 +17,27 @@ num_ports = 14
 # num_switches = 20
 # num_ports = 4
 
-ft_topo = topo.Fattree(num_ports)
-jf_topo = topo.Jellyfish(num_servers, num_switches, num_ports)
+# Number of random Jellyfish instances to average over
+n_instances = 10
 
 # TODO: code for reproducing Figure 1(c) in the jellyfish paper
 
-def dijkstra(graph: Sequence[Node], origin_node: Node):
-    """Calculate the shortest path between all possible pairs between origin_node and all other
-    nodes in the graph.
-    Args:
-        graph (Sequence[Node]): The graph to search for shortest path pairs. origin_node should be in this graph.
-        origin_node (Node): Node to start from, i.e. the node that is always part of each pair
-    Returns:
-        dict: Keys are the destination from the origin_node. Values are the node object and the distance in hops. 
-            Example: {"10.0.0.1": {"node": .., "dist": 2}, ...}
-    """
-    visited = {}
-    unvisited = {}
-
-    # init unvisited
-    for node in graph:
-        unvisited[node.id] = {"node": node, "dist": sys.maxsize}
-    unvisited[origin_node.id] = {"node": origin_node, "dist": 0}
-
-    while (len(unvisited) != 0):
-        min_key = min(unvisited, key=lambda key: unvisited[key]["dist"])
-
-        # Move current node from unvisited to visited
-        visited[min_key] = unvisited[min_key]
-        unvisited.pop(min_key)
-
-        neighbor = visited[min_key]["node"]
-        dist = visited[min_key]["dist"]
-        # Update edges' dists
-        for edge in neighbor.edges:
-            # Find the DijkNode in unvisited that corresponds to the neighbor attached to edge
-            other_node = edge.lnode if edge.lnode.id != neighbor.id else edge.rnode
-
-            unvisited_neighbor = unvisited.get(other_node.id)
-            if (unvisited_neighbor is None): continue
-
-            new_dist = dist + 1
-            if (new_dist < unvisited_neighbor["dist"]):
-                unvisited[other_node.id]["dist"] = new_dist
-
-    return visited
-
-
 def get_count_per_path(topo):
-    """Returns the unique set of pairs per path length.
+    """Returns the number of unique server pairs per path length.
     Returns:
-        dict: {
-            [path_length: int]: set(
-                    [1.1.1.1, 1.1.1.2], 
-                    [1.1.1.1, 1.1.1.3], 
-                    ...
-                )
-            }
-    """
-    graph = topo.servers + topo.switches
-
-    pairs = {} # in the form ["path_length": "count"]
-    for i in range(1, 8):
-        pairs[i] = set() # ensure that only unique pairs are registered
-
-    for source_server in topo.servers:
-        distances = dijkstra(graph, source_server) # get shortest paths for server
-        # format: {"10.0.0.1": {"node": .., "dist": 2}}
-
-        # Add only paths from source_server to another server
-        for dest_server in topo.servers:
-            if source_server == dest_server: 
-                continue
-            if distances[dest_server.id]["dist"] < 2:
-                continue
-            dist = distances[dest_server.id]["dist"]
-            pair = ((source_server.id, dest_server.id) 
-                if source_server.id < dest_server.id 
-                else (dest_server.id, source_server.id))
-            pairs[dist].update([pair])
-    return {key: len(value) for key, value in pairs.items()}
-
-
-def get_avg_count_per_path(topo, n_times):
-    """Run get_count_per_path n_times and return the average.
+        dict: {[path_length: int]: [count: int]}
     """
-    sum_path_lengths = {} # {n_path: n_pairs}
+    histogram = path_length_histogram(topo)
+    return {length: int(count) for length, count in enumerate(histogram) if length >= 1}
 
-    for _ in range(n_times):
-        pairs = get_count_per_path(topo)
-        for n_paths, n_pairs in pairs.items():
-            if (sum_path_lengths.get(n_paths) is None):
-                sum_path_lengths[n_paths] = 0
-            sum_path_lengths[n_paths] += n_pairs
 
-    return {key:sum_n_pairs / n_times for key, sum_n_pairs in sum_path_lengths.items()}
+def get_avg_count_per_path(n_times, seed=0):
+    """Average get_count_per_path over n_times random Jellyfish instances,
+    generated and measured in parallel worker processes.
+    """
+    histogram = run_jellyfish_instances(
+        path_length_histogram, n_times, num_servers, num_switches, num_ports, seed=seed)
+    return {length: float(count) for length, count in enumerate(histogram) if length >= 1}
 
 
 def normalize(path_count: dict, total_pairs: int) -> dict:
@@ -129,18 +54,11 @@ def normalize(path_count: dict, total_pairs: int) -> dict:
     return result
 
 
-# Get list of all server pairs in topology (should be same for both topologies)
+# Number of server pairs in topology (should be same for both topologies)
 # This excludes the pair (x, x), and it also assumes that (x, y) == (y, x)
-def get_server_pairs(topology):
-    pairlist = []
-    for i in range(len(topology.servers)):
-        for j in range(i, len(topology.servers)):
-            pair = (i, j) if i < j else (j, i)
-            if i != j:
-                pairlist.append(pair)
-    # remove all duplicate pairs
-    pairlist = list(dict.fromkeys(pairlist))
-    return pairlist
+def count_server_pairs(topology):
+    num_servers = len(topology.servers)
+    return num_servers * (num_servers - 1) // 2
 
 
 def draw_histogram(jf, ft, axis=[2,3,4,5,6]) :
@@ -180,11 +98,11 @@ def to_plt_data(topo_data):
 
 
 def run(ft_topo, jf_topo):
-    total_ft_pairs = len(get_server_pairs(ft_topo))
-    total_jf_pairs = len(get_server_pairs(jf_topo))
+    total_ft_pairs = count_server_pairs(ft_topo)
+    total_jf_pairs = count_server_pairs(jf_topo)
 
     ft_data = get_count_per_path(ft_topo)
-    jf_data = get_avg_count_per_path(jf_topo, 10)
+    jf_data = get_avg_count_per_path(n_instances)
 
     ft_normalized = normalize(ft_data, total_ft_pairs)
     jf_normalized = normalize(jf_data, total_jf_pairs)
@@ -202,4 +120,7 @@ def run(ft_topo, jf_topo):
     #     .from_dict(jf_plottable, orient="index")
     #     .to_csv("jellyfish.csv", header=False))
 
-run(ft_topo, jf_topo)
\ No newline at end of file
+if __name__ == "__main__":
+    ft_topo = topo.Fattree(num_ports)
+    jf_topo = topo.Jellyfish(num_servers, num_switches, num_ports)
+    run(ft_topo, jf_topo)
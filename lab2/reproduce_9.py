@@ -17,48 +17,25 @@
 
 import topo
 import random
+import numpy as np
 import matplotlib.pyplot as plt
+from experiment import run_jellyfish_instances
 
 # Setup for Jellyfish
 num_servers = 686
 num_switches = 245
 num_ports = 14
 
-jf_topo = topo.Jellyfish(num_servers, num_switches, num_ports)
-
 # TODO: code for reproducing Figure 9 in the jellyfish paper
-# Set ITERATIONS to 10 for an average
+# Set ITERATIONS to 10 for an average, every iteration uses its own random Jellyfish instance
 ITERATIONS = 1
 
-tp = topo.Paths(jf_topo)
-
-# creating a dict of all switch - switch connections that are connected with an edge.
-switch_dict = dict()
-for switch in jf_topo.switches:
-    for edge in switch.edges:
-        other_switch = edge.lnode if edge.lnode != switch else edge.rnode
-        # omitting all of the switch-server connections. Only inter-switch connections are counted in figure 9
-        if other_switch.type == "server":
-            continue
-        switch_dict[(switch, other_switch)] = 0
-        switch_dict[(other_switch, switch)] = 0
-
-ecmp8_switch_dict = switch_dict.copy()
-ecmp64_switch_dict = switch_dict.copy()
-
+SOURCE = 0
+DESTINATION = 1
 
-def extract_switch_pairs(path):
-    switchpairs = []
-    for i in range(1, len(path)-2): # omitting the servers at the start and the end
-        switchpairs.append((path[i], path[i+1]))
-    return switchpairs
 
-def create_fig(ksp_switch_dict, ecmp8_switch_dict, ecmp64_switch_dict):
-    other = ksp_switch_dict.keys()
-    ksp = sorted(ksp_switch_dict.values())
-    ecmp8 = sorted([ecmp8_switch_dict[one] for one in other])
-    ecmp64 = sorted([ecmp64_switch_dict[one] for one in other])
-    x = list(range(0, len(other)))
+def create_fig(ksp, ecmp8, ecmp64):
+    x = list(range(0, len(ksp)))
 
     plt.figure()
     plt.plot(x, ksp, label='8 Shortest Paths')
@@ -73,47 +50,35 @@ def create_fig(ksp_switch_dict, ecmp8_switch_dict, ecmp64_switch_dict):
     plt.show()
 
 
+def count_paths_per_link(jf_topo):
+    """Route a random server permutation over jf_topo and count, per directed switch-to-switch
+    link, the number of 8-shortest, 8-way ECMP and 64-way ECMP paths it is on.
 
-SOURCE = 0
-DESTINATION = 1
+    Returns:
+        np.ndarray: 3 x L array with the sorted counts for ksp, ecmp8 and ecmp64
+    """
+    tp = topo.Paths(jf_topo)
 
-# Create the pairs for multiple operations
-for _ in range(ITERATIONS):
     # make random permutation of server pairs
-    server_pairs = []
-    all_servers = jf_topo.servers.copy()
-
+    all_servers = [server.index for server in jf_topo.servers]
     random.shuffle(all_servers)
-    for i in range(0, len(all_servers) - 1, 2):
-        server_pairs.append([all_servers[i], all_servers[i + 1]])
-
-    # Create paths between source and destination of the server pairs
-    # And count all the links that are used by the paths.
-    for server_pair in server_pairs:
-        ksp = tp.k_shortest_paths(server_pair[SOURCE], server_pair[DESTINATION], 8)
-        ecmp64 = tp.n_way_ecmp(server_pair[SOURCE], server_pair[DESTINATION], 64)
-        ecmp8 = ecmp64[:8]
-
-        for path in ksp:
-            pairs = extract_switch_pairs(path)
-            for pair in pairs:
-                switch_dict[pair] += 1
-
-        for path in ecmp8:
-            pairs = extract_switch_pairs(path)
-            for pair in pairs:
-                ecmp8_switch_dict[pair] += 1
-
-        for path in ecmp64:
-            pairs = extract_switch_pairs(path)
-            for pair in pairs:
-                ecmp64_switch_dict[pair] += 1
-
-# Dividing all values by the ITERATIONS to create the average.
-switch_dict = {k: v / ITERATIONS for k, v in switch_dict.items()}
-ecmp8_switch_dict = {k: v / ITERATIONS for k, v in ecmp8_switch_dict.items()}
-ecmp64_switch_dict = {k: v / ITERATIONS for k, v in ecmp64_switch_dict.items()}
-
-# Plotting the graph
-create_fig(switch_dict, ecmp8_switch_dict, ecmp64_switch_dict)
-
+    server_pairs = list(zip(all_servers[SOURCE::2], all_servers[DESTINATION::2]))
+
+    # Count the paths per directed link for all server pairs, only inter-switch links are ranked in figure 9
+    loads = tp.link_load(server_pairs, [
+        (topo.RoutingScheme.K_SHORTEST, 8),
+        (topo.RoutingScheme.ECMP, 8),
+        (topo.RoutingScheme.ECMP, 64),
+    ])
+    return np.array([tp.link_ranks(load) for load in loads])
+
+
+if __name__ == "__main__":
+    # Every iteration runs on its own Jellyfish instance in a worker process, the
+    # sorted link counts are averaged per rank. Instances can differ slightly in
+    # their number of links, so the rank arrays are aligned at the most used link.
+    ksp, ecmp8, ecmp64 = run_jellyfish_instances(
+        count_paths_per_link, ITERATIONS, num_servers, num_switches, num_ports, pad_start=True)
+
+    # Plotting the graph
+    create_fig(ksp, ecmp8, ecmp64)
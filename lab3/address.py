@@ -1,5 +1,8 @@
+from functools import lru_cache
+
+
 class Address:
-    """Represents an address (e.g. 10.0.1.1/24, or 10.0.1.1) and allows you to 
+    """Represents an address (e.g. 10.0.1.1/24, or 10.0.1.1) and allows you to
     conveniently access portions of it.
 
     Usage:
@@ -7,36 +10,42 @@ class Address:
 
     addr.raw        = 10.0.1.1/24
     addr.mask       = 24
-    addr.octets     = [10, 0, 0, 1]
+    addr.octets     = ("10", "0", "1", "1")
+    addr.value      = 0x0A000101 (the address as a 32-bit integer)
+    addr.prefix_len = 24
 
     # Note mask being an empty string
     addr = Address("10.0.1.1")
     addr.mask       = ""
+    addr.prefix_len = -1
+
+    Addresses are immutable and interned: parsing the same string again returns
+    the same object from an LRU cache, so they are cheap to create in lookups.
     """
-    def __init__(self, addr_string: str) -> None:
-        split = addr_string.split("/")
-        # 10.0.1.1/24
-        self.raw = addr_string
-        # 24
-        self.mask = split[1] if len(split) == 2 else ""
-        # [10, 0, 1, 1]
-        self.octets = split[0].split(".")
-
-    def is_host_address(self, k: int):
-        if (self.octets[1] != str(k) and int(self.octets[3]) >= 2):
-            return True
-
-    def is_core_address(self):
-        if (self.octets[1] == str(4)):
-            return True
-        
-    def is_pod_address(self, k):
-        return not self.is_host_address(k) and not self.is_core_address()
-
-    def is_edge_node_address(self, k):
-        return self.is_pod_address(k) and int(self.octets[2]) < k/2
-
-    def is_aggr_node_address(self, k):
+    __slots__ = ("raw", "mask", "octets", "value", "prefix_len")
+
+    def __new__(cls, addr_string: str) -> "Address":
+        return _intern(addr_string)
+
+    @classmethod
+    def from_int(cls, value: int, prefix_len: int = -1) -> "Address":
+        """The address for a 32-bit integer value, with a prefix length if not -1."""
+        octets = ".".join(str((value >> shift) & 0xFF) for shift in (24, 16, 8, 0))
+        return _intern(octets if prefix_len < 0 else f"{octets}/{prefix_len}")
+
+    def is_host_address(self, k: int) -> bool:
+        return ((self.value >> 16) & 0xFF) != k and (self.value & 0xFF) >= 2
+
+    def is_core_address(self, k: int) -> bool:
+        return ((self.value >> 16) & 0xFF) == k
+
+    def is_pod_address(self, k) -> bool:
+        return not self.is_host_address(k) and not self.is_core_address(k)
+
+    def is_edge_node_address(self, k) -> bool:
+        return self.is_pod_address(k) and ((self.value >> 8) & 0xFF) < k/2
+
+    def is_aggr_node_address(self, k) -> bool:
         return self.is_pod_address(k) and not self.is_edge_node_address(k)
 
     def matches(self, other_address, mode: str = "left-handed") -> bool:
@@ -60,31 +69,82 @@ class Address:
                 it will match from left to right or right to left.
 
         Returns:
-            bool: whether there is a match, based on mask of the other
+            bool: whether there is a match, based on mask of the other.
+                False if the other has no mask.
         """
-        mask = other_address.mask
-        match_oct_1 = other_address.octets[0] == self.octets[0]
-        match_oct_2 = other_address.octets[1] == self.octets[1]
-        match_oct_3 = other_address.octets[2] == self.octets[2]
-        match_oct_4 = other_address.octets[3] == self.octets[3]
-
-        if (mask == "24"):
-            if (mode == "left-handed" and match_oct_1 and match_oct_2 and match_oct_3):
-                return True
-            elif (mode == "right-handed" and match_oct_4 and match_oct_2 and match_oct_3):
-                return True
-        elif (mask == "16"):
-            if (mode == "left-handed" and match_oct_1 and match_oct_2):
-                return True
-            elif (mode == "right-handed" and match_oct_3 and match_oct_4):
-                return True
-        elif (mask == "8"):
-            if (mode == "left-handed" and match_oct_1):
-                return True
-            elif (mode == "right-handed" and match_oct_4):
-                return True
-        else:
+        if other_address.prefix_len < 0:
             return False
+        return (self.value ^ other_address.value) & bit_mask(other_address.prefix_len, mode) == 0
+
+    @staticmethod
+    def match_many(values, other_address, mode: str = "left-handed"):
+        """Vectorized matches: which of the addresses in values (32-bit integers,
+        e.g. an array('I') or a NumPy array) match other_address.
+
+        Returns:
+            a NumPy boolean array if values is a NumPy array, else a list of bools
+        """
+        if other_address.prefix_len < 0:
+            # Without mask nothing matches
+            mask, target = 0, 1
+        else:
+            mask = bit_mask(other_address.prefix_len, mode)
+            target = other_address.value & mask
+        if hasattr(values, "dtype"):
+            return (values & mask) == target
+        return [(value & mask) == target for value in values]
+
+    def __setattr__(self, name, value) -> None:
+        # Interned objects are shared by everyone who parsed the same string
+        raise AttributeError(f"Address is immutable, cannot set {name}")
+
+    def __delattr__(self, name) -> None:
+        raise AttributeError(f"Address is immutable, cannot delete {name}")
+
+    def __int__(self) -> int:
+        return self.value
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, Address):
+            return NotImplemented
+        return self.value == other.value and self.prefix_len == other.prefix_len
+
+    def __hash__(self) -> int:
+        return hash((self.value, self.prefix_len))
+
+    def __repr__(self) -> str:
+        return f"Address({self.raw!r})"
 
     def __str__(self) -> str:
-        return self.raw
\ No newline at end of file
+        return self.raw
+
+
+@lru_cache(maxsize=None)
+def bit_mask(prefix_len: int, mode: str = "left-handed") -> int:
+    """32-bit mask with prefix_len one bits, the high bits for "left-handed"
+    and the low bits for "right-handed".
+    """
+    ones = (1 << prefix_len) - 1
+    return ones << (32 - prefix_len) if mode == "left-handed" else ones
+
+
+@lru_cache(maxsize=1 << 16)
+def _intern(addr_string: str) -> Address:
+    address = object.__new__(Address)
+    split = addr_string.split("/")
+    mask = split[1] if len(split) == 2 else ""
+    octets = tuple(split[0].split("."))
+    value = 0
+    for octet in octets:
+        value = (value << 8) | int(octet)
+    # Address does not allow setting attributes once it is built
+    init = object.__setattr__
+    # 10.0.1.1/24
+    init(address, "raw", addr_string)
+    # 24
+    init(address, "mask", mask)
+    init(address, "prefix_len", int(mask) if mask else -1)
+    # ("10", "0", "1", "1")
+    init(address, "octets", octets)
+    init(address, "value", value)
+    return address
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+
+# Benchmark of the fat-tree two-level routing tables for growing k:
+# time to generate the tables of all switches, and lookup throughput.
+#
+# Usage: python3 bench_routing_tables.py [--max-k 64] [--lookups 100000]
+
+import argparse
+import random
+import time
+
+from address import Address
+from switch_routing_tables import SwitchRoutingTables
+
+
+def fat_tree_ids(k):
+    """Node ids of all switches and hosts of a k-ary fat-tree, see topo.Fattree."""
+    half = k // 2
+    switches = []
+    hosts = []
+    for pod in range(k):
+        for switch in range(k):
+            switches.append(f"10.{pod}.{switch}.1")
+        for switch in range(half):
+            hosts.extend(f"10.{pod}.{switch}.{host}" for host in range(2, half + 2))
+    switches.extend(f"10.{k}.{j}.{i}" for j in range(1, half + 1) for i in range(1, half + 1))
+    return switches, hosts
+
+
+def bench(k, num_lookups, rng):
+    switches, hosts = fat_tree_ids(k)
+
+    start = time.perf_counter()
+    tables = SwitchRoutingTables(k, [], None)
+    generate_time = time.perf_counter() - start
+
+    pairs = [(rng.choice(switches), rng.choice(hosts)) for _ in range(num_lookups)]
+    # Warm up the compiled tables and the address cache, as a running controller would be
+    for switch, host in pairs:
+        tables.lookup_port(switch, host)
+    start = time.perf_counter()
+    for switch, host in pairs:
+        tables.lookup_port(switch, host)
+    lookup_time = time.perf_counter() - start
+
+    # One batch per switch, over integer addresses
+    sample = [Address(host).value for host in rng.sample(hosts, min(len(hosts), 1024))]
+    batch_switches = rng.sample(switches, min(len(switches), max(1, num_lookups // len(sample))))
+    start = time.perf_counter()
+    for switch in batch_switches:
+        tables.lookup_many(switch, sample)
+    batch_time = time.perf_counter() - start
+    batch_lookups = len(batch_switches) * len(sample)
+
+    return {
+        "k": k,
+        "switches": len(switches),
+        "hosts": len(hosts),
+        "generate_s": generate_time,
+        "lookups_per_s": num_lookups / lookup_time,
+        "batch_lookups_per_s": batch_lookups / batch_time,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark SwitchRoutingTables for growing fat-trees")
+    parser.add_argument("--max-k", type=int, default=64, help="largest k to benchmark")
+    parser.add_argument("--lookups", type=int, default=100000, help="number of lookups per k")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    # Powers of two up to max_k, and max_k itself
+    ks = []
+    k = 4
+    while k < args.max_k:
+        ks.append(k)
+        k *= 2
+    ks.append(args.max_k)
+
+    print(f"{'k':>4} {'switches':>9} {'hosts':>7} {'generate (s)':>13} {'lookups/s':>11} {'batch lookups/s':>16}")
+    for k in ks:
+        result = bench(k, args.lookups, rng)
+        print(f"{result['k']:>4} {result['switches']:>9} {result['hosts']:>7} {result['generate_s']:>13.3f}"
+              f" {result['lookups_per_s']:>11.0f} {result['batch_lookups_per_s']:>16.0f}")
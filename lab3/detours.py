@@ -0,0 +1,139 @@
+from collections import deque
+
+from address import Address
+from switch_routing_tables import SwitchRoutingTables
+
+
+def hosts_below(k, node_id, hosts):
+    """The hosts that are reached through node_id: all hosts of the pod for an
+    aggregation switch, of the subnet for an edge switch, or the host itself.
+    """
+    address = Address(node_id)
+    if address.is_host_address(k):
+        return [node_id]
+    if address.is_aggr_node_address(k):
+        subnet = Address(f"{'.'.join(address.octets[:2])}.0.0/16")
+    elif address.is_edge_node_address(k):
+        subnet = Address(f"{'.'.join(address.octets[:3])}.0/24")
+    else:
+        return []
+    return [host for host in hosts if Address(host).matches(subnet)]
+
+
+def affected_hosts(tables: SwitchRoutingTables, neighbors, down_ports, hosts):
+    """The hosts whose two-level routes can run into one of the down ports:
+    the hosts below every dead link, and all hosts once a switch has no
+    upward port left.
+    """
+    k = tables.k
+    affected = set()
+    for switch, ports in down_ports.items():
+        upward = tables.upward_ports(switch)
+        if upward and all(port in ports for port in upward):
+            return list(hosts)
+        for port in ports:
+            # The lower end of the link
+            below = switch if port in upward else neighbors.get(switch, {}).get(port)
+            if below is not None:
+                affected.update(hosts_below(k, below, hosts))
+    return sorted(affected)
+
+
+def find_detours(tables: SwitchRoutingTables, neighbors, down_ports, hosts):
+    """Routes around links that are down, for the hosts the two-level
+    tables can no longer reach.
+
+    Going up, a switch moves on to its next upward port by itself (see
+    SwitchRoutingTables.failover_ports). Going down there is only one way,
+    so a dead link below has to be avoided by the switches above it. For
+    every switch and host, the two-level route is followed with the
+    failover applied; where it runs into a dead link, the switch gets a
+    detour: the port to the neighbor closest to the host's edge switch over
+    live links. Detours only lead closer to the host, so they cannot loop.
+
+    Args:
+        tables (SwitchRoutingTables): the two-level routing tables
+        neighbors (dict): switch node id -> {port: node id of the switch on the other end}
+        down_ports (dict): switch node id -> set of ports that are down
+        hosts (list): node ids of the hosts to check, e.g. from affected_hosts
+
+    Returns:
+        dict: switch node id -> {host node id: port of the detour}. A switch
+            is missing if the host cannot be reached from it at all.
+    """
+    # Port on a switch towards a neighbor, to check a link is alive in both directions
+    port_to = {(switch, neighbor): port for switch, ports in neighbors.items() for port, neighbor in ports.items()}
+
+    def alive(switch, port):
+        return port not in down_ports.get(switch, ())
+
+    detours = {}
+    distances_per_edge = {}
+    for host in hosts:
+        octets = Address(host).octets
+        edge_switch = f"{octets[0]}.{octets[1]}.{octets[2]}.1"
+        host_port = int(octets[3]) - 1
+
+        # Whether the two-level route from a switch still reaches the host
+        reaches = {}
+
+        def follow(switch):
+            path = []
+            while switch not in reaches:
+                path.append(switch)
+                port = tables.lookup_port(switch, host)
+                down = down_ports.get(switch)
+                if down and port in down:
+                    port = tables.live_port(switch, port, down)
+                if port is None or not alive(switch, port):
+                    ok = False
+                    break
+                if switch == edge_switch:
+                    ok = port == host_port
+                    break
+                switch = neighbors.get(switch, {}).get(port)
+                if switch is None or switch in path:
+                    ok = False
+                    break
+            else:
+                ok = reaches[switch]
+            for visited in path:
+                reaches[visited] = ok
+            return ok
+
+        broken = [switch for switch in neighbors if not follow(switch)]
+        if not broken or not alive(edge_switch, host_port):
+            continue
+
+        distances = distances_per_edge.get(edge_switch)
+        if distances is None:
+            distances = _distances_to(edge_switch, neighbors, port_to, alive)
+            distances_per_edge[edge_switch] = distances
+        for switch in broken:
+            if switch == edge_switch or switch not in distances:
+                continue
+            best = None
+            for port, neighbor in sorted(neighbors[switch].items()):
+                if alive(switch, port) and neighbor in distances and distances[neighbor] < distances[switch]:
+                    if best is None or distances[neighbor] < distances[neighbors[switch][best]]:
+                        best = port
+            if best is not None:
+                detours.setdefault(switch, {})[host] = best
+    return detours
+
+
+def _distances_to(target, neighbors, port_to, alive):
+    """Hops from every switch to target over live links, by breadth-first search from target."""
+    distances = {target: 0}
+    queue = deque([target])
+    while queue:
+        switch = queue.popleft()
+        for port, neighbor in neighbors.get(switch, {}).items():
+            if neighbor in distances or not alive(switch, port):
+                continue
+            back = port_to.get((neighbor, switch))
+            if back is None or not alive(neighbor, back):
+                continue
+            distances[neighbor] = distances[switch] + 1
+            queue.append(neighbor)
+    return distances
@@ -18,6 +18,7 @@
 # A dirty workaround to import topo.py from lab2
 
 import os
+import argparse
 import subprocess
 import time
 from id_mapping import IDMapping
@@ -67,7 +68,10 @@ class FattreeNet(Topo):
         # Add hosts
         for server in self.topo.servers:
             mininet_server_id = self.id_mapping.get_mininet_id(server.id) # h1, h2, h3, .. h15
-            self.addHost(mininet_server_id)
+            # Hosts are addressed by their fat tree id, e.g. 10.0.1.2, in one /8 subnet
+            # and have a MAC address derived from it, that the controller answers ARP requests with
+            self.addHost(mininet_server_id, ip=f"{self.id_mapping.get_ip(server.id)}/8",
+                         mac=self.id_mapping.get_mac(server.id))
 
         links_to_add = []
         for switch in self.topo.switches:
@@ -142,12 +146,13 @@ class FattreeNet(Topo):
         port2 = None
 
         # Core and aggr-to-core
-        if (addr1.is_core_address()):
+        k = self.topo.num_ports
+        if (addr1.is_core_address(k)):
             port1 = int(addr2.octets[1]) + 1
         else:
             port1 = self.port_pool.get_free_port(addr1, addr2)
 
-        if (addr2.is_core_address()):
+        if (addr2.is_core_address(k)):
             port2 = int(addr1.octets[1]) + 1
         else:
             port2 = self.port_pool.get_free_port(addr2, addr1)
@@ -179,5 +184,8 @@ def run(graph_topo):
 
 
 if __name__ == '__main__':
-    ft_topo = topo.Fattree(4)
+    parser = argparse.ArgumentParser(description='Run a fat-tree network in Mininet')
+    parser.add_argument('--ports', type=int, default=4, help="number of ports on a switch (k), an even number")
+    args = parser.parse_args()
+    ft_topo = topo.Fattree(args.ports)
     run(ft_topo)
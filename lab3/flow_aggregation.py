@@ -0,0 +1,46 @@
+from bisect import bisect_left, bisect_right
+from typing import Dict, Tuple
+
+from address import Address, bit_mask
+from flow_compiler import dotted_mask
+
+
+def destination_prefixes(hosts) -> Dict[int, Address]:
+    """The smallest prefix per switch that covers all hosts attached to it
+    and no host of another switch, e.g. 10.0.1.0/24 for an edge switch of the
+    fat-tree. Away from that switch, one entry on this prefix forwards the
+    traffic to all of its hosts, if the forwarding only depends on the
+    destination switch.
+
+    Args:
+        hosts (dict): host IP -> (dpid of the switch it is attached to, port on that switch)
+
+    Returns:
+        dict: dpid -> prefix as an Address, for the switches that have one
+    """
+    by_switch = {}
+    for ip, (dpid, _) in hosts.items():
+        by_switch.setdefault(dpid, []).append(Address(ip).value)
+    all_values = sorted(value for values in by_switch.values() for value in values)
+
+    prefixes = {}
+    for dpid, values in by_switch.items():
+        low, high = min(values), max(values)
+        # Longest prefix that low and high have in common
+        prefix_len = 32 - (low ^ high).bit_length()
+        network = low & bit_mask(prefix_len)
+        last = network | (bit_mask(32 - prefix_len, "right-handed"))
+        # Only its own hosts may fall in the prefix
+        if bisect_right(all_values, last) - bisect_left(all_values, network) == len(values):
+            prefixes[dpid] = Address.from_int(network, prefix_len)
+    return prefixes
+
+
+def ipv4_dst_match(dst_ip, prefix: Address = None) -> Tuple[object, int]:
+    """ipv4_dst match field for OFPMatch and the flow priority: the prefix as
+    (network, netmask) if given, else the exact host address. Longer
+    prefixes get a higher priority, like in flow_compiler.
+    """
+    if prefix is None:
+        return dst_ip, 1 + 32
+    return (".".join(prefix.octets), dotted_mask(prefix.prefix_len)), 1 + prefix.prefix_len
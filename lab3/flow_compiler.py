@@ -0,0 +1,89 @@
+from typing import List, NamedTuple, Optional, Tuple
+
+from address import Address
+
+PREFIX_TABLE = 0
+SUFFIX_TABLE = 1
+
+
+class FlowEntry(NamedTuple):
+    """One OpenFlow 1.3 flow entry matching on ipv4_dst.
+
+    ipv4_dst is an (address, mask) pair in dotted notation, as taken by
+    OFPMatch. Packets that match are sent out of out_port, or to the group
+    group_id, or continue in goto_table if both are None.
+    """
+    table_id: int
+    priority: int
+    ipv4_dst: Tuple[str, str]
+    out_port: Optional[int] = None
+    goto_table: Optional[int] = None
+    group_id: Optional[int] = None
+
+
+class GroupEntry(NamedTuple):
+    """One OpenFlow 1.3 fast-failover group: every bucket outputs to one of
+    ports, and watches it. The first bucket whose port is up is used.
+    """
+    group_id: int
+    ports: Tuple[int, ...]
+
+
+def dotted_mask(bits: int, mode: str = "left-handed") -> str:
+    """Netmask with the given number of one bits, counted from the left
+    (e.g. 24 -> 255.255.255.0) or from the right for "right-handed"
+    (e.g. 8 -> 0.0.0.255).
+    """
+    value = (1 << bits) - 1
+    if mode == "left-handed":
+        value <<= 32 - bits
+    return ".".join(str((value >> shift) & 0xFF) for shift in (24, 16, 8, 0))
+
+
+def compile_two_level_table(rows, failover=None) -> List[FlowEntry]:
+    """Compile the two-level routing table of one switch (a list of rows of
+    SwitchRoutingTables.prefix_tables) into a two-table OpenFlow pipeline.
+
+    Table 0 does the longest prefix match: every prefix becomes a masked
+    ipv4_dst match whose priority grows with the prefix length. The 0.0.0.0/0
+    row goes to table 1, which matches the suffix rows on the host byte(s).
+    Priorities start at 1, priority 0 is left for the table-miss entries.
+
+    failover maps ports to their failover_ports (see SwitchRoutingTables),
+    entries out of those ports go to the group of compile_failover_groups
+    instead.
+
+    Returns:
+        List[FlowEntry]: the flow entries for table 0 and 1
+    """
+    failover = failover or {}
+    entries = []
+    for row in rows:
+        prefix: Address = row["prefix"]
+        length = int(prefix.mask)
+        network = ".".join(prefix.octets)
+        if length == 0:
+            entries.append(FlowEntry(PREFIX_TABLE, 1, (network, dotted_mask(0)), goto_table=SUFFIX_TABLE))
+        else:
+            entries.append(_output(failover, PREFIX_TABLE, 1 + length, (network, dotted_mask(length)), row["port"]))
+
+        for suffix_row in row["suffix_table"]:
+            suffix = Address(suffix_row["suffix"])
+            length = int(suffix.mask)
+            entries.append(_output(failover, SUFFIX_TABLE, 1 + length,
+                                   (".".join(suffix.octets), dotted_mask(length, "right-handed")),
+                                   suffix_row["port"]))
+    return entries
+
+
+def compile_failover_groups(failover) -> List[GroupEntry]:
+    """One fast-failover group per port of failover (port -> failover_ports),
+    with the port as group id.
+    """
+    return [GroupEntry(port, tuple(ports)) for port, ports in sorted(failover.items())]
+
+
+def _output(failover, table_id, priority, ipv4_dst, port) -> FlowEntry:
+    if port in failover:
+        return FlowEntry(table_id, priority, ipv4_dst, group_id=port)
+    return FlowEntry(table_id, priority, ipv4_dst, out_port=port)
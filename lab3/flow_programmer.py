@@ -0,0 +1,119 @@
+from typing import Callable, Dict, List, Optional, Tuple
+
+
+class FlowProgrammer:
+    """Sends OpenFlow messages (FlowMods, GroupMods, packet-outs) to the
+    switches in bulk, instead of one write per message.
+
+    Messages are queued per datapath with send and written together by flush,
+    concatenated into writes of up to MAX_WRITE_BYTES. A large queue is
+    flushed on its own once it reaches that size.
+
+    A barrier (OFPBarrierRequest) makes the switch finish all messages before
+    it, e.g. a FlowMod before the packet-out that relies on it, and tells when
+    it is done: the callback passed to barrier or commit is called once the
+    barrier reply arrives, which the app reports with barrier_reply.
+
+    Datapaths are used as Ryu provides them: id, ofproto_parser, set_xid and send.
+    """
+    MAX_WRITE_BYTES = 64 * 1024
+
+    def __init__(self) -> None:
+        # dpid -> (datapath, serialized messages, their total size)
+        self._queues: Dict[int, Tuple[object, List[bytes], int]] = {}
+        # (dpid, xid of the barrier request) -> callbacks to call on the reply
+        self._barriers: Dict[Tuple[int, int], List[Callable[[], None]]] = {}
+        # Number of messages and writes so far, to see the batching at work
+        self.num_messages = 0
+        self.num_writes = 0
+
+    def send(self, datapath, msg) -> None:
+        """Queue msg for datapath."""
+        if msg.xid is None:
+            datapath.set_xid(msg)
+        msg.serialize()
+        _, bufs, size = self._queues.get(datapath.id, (datapath, [], 0))
+        bufs.append(msg.buf)
+        size += len(msg.buf)
+        self._queues[datapath.id] = (datapath, bufs, size)
+        self.num_messages += 1
+        if size >= self.MAX_WRITE_BYTES:
+            self.flush(datapath)
+
+    def barrier(self, datapath, callback: Optional[Callable[[], None]] = None) -> int:
+        """Queue a barrier request for datapath, callback is called on its reply.
+
+        Returns:
+            int: xid of the barrier request
+        """
+        msg = datapath.ofproto_parser.OFPBarrierRequest(datapath)
+        datapath.set_xid(msg)
+        self._barriers[(datapath.id, msg.xid)] = [callback] if callback is not None else []
+        self.send(datapath, msg)
+        return msg.xid
+
+    def commit(self, datapath, callback: Optional[Callable[[], None]] = None) -> int:
+        """barrier and flush: callback is called once datapath applied everything sent so far."""
+        xid = self.barrier(datapath, callback)
+        self.flush(datapath)
+        return xid
+
+    def flush(self, datapath=None) -> bool:
+        """Write the queued messages of datapath, or of all datapaths if None.
+
+        Returns:
+            bool: whether everything was handed to the switch connections
+        """
+        dpids = list(self._queues) if datapath is None else [datapath.id]
+        ok = True
+        for dpid in dpids:
+            queued = self._queues.pop(dpid, None)
+            if queued is None:
+                continue
+            datapath, bufs, _ = queued
+            for chunk in _chunks(bufs, self.MAX_WRITE_BYTES):
+                self.num_writes += 1
+                if not datapath.send(chunk):
+                    # The switch is gone, so are its barrier replies
+                    self.forget(dpid)
+                    ok = False
+                    break
+        return ok
+
+    def barrier_reply(self, dpid: int, xid: int) -> bool:
+        """Report the barrier reply with xid from switch dpid and call the callbacks waiting for it.
+
+        Returns:
+            bool: whether it answered a barrier of this FlowProgrammer
+        """
+        callbacks = self._barriers.pop((dpid, xid), None)
+        if callbacks is None:
+            return False
+        for callback in callbacks:
+            callback()
+        return True
+
+    def pending_barriers(self, dpid: int) -> int:
+        """Number of barriers of switch dpid that did not get a reply yet."""
+        return sum(1 for barrier_dpid, _ in self._barriers if barrier_dpid == dpid)
+
+    def forget(self, dpid: int) -> None:
+        """Drop the queued messages and pending barriers of a switch that disconnected."""
+        self._queues.pop(dpid, None)
+        for key in [key for key in self._barriers if key[0] == dpid]:
+            del self._barriers[key]
+
+
+def _chunks(bufs: List[bytes], max_bytes: int):
+    """Concatenate bufs into chunks of at most max_bytes, unless a single buf is larger."""
+    chunk = []
+    size = 0
+    for buf in bufs:
+        if chunk and size + len(buf) > max_bytes:
+            yield b"".join(chunk)
+            chunk = []
+            size = 0
+        chunk.append(buf)
+        size += len(buf)
+    if chunk:
+        yield b"".join(chunk)
@@ -17,6 +17,7 @@
 
 #!/usr/bin/env python3
 
+import time
 from typing import Dict, List
 from sp_routing import SPRouter
 
@@ -24,6 +25,8 @@ import topo
 from id_mapping import IDMapping
 from address import Address
 from switch_routing_tables import SwitchRoutingTables
+from flow_compiler import compile_failover_groups, compile_two_level_table
+from detours import affected_hosts, find_detours
 from ryu.topology.api import get_link
 from ryu.controller.handler import set_ev_cls
 from typing import Optional
@@ -43,17 +46,176 @@ from ryu.topology.api import get_switch, get_link
 from ryu.app.wsgi import ControllerBase
 
 
+# Above every entry of the two-level table, whose /32 entries are at priority 33
+DETOUR_PRIORITY = 34
+
+
 class FTRouter(SPRouter):
 
+    # Going up, the two-level tables pick the port by host byte, so flows match whole host addresses
+    AGGREGATE_PREFIXES = False
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
+        # Ports that are down, per dpid
+        self.down_ports = {}
+        # Routes around the links that are down: switch node id -> {host node id: port}
+        self.detours = {}
+
+    # @override
+    def _setup_routing(self, switches, links):
+        super()._setup_routing(switches, links)
+        self.switch_routing_tables = SwitchRoutingTables(self.topo_net.num_ports, links, self.id_mapping)
+        # The wiring of the complete fat-tree, links that fail later are still known here
+        node_id = self.id_mapping.get_node_id_from_dpid
+        self.neighbors = {}
+        for src, dst, attributes in links:
+            self.neighbors.setdefault(node_id(src), {})[attributes['port']] = node_id(dst)
+
+    # @override
+    def install_proactive_flows(self):
+        """Push the two-level routing tables to the switches as an OpenFlow pipeline,
+        the prefix table as table 0 and the suffix table as table 1 (see flow_compiler).
+        """
+        for switch in self.topo_net.switches:
+            datapath = self.datapaths.get(self.id_mapping.get_dpid_int(switch.id))
+            if datapath is not None:
+                self._install_failover_groups(datapath, switch.id)
+                self._install_two_level_table(datapath, switch.id)
+        self.commit_flows("Two-level routing tables installed")
+
+    # @override
+    def _update_flows(self, routes):
+        # The two-level tables do not follow the next hops, links going down or up are
+        # handled by _reroute on the port and link events
+        pass
+
+    def _failover(self, switch_id):
+        tables = self.switch_routing_tables
+        return {port: tables.failover_ports(switch_id, port) for port in tables.upward_ports(switch_id)}
+
+    def _install_failover_groups(self, datapath, switch_id):
+        """One fast-failover group per upward port, so the switch itself moves
+        traffic to the next upward port when a link goes down, and back when it is up.
+        """
+        ofproto = datapath.ofproto
+        parser = datapath.ofproto_parser
+        for group in compile_failover_groups(self._failover(switch_id)):
+            buckets = [parser.OFPBucket(watch_port=port, actions=[parser.OFPActionOutput(port)])
+                       for port in group.ports]
+            self.flow_programmer.send(datapath, parser.OFPGroupMod(datapath, ofproto.OFPGC_ADD, ofproto.OFPGT_FF,
+                                                                   group.group_id, buckets))
+
+    def _install_two_level_table(self, datapath, switch_id):
+        """Install the two-level routing table of one switch, upward ports are
+        used through the fast-failover groups.
+        """
+        parser = datapath.ofproto_parser
+        tables = self.switch_routing_tables
+        for entry in compile_two_level_table(tables.prefix_tables[switch_id], self._failover(switch_id)):
+            match = parser.OFPMatch(eth_type=ether_types.ETH_TYPE_IP, ipv4_dst=entry.ipv4_dst)
+            if entry.out_port is not None:
+                actions = [parser.OFPActionOutput(entry.out_port)]
+            elif entry.group_id is not None:
+                actions = [parser.OFPActionGroup(entry.group_id)]
+            else:
+                actions = []
+            self.add_flow(datapath, entry.priority, match, actions,
+                          table_id=entry.table_id, goto_table=entry.goto_table)
+
+    # Link failures, noticed by the switch (port status) or by topology discovery (link delete)
+    @set_ev_cls(ofp_event.EventOFPPortStatus, MAIN_DISPATCHER)
+    def port_status_handler(self, ev):
+        msg = ev.msg
+        ofproto = msg.datapath.ofproto
+        if msg.reason == ofproto.OFPPR_DELETE or msg.desc.state & ofproto.OFPPS_LINK_DOWN:
+            self._port_down(msg.datapath.id, msg.desc.port_no)
+        else:
+            self._port_up(msg.datapath.id, msg.desc.port_no)
+
+    # @override
+    @set_ev_cls(event.EventLinkDelete)
+    def link_delete(self, ev):
+        super().link_delete(ev)
+        self._port_down(ev.link.src.dpid, ev.link.src.port_no)
+
+    # @override
+    @set_ev_cls(event.EventLinkAdd)
+    def link_add(self, ev):
+        super().link_add(ev)
+        self._port_up(ev.link.src.dpid, ev.link.src.port_no)
+
+    def _port_down(self, dpid, port):
+        down = self.down_ports.setdefault(dpid, set())
+        if port not in down:
+            down.add(port)
+            self._reroute(dpid, port)
+
+    def _port_up(self, dpid, port):
+        down = self.down_ports.get(dpid)
+        if down and port in down:
+            down.discard(port)
+            self._reroute(dpid, port)
+
+    def _reroute(self, dpid, port):
+        """Route around the ports that are down, after port of switch dpid went down or up.
+
+        Upward, the fast-failover groups switch over in the switch itself, and
+        reactive flows out of a dead port are deleted so their next packet takes
+        a backup port (see get_port_of_next_hop). Downward, the switches above
+        the dead link get detours (see detours.find_detours): installed as flows
+        in proactive mode, used for new reactive flows otherwise.
+        """
+        if not self.initialized:
+            return
+        start = time.perf_counter()
+        tables = self.switch_routing_tables
+        node_id = self.id_mapping.get_node_id_from_dpid
+        down_ports = {node_id(switch): ports for switch, ports in self.down_ports.items() if ports}
+        hosts = [server.id for server in self.topo_net.servers]
+
+        old_detours = self.detours
+        affected = affected_hosts(tables, self.neighbors, down_ports, hosts)
+        self.detours = find_detours(tables, self.neighbors, down_ports, affected)
 
-    # Topology discovery
-    @set_ev_cls(event.EventSwitchEnter)
-    def get_topology_data(self, ev):
-        super().get_topology_data(ev)
-        if (self.initialized):
-            self.switch_routing_tables = SwitchRoutingTables(4, self.raw_links, self.id_mapping)
+        num_flow_mods = 0
+        datapath = self.datapaths.get(dpid)
+        if datapath is not None and not self.PROACTIVE and port in self.down_ports.get(dpid, ()):
+            ofproto = datapath.ofproto
+            parser = datapath.ofproto_parser
+            self.flow_programmer.send(datapath, parser.OFPFlowMod(datapath=datapath, command=ofproto.OFPFC_DELETE,
+                                                                  out_port=port, out_group=ofproto.OFPG_ANY,
+                                                                  match=parser.OFPMatch()))
+            num_flow_mods += 1
+        for switch_id in set(old_detours) | set(self.detours):
+            old = old_detours.get(switch_id, {})
+            new = self.detours.get(switch_id, {})
+            changed = [host for host in set(old) | set(new) if old.get(host) != new.get(host)]
+            datapath = self.datapaths.get(self.id_mapping.get_dpid_int(switch_id))
+            if not changed or datapath is None:
+                continue
+            ofproto = datapath.ofproto
+            parser = datapath.ofproto_parser
+            for host in changed:
+                match = parser.OFPMatch(eth_type=ether_types.ETH_TYPE_IP, ipv4_dst=self.id_mapping.get_ip(host))
+                if not self.PROACTIVE:
+                    # The next packet to the host asks the controller again
+                    self.flow_programmer.send(datapath, parser.OFPFlowMod(
+                        datapath=datapath, command=ofproto.OFPFC_DELETE,
+                        out_port=ofproto.OFPP_ANY, out_group=ofproto.OFPG_ANY, match=match))
+                elif host in new:
+                    self.add_flow(datapath, DETOUR_PRIORITY, match, [parser.OFPActionOutput(new[host])])
+                else:
+                    # Back to the two-level table
+                    self.flow_programmer.send(datapath, parser.OFPFlowMod(
+                        datapath=datapath, command=ofproto.OFPFC_DELETE_STRICT, priority=DETOUR_PRIORITY,
+                        out_port=ofproto.OFPP_ANY, out_group=ofproto.OFPG_ANY, match=match))
+                num_flow_mods += 1
+        self.flow_programmer.flush()
+        elapsed = (time.perf_counter() - start) * 1000
+        state = "down" if port in self.down_ports.get(dpid, ()) else "up"
+        self.logger.info("Port %s of switch %s went %s: %d detours, %d flow mods, rerouted in %.2f ms",
+                         port, dpid, state, sum(len(d) for d in self.detours.values()), num_flow_mods, elapsed)
 
     # @override
     def get_port_of_next_hop(self, dst_ip, src_dpid, dst_dpid):
@@ -76,10 +238,18 @@ class FTRouter(SPRouter):
             if (at_correct_edge_switch):
                 return path_to_host[1]
 
-        # Otherwise use fat tree routing
+        # Otherwise use fat tree routing, around the ports that are down
         src_node_id = self.id_mapping.get_node_id_from_dpid(src_dpid)
         dst_host_node_id = self.id_mapping.get_node_id_from_ip(dst_ip)
+        detour = self.detours.get(src_node_id, {}).get(dst_host_node_id)
+        if detour is not None:
+            return detour
         port_of_next_hop = self.switch_routing_tables.lookup_port(src_node_id, dst_host_node_id)
+        down = self.down_ports.get(src_dpid)
+        if down and port_of_next_hop in down:
+            # If every alternative is down too, the packet is lost either way
+            port_of_next_hop = (self.switch_routing_tables.live_port(src_node_id, port_of_next_hop, down)
+                                or port_of_next_hop)
         
         # self.print_hop(src_dpid, dst_dpid, src_node_id, dst_host_node_id, port_of_next_hop)
         return port_of_next_hop
@@ -15,7 +15,8 @@
 
 #!/usr/bin/env python3
 
-from typing import Dict, Optional
+from array import array
+from typing import Dict, Iterable, List, Optional
 
 class IDMapping:
     """Stores the mapping for a Fattree, deployed in a Mininet virtual network,
@@ -30,18 +31,26 @@ class IDMapping:
         10.0.0.2 <-> 1
         10.0.2.1 <-> 16
     - Fattree node id to mininet IP ($ h0 ifconfig):
-        10.0.0.2 <-> 10.0.0.1
+        10.0.0.2 <-> 10.0.0.2
 
     The mininet host name is an auto-increment integer prefixed by the type of the node, 
     'h' for host and 's' for switch.
     The fat tree id/address is based on the implementation of the paper given in the course.
     The datapath id is an integer.
-    The ip is an auto-increment, e.g.: 10.0.0.1, 10.0.0.2, etc.
+    Hosts get their fat tree address as IP, so the switches can route on the
+    prefixes/suffixes of the destination address.
     """
 
     def __init__(self, topo) -> None:
         self.node_id_to_mininetid: Dict[str, str] = {}
         self.ip_to_node_id_mapping: Dict[str, str] = {}
+        # Reverse and derived mappings, all filled in once by _generate_mapping
+        self.mininetid_to_node_id: Dict[str, str] = {}
+        self.node_id_to_ip: Dict[str, str] = {}
+        self._dpid_strings: Dict[str, str] = {}
+        self._dpids: Dict[str, int] = {}
+        # dpids are the dense auto-increment numbers, so node ids are kept in a list indexed by dpid
+        self._node_ids: List[Optional[str]] = []
         self._generate_mapping(topo)
 
     def get_dpid(self, node_id: str) -> Optional[str]:
@@ -53,12 +62,11 @@ class IDMapping:
         Returns:
             Optional[str]: the dpid, or None if no mapping exists
         """
-        value = self.node_id_to_mininetid.get(node_id)
-        if (value is None): 
-            return None
+        return self._dpid_strings.get(node_id)
 
-        result = value.replace("h", "").replace("s", "")
-        return result
+    def get_dpid_int(self, node_id: str) -> Optional[int]:
+        """Same as get_dpid, as the integer datapath id used by Ryu."""
+        return self._dpids.get(node_id)
 
     def get_mininet_id(self, node_id: str) -> Optional[str]:
         """Return the mininet id, e.g. h0 or s16.
@@ -70,20 +78,19 @@ class IDMapping:
         """
         return self.node_id_to_mininetid.get(node_id)
 
-    def get_node_id_from_dpid(self, dpid: str) -> Optional[str]:
+    def get_node_id_from_dpid(self, dpid) -> Optional[str]:
         """Return the node id mapped to the given dpid.
 
         Args:
-            dpid (str): the dpid to get the node id for
+            dpid (int or str): the dpid to get the node id for
 
         Returns:
             Optional[str]: the node id, or None if no mapping exists
         """
-        for node_id, mininet_id in self.node_id_to_mininetid.items():
-            _dpid = mininet_id.replace("h", "").replace("s", "")
-            if (str(_dpid) == str(dpid)):
-                return str(node_id)
-        return None
+        dpid = int(dpid)
+        if (dpid < 0 or dpid >= len(self._node_ids)):
+            return None
+        return self._node_ids[dpid]
 
     def get_node_id_from_ip(self, ip: str) -> Optional[str]:
         """Return the node id mapped to the given ip.
@@ -104,12 +111,33 @@ class IDMapping:
             node_id (str): e.g. 10.0.0.2
 
         Returns:
-            Optional[str]: corresponding IP address, e.g. 10.0.0.1
+            Optional[str]: corresponding IP address, e.g. 10.0.0.2
         """
-        for ip, _node_id in self.ip_to_node_id_mapping.items():
-            if (node_id == _node_id):
-                return ip
-        raise KeyError(f"Could not find ip for node id {node_id}.")
+        ip = self.node_id_to_ip.get(node_id)
+        if (ip is None):
+            raise KeyError(f"Could not find ip for node id {node_id}.")
+        return ip
+
+    def get_mac(self, node_id: str) -> str:
+        """Returns the MAC address of the fattree host node_id, which is its IP
+        address in the last four bytes, e.g. 00:00:0a:00:00:02 for 10.0.0.2.
+        The controller can answer ARP requests with it (see ProxyARP).
+        """
+        return mac_for_ip(self.get_ip(node_id))
+
+    def bulk_dpids(self, node_ids: Iterable[str]) -> array:
+        """Integer dpids of the given node ids, -1 for node ids without mapping."""
+        dpids = self._dpids
+        return array('q', [dpids.get(node_id, -1) for node_id in node_ids])
+
+    def bulk_node_ids_from_dpids(self, dpids: Iterable[int]) -> List[Optional[str]]:
+        """Node ids of the given dpids, None for dpids without mapping."""
+        return [self.get_node_id_from_dpid(dpid) for dpid in dpids]
+
+    def bulk_ips(self, node_ids: Iterable[str]) -> List[Optional[str]]:
+        """IPs of the given node ids, None for nodes without IP (switches)."""
+        node_id_to_ip = self.node_id_to_ip
+        return [node_id_to_ip.get(node_id) for node_id in node_ids]
 
     def _generate_mapping(self, topo):
         """For each server- and switch's id, map a mininet id to it,
@@ -121,7 +149,7 @@ class IDMapping:
         dpid_auto_increment = 0
         for server in topo.servers:
             self._add_mininet_mapping(server.id, f"h{dpid_auto_increment}")
-            self._add_ip_mapping(server.id, dpid_auto_increment)
+            self._add_ip_mapping(server.id)
             dpid_auto_increment += 1
         for switch in topo.switches:
             self._add_mininet_mapping(switch.id, f"s{dpid_auto_increment}")
@@ -140,23 +168,32 @@ class IDMapping:
         if (self.node_id_to_mininetid.get(node_id)):
             raise MappingAlreadyExistsException(
                 f"Mapping between {node_id} and {mininet_id} already exists")
-        self.node_id_to_mininetid[str(node_id)] = str(mininet_id)
-
-    def _add_ip_mapping(self, node_id: str, mininet_id: int) -> None:
-        """Map an IP
+        node_id = str(node_id)
+        mininet_id = str(mininet_id)
+        dpid = int(mininet_id[1:])
+        self.node_id_to_mininetid[node_id] = mininet_id
+        self.mininetid_to_node_id[mininet_id] = node_id
+        self._dpid_strings[node_id] = str(dpid)
+        self._dpids[node_id] = dpid
+        while len(self._node_ids) <= dpid:
+            self._node_ids.append(None)
+        self._node_ids[dpid] = node_id
+
+    def _add_ip_mapping(self, node_id: str) -> None:
+        """Map the IP of a host, which is its fat tree address.
 
         Args:
-            node_id (str): [description]
-            mininet_id (int): [description]
+            node_id (str): node id of the host, e.g. 10.0.0.2
 
         Raises:
-            MappingAlreadyExistsException: [description]
+            MappingAlreadyExistsException: if the IP is already mapped
         """
-        ip = f"10.0.0.{str(mininet_id + 1)}"
+        ip = str(node_id)
         if (self.ip_to_node_id_mapping.get(ip)):
             raise MappingAlreadyExistsException(
                 f"Mapping between ip {ip} and node_id {node_id} already exists")
         self.ip_to_node_id_mapping[ip] = node_id
+        self.node_id_to_ip[node_id] = ip
 
     def __str__(self) -> str:
         """Returns the mapping as a string representation useful for printing/debugging.
@@ -171,4 +208,9 @@ class IDMapping:
         return result
 
 class MappingAlreadyExistsException(Exception):
-    pass
\ No newline at end of file
+    pass
+
+
+def mac_for_ip(ip: str) -> str:
+    """MAC address of a host with the given IP, see IDMapping.get_mac."""
+    return "00:00:" + ":".join(f"{int(octet):02x}" for octet in ip.split("."))
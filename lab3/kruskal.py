@@ -1,28 +1,93 @@
 # Adaptation on Kruskal's algorithm as defined at https://en.wikipedia.org/wiki/Kruskal%27s_algorithm.
-# Returns: a list of the edges chosen to be in the Minimal Spanning Tree.
-def kruskal(vertices, edges):
-    # create a forest F, where each vertex in the graph is a separate tree
-    F = [] 
-    for v in vertices:
-        F.append([v])
-    
-    # create a set S containing all the edges in the graph
-    S = edges.copy()
+from typing import Callable, List, Optional, Set
+
+from topo import DisjointSet
+
+
+def kruskal(vertices, edges, weight: Optional[Callable] = None):
+    """Minimal Spanning Tree of the graph, with a union-find forest (see SpanningTree).
+
+    Edges are (u, v, ...) tuples, e.g. the (src_dpid, dst_dpid, {'port': port})
+    links of topology discovery. Without weight every edge counts the same and
+    they are tried in the given order, else they are sorted by weight(edge).
+    Runs in O(E log E) with weights and O(E α(V)) without.
+
+    Returns:
+        list: the edges chosen to be in the Minimal Spanning Tree
+    """
+    index = {v: i for i, v in enumerate(vertices)}
+    tree = SpanningTree(len(index))
+    if weight is not None:
+        edges = sorted(edges, key=weight)
+
     spanning_edges = []
-    
-    while len(S) != 0 and len(F) != 1: # If a forest only has one element, it is a spanning tree.
-        edge = S[0]
-        u = edge[0]
-        v = edge[1]
-        for first in range(len(F)):
-            if u in F[first] and not v in F[first]:
-                spanning_edges.append(edge)
-                for second in range(len(F)):
-                    if v in F[second]:
-                        F[first] = F[first] + F[second]
-                        F.pop(second)
-                        break
-                break
-        S = S[1:]
-        	
-    return spanning_edges 
\ No newline at end of file
+    for edge in edges:
+        # If the forest only has one tree, it is a spanning tree
+        if tree.count <= 1:
+            break
+        if tree.add_link(index[edge[0]], index[edge[1]]):
+            spanning_edges.append(edge)
+    return spanning_edges
+
+
+class SpanningTree:
+    """A spanning forest that is kept up to date while links come and go.
+
+    A new link joins the tree if it connects two trees, the step of Kruskal's
+    algorithm, checked with a union-find forest. When a tree link is removed,
+    it is replaced by another link between both sides, searched from one side
+    only. If there is none the tree is split, and the union-find forest is
+    rebuilt from the tree links.
+
+    Nodes are the integers 0 .. n - 1, tree holds the tree neighbors of every node.
+    """
+    def __init__(self, n: int = 0) -> None:
+        self.forest = DisjointSet(n)
+        self.tree: List[Set[int]] = [set() for _ in range(n)]
+
+    @property
+    def count(self) -> int:
+        """Number of trees in the forest."""
+        return self.forest.count
+
+    def add_node(self) -> int:
+        self.tree.append(set())
+        return self.forest.add()
+
+    def add_link(self, u: int, v: int) -> bool:
+        """Add the link u - v to the tree if it connects two trees, returns whether it did."""
+        if not self.forest.union(u, v):
+            return False
+        self.tree[u].add(v)
+        self.tree[v].add(u)
+        return True
+
+    def remove_link(self, u: int, v: int, adjacency) -> None:
+        """Remove the link u - v, which is already gone from adjacency, the
+        neighbors in the graph per node. Nothing changes if it was not a tree link.
+        """
+        if v not in self.tree[u]:
+            return
+        self.tree[u].discard(v)
+        self.tree[v].discard(u)
+        # The side of u: the nodes u can still reach over the tree
+        side = {u}
+        stack = [u]
+        while stack:
+            w = stack.pop()
+            for x in self.tree[w]:
+                if x not in side:
+                    side.add(x)
+                    stack.append(x)
+        for w in side:
+            for x in adjacency[w]:
+                if x not in side:
+                    self.tree[w].add(x)
+                    self.tree[x].add(w)
+                    return
+        forest = DisjointSet(len(self.tree))
+        for w, neighbors in enumerate(self.tree):
+            for x in neighbors:
+                if w < x:
+                    forest.union(w, x)
+        self.forest = forest
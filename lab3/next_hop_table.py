@@ -0,0 +1,290 @@
+import heapq
+from array import array
+from typing import List, Optional, Tuple
+
+import topo
+
+
+class NextHopTable:
+    """All-pairs shortest path next hops between switches, kept up to date
+    while links change.
+
+    Switches are the dpids reported by topology discovery and links the
+    (src_dpid, dst_dpid, {'port': port on src_dpid}) tuples. Every switch gets
+    an index and the next hop from switch s towards switch d is stored at
+    s * n + d of a flat array, together with the hop distance from s to d.
+    Both are -1 if d cannot be reached from s, the next hop also if s == d.
+
+    The table is built with one breadth-first search per destination: the BFS
+    predecessor of s, seen from d, is the next hop from s towards d. After
+    that, apply follows link changes by repairing only the destinations whose
+    BFS tree uses the changed link, like Paths._on_graph_change repairs its
+    cached distances, instead of searching again from every destination.
+
+    ecmp_ports gives all next hops on equal-cost paths instead of one, from
+    the shortest path DAG of the destination (built on first use).
+    """
+    def __init__(self, switches, links) -> None:
+        self.topology = topo.MininetTopology(switches, links)
+        self.dpids = [switch.id for switch in self.topology.switches]
+        self.index = {dpid: i for i, dpid in enumerate(self.dpids)}
+        ports = {(src, dst): attributes['port'] for src, dst, attributes in links}
+        self.ports = ports
+        self._dags = {}
+        graph = self.topology.graph
+        # Edge id in the graph of every linked switch pair, keyed by (min index, max index)
+        self._edges = {}
+        for edge_id in range(len(graph.alive)):
+            if graph.alive[edge_id]:
+                u, v = graph.endpoints(edge_id)
+                self._edges[(min(u, v), max(u, v))] = edge_id
+
+        n = len(self.dpids)
+        self.next_hops = array('q', [-1]) * (n * n)
+        self.distances = array('q', [-1]) * (n * n)
+        paths = topo.Paths(self.topology)
+        self.paths = paths
+        for d in range(n):
+            dist, prev = paths.shortest_paths(d)
+            # Column d: every source towards d
+            self.next_hops[d::n] = prev
+            self.distances[d::n] = dist
+
+    def next_hop(self, src_dpid, dst_dpid) -> Optional[int]:
+        """dpid of the next switch on a shortest path from src_dpid to dst_dpid,
+        None if they are the same switch or not connected.
+        """
+        hop = self.next_hops[self._position(src_dpid, dst_dpid)]
+        return self.dpids[hop] if hop >= 0 else None
+
+    def out_port(self, src_dpid, dst_dpid) -> Optional[int]:
+        """Port on src_dpid towards dst_dpid, None if there is none."""
+        hop = self.next_hops[self._position(src_dpid, dst_dpid)]
+        if hop < 0:
+            return None
+        # Links are normally reported in both directions, there is no port if not
+        return self.ports.get((src_dpid, self.dpids[hop]))
+
+    def ecmp_ports(self, src_dpid, dst_dpid) -> List[Tuple[int, int]]:
+        """Ports on src_dpid of all equal-cost shortest paths towards dst_dpid,
+        as (port, weight) pairs, where weight is the number of shortest paths
+        to dst_dpid through that port. Empty if they are the same switch or not
+        connected.
+        """
+        d = self.index[dst_dpid]
+        dag = self._dags.get(d)
+        if dag is None:
+            # Rooted at the destination, the DAG predecessors of s are its next hops towards d
+            dag = self.paths.shortest_path_dag(d)
+            self._dags[d] = dag
+        s = self.index[src_dpid]
+        if s == d or dag.dist[s] < 0:
+            return []
+        ecmp = []
+        for hop in dag.predecessors(s):
+            port = self.ports.get((src_dpid, self.dpids[hop]))
+            if port is not None:
+                ecmp.append((port, dag.num_paths[hop]))
+        return sorted(ecmp)
+
+    def apply(self, changes) -> Optional[List[Tuple[int, int, Optional[int]]]]:
+        """Follow link changes, given per direction as (src_dpid, dst_dpid,
+        port on src_dpid, or None if the link was deleted) like
+        TopologyManager.link_changes. As in the constructor, a switch pair is
+        linked as long as either direction is reported.
+
+        Returns:
+            list: (src_dpid, dst_dpid, out port now or None if unreachable now)
+                for the routes whose next hop or port changed, or None if a
+                change involves a switch that is not in the table, which then
+                has to be built again
+        """
+        if any(src not in self.index or dst not in self.index for src, dst, _ in changes):
+            return None
+        graph = self.topology.graph
+        n = len(self.dpids)
+        changed = set()
+        for src_dpid, dst_dpid, port in changes:
+            u = self.index[src_dpid]
+            v = self.index[dst_dpid]
+            pair = (min(u, v), max(u, v))
+            if port is None:
+                self.ports.pop((src_dpid, dst_dpid), None)
+                if (dst_dpid, src_dpid) in self.ports or pair not in self._edges:
+                    continue
+                graph.remove_edge(self._edges.pop(pair))
+                self._link_removed(u, v, changed)
+            else:
+                old_port = self.ports.get((src_dpid, dst_dpid))
+                self.ports[(src_dpid, dst_dpid)] = port
+                if pair not in self._edges:
+                    self._edges[pair] = graph.add_edge(u, v)
+                    self._link_added(u, v, changed)
+                elif old_port != port:
+                    # The same link on another port
+                    changed.update((u, d) for d in range(n) if self.next_hops[u * n + d] == v)
+        return [(self.dpids[s], self.dpids[d], self.out_port(self.dpids[s], self.dpids[d]))
+                for s, d in sorted(changed)]
+
+    def _link_added(self, u, v, changed) -> None:
+        """Repair the destinations that the new link u - v brings closer to u or v:
+        the improvement is propagated breadth-first from the endpoint that got closer.
+        """
+        n = len(self.dpids)
+        dist = self.distances
+        hops = self.next_hops
+        graph = self.topology.graph
+        for d in range(n):
+            du, dv = dist[u * n + d], dist[v * n + d]
+            if du >= 0 and (dv < 0 or du + 1 < dv):
+                start, hop = v, u
+            elif dv >= 0 and (du < 0 or dv + 1 < du):
+                start, hop = u, v
+            else:
+                if du >= 0 and abs(du - dv) == 1:
+                    # Another shortest path, only the DAG changes
+                    self._dags.pop(d, None)
+                continue
+            self._dags.pop(d, None)
+            dist[start * n + d] = dist[hop * n + d] + 1
+            hops[start * n + d] = hop
+            changed.add((start, d))
+            order = [start]
+            head = 0
+            while head < len(order):
+                x = order[head]
+                head += 1
+                alt = dist[x * n + d] + 1
+                for w in graph.neighbors_of(x):
+                    if dist[w * n + d] < 0 or dist[w * n + d] > alt:
+                        dist[w * n + d] = alt
+                        hops[w * n + d] = x
+                        changed.add((w, d))
+                        order.append(w)
+
+    def _link_removed(self, u, v, changed) -> None:
+        """Repair the destinations whose BFS tree used the removed link u - v.
+
+        The link only matters to destination d if the endpoint farther from d
+        had its next hop over it. If that endpoint has another neighbor one
+        hop closer, only its next hop changes. Otherwise the switches whose
+        every shortest path used the link are collected level by level, and
+        only they get new distances and next hops, from their unaffected
+        neighbors with a search restricted to them (see Paths._repair_removed).
+        """
+        n = len(self.dpids)
+        dist = self.distances
+        hops = self.next_hops
+        graph = self.topology.graph
+        for d in range(n):
+            du, dv = dist[u * n + d], dist[v * n + d]
+            if du < 0 or du == dv:
+                continue
+            # The link was on a shortest path
+            self._dags.pop(d, None)
+            far, near = (u, v) if du > dv else (v, u)
+            if hops[far * n + d] != near:
+                continue
+            affected = set()
+
+            def predecessor(w):
+                """A neighbor of w one hop closer to d that keeps its distance, -1 if none."""
+                closer = dist[w * n + d] - 1
+                for x in graph.neighbors_of(w):
+                    if dist[x * n + d] == closer and x not in affected:
+                        return x
+                return -1
+
+            hop = predecessor(far)
+            changed.add((far, d))
+            if hop >= 0:
+                hops[far * n + d] = hop
+                continue
+            affected.add(far)
+            order = [far]
+            head = 0
+            while head < len(order):
+                x = order[head]
+                head += 1
+                for w in graph.neighbors_of(x):
+                    if dist[w * n + d] != dist[x * n + d] + 1 or w in affected:
+                        continue
+                    hop = predecessor(w)
+                    if hop < 0:
+                        affected.add(w)
+                        order.append(w)
+                    elif hops[w * n + d] == x:
+                        # Keeps its distance over another neighbor
+                        hops[w * n + d] = hop
+                        changed.add((w, d))
+
+            for x in affected:
+                dist[x * n + d] = -1
+                hops[x * n + d] = -1
+                changed.add((x, d))
+            heap = []
+            for x in affected:
+                for w in graph.neighbors_of(x):
+                    if w in affected or dist[w * n + d] < 0:
+                        continue
+                    if dist[x * n + d] < 0 or dist[w * n + d] + 1 < dist[x * n + d]:
+                        dist[x * n + d] = dist[w * n + d] + 1
+                        hops[x * n + d] = w
+                if dist[x * n + d] >= 0:
+                    heap.append((dist[x * n + d], x))
+            heapq.heapify(heap)
+            while heap:
+                dx, x = heapq.heappop(heap)
+                if dx != dist[x * n + d]:
+                    continue
+                for w in graph.neighbors_of(x):
+                    if w in affected and (dist[w * n + d] < 0 or dist[w * n + d] > dx + 1):
+                        dist[w * n + d] = dx + 1
+                        hops[w * n + d] = x
+                        heapq.heappush(heap, (dx + 1, w))
+
+    def host_rules(self, hosts) -> dict:
+        """Per-destination-host forwarding rules for every switch.
+
+        Args:
+            hosts (dict): host IP -> (dpid of the switch it is attached to, port on that switch)
+
+        Returns:
+            dict: dpid -> list of (host IP, out port), for the hosts reachable from that switch
+        """
+        rules = {dpid: [] for dpid in self.dpids}
+        for ip, (host_dpid, host_port) in hosts.items():
+            if host_dpid not in self.index:
+                continue
+            rules[host_dpid].append((ip, host_port))
+            for dpid in self.dpids:
+                port = self.out_port(dpid, host_dpid) if dpid != host_dpid else None
+                if port is not None:
+                    rules[dpid].append((ip, port))
+        return rules
+
+    def changed_routes(self, previous: "NextHopTable", dst_dpids) -> List[Tuple[int, int, Optional[int]]]:
+        """The routes towards dst_dpids whose port differs from the previous
+        table, e.g. after a link went down, for every switch of either table.
+        A switch missing from a table cannot reach anything there.
+
+        Returns:
+            list: (src_dpid, dst_dpid, out port now or None if unreachable now)
+        """
+        changed = []
+        for dst_dpid in dst_dpids:
+            for src_dpid in sorted(set(self.dpids) | set(previous.dpids)):
+                if src_dpid == dst_dpid:
+                    continue
+                port = self._out_port_if_known(src_dpid, dst_dpid)
+                if port != previous._out_port_if_known(src_dpid, dst_dpid):
+                    changed.append((src_dpid, dst_dpid, port))
+        return changed
+
+    def _out_port_if_known(self, src_dpid, dst_dpid) -> Optional[int]:
+        if src_dpid not in self.index or dst_dpid not in self.index:
+            return None
+        return self.out_port(src_dpid, dst_dpid)
+
+    def _position(self, src_dpid, dst_dpid) -> int:
+        return self.index[src_dpid] * len(self.dpids) + self.index[dst_dpid]
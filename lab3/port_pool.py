@@ -33,7 +33,7 @@ class PortPool:
         if (addr_src.is_host_address(k)):
             return self._take(addr_src, "host")
 
-        is_upstream: bool = (addr_dst.is_core_address()
+        is_upstream: bool = (addr_dst.is_core_address(k)
             or (addr_src.is_edge_node_address(k) and addr_dst.is_aggr_node_address(k)))
         if (is_upstream): # From aggr to core or from pod node to pod node
             # Return port 3 or 4 for k=4
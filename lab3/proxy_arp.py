@@ -0,0 +1,58 @@
+import socket
+import struct
+from typing import Dict, Optional
+
+ETH_TYPE_ARP = 0x0806
+ARP_REQUEST = 1
+ARP_REPLY = 2
+
+
+class ProxyARP:
+    """Answers ARP requests from the controller, so they do not have to be
+    flooded through the network to reach the host that owns the address.
+
+    The MAC address of every host is known up front (add_host, e.g. with
+    IDMapping.get_mac) or learned from the first ARP packet it sends (learn).
+    A request for a known address is answered at the switch where it came in.
+    """
+    def __init__(self) -> None:
+        # IP -> MAC address of every known host
+        self.macs: Dict[str, str] = {}
+
+    def add_host(self, ip: str, mac: str) -> None:
+        self.macs[ip] = mac
+
+    def learn(self, ip: str, mac: str) -> bool:
+        """Remember the MAC address of the sender of an ARP packet.
+
+        Returns:
+            bool: whether the host was not known with this MAC address before
+        """
+        if self.macs.get(ip) == mac:
+            return False
+        self.macs[ip] = mac
+        return True
+
+    def reply(self, src_mac: str, src_ip: str, dst_ip: str) -> Optional[bytes]:
+        """The ARP reply to a request from src_mac/src_ip for dst_ip, as an
+        Ethernet frame to send back to the requester. None if dst_ip is unknown.
+        """
+        dst_mac = self.macs.get(dst_ip)
+        if dst_mac is None:
+            return None
+        return arp_frame(ARP_REPLY, dst_mac, dst_ip, src_mac, src_ip)
+
+
+def arp_frame(opcode: int, sender_mac: str, sender_ip: str, target_mac: str, target_ip: str) -> bytes:
+    """An Ethernet frame with an ARP packet for IPv4, from the sender to the target."""
+    sender = _mac_bytes(sender_mac)
+    target = _mac_bytes(target_mac)
+    ethernet = target + sender + struct.pack("!H", ETH_TYPE_ARP)
+    # Hardware type Ethernet (1), protocol type IPv4, 6 byte MAC and 4 byte IP addresses
+    arp = struct.pack("!HHBBH6s4s6s4s", 1, 0x0800, 6, 4, opcode,
+                      sender, socket.inet_aton(sender_ip), target, socket.inet_aton(target_ip))
+    return ethernet + arp
+
+
+def _mac_bytes(mac: str) -> bytes:
+    return bytes(int(part, 16) for part in mac.split(":"))
@@ -17,6 +17,7 @@
 
 #!/usr/bin/env python3
 
+import time
 from typing import Optional
 from ryu.base import app_manager
 from ryu.controller import mac_to_port
@@ -25,101 +26,166 @@ from ryu.controller.handler import CONFIG_DISPATCHER, MAIN_DISPATCHER
 from ryu.controller.handler import set_ev_cls
 from ryu.ofproto import ofproto_v1_3
 from ryu.lib.mac import haddr_to_bin
-from ryu.lib.packet import packet, ethernet, ether_types
-from ryu.lib.packet import ipv4
-from ryu.lib.packet import arp
+from ryu.lib.packet import ether_types
 
 from ryu.topology import event, switches
-from ryu.topology.api import get_switch, get_link
 from ryu.app.wsgi import ControllerBase
 
-from kruskal import kruskal
+from ryu.lib import hub
 
 import topo
+from address import Address
 from id_mapping import IDMapping
+from next_hop_table import NextHopTable
+from topology_manager import TopologyManager
+from flow_aggregation import destination_prefixes, ipv4_dst_match
+from proxy_arp import ARP_REQUEST, ProxyARP
+from flow_programmer import FlowProgrammer
+from headers import decode
+
+# Above every routing entry, which only match IPv4 anyway
+ARP_PRIORITY = 100
+
 
 class SPRouter(app_manager.RyuApp):
 
     OFP_VERSIONS = [ofproto_v1_3.OFP_VERSION]
-    NUMBER_OF_PORTS_PER_SWITCH = 4
+    # k of the fat-tree, None to take it from the number of ports of the discovered switches
+    NUMBER_OF_PORTS_PER_SWITCH = None
+    # Seconds to wait for more topology events before applying them
+    DEBOUNCE_SECONDS = 0.5
+    # Install forwarding rules for every host on every switch right after discovery,
+    # instead of one flow at a time on packet-in
+    PROACTIVE = False
+    # Spread the flows towards a switch over all equal-cost paths with select groups,
+    # instead of pinning them to one shortest path
+    ECMP = False
+    # Match the flows installed on packet-in on the prefix of the hosts of the
+    # destination switch (see flow_aggregation), instead of on the host
+    AGGREGATE_PREFIXES = True
+    # Seconds after which the flows installed on packet-in expire, when idle and in any case
+    IDLE_TIMEOUT = 30
+    HARD_TIMEOUT = 300
+    # Seconds between reports of the number of flow entries per switch, 0 for none
+    FLOW_REPORT_INTERVAL = 10
 
     def __init__(self, *args, **kwargs):
         super(SPRouter, self).__init__(*args, **kwargs)
-        self.topo_net = topo.Fattree(self.NUMBER_OF_PORTS_PER_SWITCH)
+        self.topo_net = None
+        self.id_mapping = None
         self.mac_to_port = {}
-        self.flood_ports_switches = dict()
+        self.topology = TopologyManager()
+        self._topology_update = None
         self.initialized = False
-        self.edge_switches = []
         self.ipv4_dests = dict()
-        self.custom_topo = None
         self.raw_links = []
+        self.next_hops = None
+        self.datapaths = {}
+        # Installed ECMP select groups: (dpid, destination dpid) -> buckets as (port, weight)
+        self.ecmp_groups = {}
+        # dpid -> prefix of its hosts, see flow_aggregation.destination_prefixes
+        self.destination_prefixes = {}
+        # Installed flow entries per dpid, as (table_id, priority, match fields)
+        self.flow_entries = {}
+        self._flow_report = hub.spawn(self._report_flow_tables) if self.FLOW_REPORT_INTERVAL else None
+        self.proxy_arp = ProxyARP()
+        # All OpenFlow messages to the switches are sent through it, in bulk
+        self.flow_programmer = FlowProgrammer()
+        if self.NUMBER_OF_PORTS_PER_SWITCH:
+            self._use_fat_tree(self.NUMBER_OF_PORTS_PER_SWITCH)
+
+    def _use_fat_tree(self, k):
+        """Set up the fat-tree model of the network for switches with k ports."""
+        self.topo_net = topo.Fattree(k)
         self.id_mapping = IDMapping(self.topo_net)
+        for server in self.topo_net.servers:
+            self.proxy_arp.add_host(self.id_mapping.get_ip(server.id), self.id_mapping.get_mac(server.id))
 
-    # Topology discovery
+    # Topology discovery, the events are collected and applied together after DEBOUNCE_SECONDS
     @set_ev_cls(event.EventSwitchEnter)
-    def get_topology_data(self, ev):
+    def switch_enter(self, ev):
+        dp = ev.switch.dp
+        self.datapaths[dp.id] = dp
+        self.topology.switch_enter(dp.id, [port.port_no for port in ev.switch.ports])
+        self._schedule_topology_update()
+
+    @set_ev_cls(event.EventSwitchLeave)
+    def switch_leave(self, ev):
+        self.datapaths.pop(ev.switch.dp.id, None)
+        # The groups are gone with the switch
+        for key in [key for key in self.ecmp_groups if key[0] == ev.switch.dp.id]:
+            del self.ecmp_groups[key]
+        self.flow_programmer.forget(ev.switch.dp.id)
+        # Its flow entries are gone without flow removed messages
+        self.flow_entries.pop(ev.switch.dp.id, None)
+        self.topology.switch_leave(ev.switch.dp.id)
+        self._schedule_topology_update()
+
+    @set_ev_cls(event.EventLinkAdd)
+    def link_add(self, ev):
+        link = ev.link
+        self.topology.link_add(link.src.dpid, link.dst.dpid, link.src.port_no)
+        self._schedule_topology_update()
+
+    @set_ev_cls(event.EventLinkDelete)
+    def link_delete(self, ev):
+        self.topology.link_delete(ev.link.src.dpid, ev.link.dst.dpid)
+        self._schedule_topology_update()
+
+    def _schedule_topology_update(self):
+        if self._topology_update is None:
+            self._topology_update = hub.spawn_after(self.DEBOUNCE_SECONDS, self.update_topology)
+
+    def update_topology(self):
+        """Apply the topology events collected since the last update, and
+        initialize the routing once the whole fat-tree is discovered.
+        """
+        self._topology_update = None
+        if not self.topology.flush():
+            return
+        routes = None
+        if self.initialized and self.next_hops is not None:
+            # Only the destinations whose routes use a changed link are repaired
+            routes = self.next_hops.apply(self.topology.link_changes)
+            if routes is None:
+                # A switch that was not there before, all routes are computed again
+                previous = self.next_hops
+                self.next_hops = None
+                routes = self._next_hop_table().changed_routes(previous, self.next_hops.dpids)
+        else:
+            # The next hops are recomputed on the next lookup
+            self.next_hops = None
+        if self.ecmp_groups:
+            self._refresh_ecmp_groups()
+            self.flow_programmer.flush()
+        if routes:
+            self._update_flows(routes)
+        if self.initialized:
+            return
 
-        # Switches and links in the network
-        switches = get_switch(self, None)
-        links = get_link(self, None)
-        switches = [switch.dp.id for switch in switches]
-        links = [(link.src.dpid, link.dst.dpid, {'port': link.src.port_no}) for link in links]
-        self.raw_links = links
+        # Every switch of a fat-tree has k ports
+        k = self.NUMBER_OF_PORTS_PER_SWITCH or self.topology.num_ports()
+        if not self.initialized and k >= 2 and k % 2 == 0:
+            if self.topo_net is None or self.topo_net.num_ports != k:
+                self._use_fat_tree(k)
+        if self.topo_net is None:
+            return
 
+        switches = self.topology.switches
+        links = self.topology.link_list()
+        self.raw_links = links
         num_edge_links = self.topo_net.num_ports**2
         total_num_ports = self.topo_net.num_ports * len(self.topo_net.switches)
         has_required_number_of_links = (len(links) == total_num_ports - num_edge_links)
 
-        if self.initialized or not has_required_number_of_links:
+        if not has_required_number_of_links:
             return
 
-        def find_edge_switches(switches, links):
-            edge_switches = []
-            for switch in switches:
-                occupied_ports = []
-                outgoing = 0
-                for link in links:
-                    if link[0] == switch:
-                        outgoing += 1
-                        occupied_ports.append(link[2]["port"])
-                if outgoing == int(self.topo_net.num_ports/2):
-                    edge_switches.append((switch, occupied_ports.copy()))
-                occupied_ports.clear()
-            return edge_switches
-
-        self.edge_switches = find_edge_switches(switches, links)
-
-        def add_edges_to_mst(mst):
-            self.custom_topo = topo.MininetTopology(switches, links)
-            extra_edges = []
-            for edge in links:
-                for other in mst:
-                    a, b, _ = edge
-                    c, d, _ = other
-                    if (a,b) == (d, c):
-                        extra_edges.append(edge)
-            return mst + extra_edges
-
-        # Get Minimal Spanning Tree
-        mst = kruskal(switches, links)
-        mst = add_edges_to_mst(mst)
-            
-        # mst will be used for flooding, not the full network. Not forgetting edge-switches.
-
-        # Initializing the flooding of the ports.
-        for switch in switches:
-            self.flood_ports_switches[str(switch)] = []
-        
-        for edge in mst:
-            self.flood_ports_switches[str(edge[0])].append(edge[2])
-        
-        # Find open ports in the edge-switches to also flood.
-        for pair in self.edge_switches:
-            switch, ports_used = pair
-            for i in range(1, self.topo_net.num_ports+1):
-                if i not in ports_used and {'port': i} not in self.flood_ports_switches[str(switch)]:
-                    self.flood_ports_switches[str(switch)].append({'port': i})
+        if not self.topology.is_connected():
+            print("Discovered switches are not connected yet, waiting for more links")
+            return
 
+        self._setup_routing(switches, links)
         self.initialized = True
         # for link in self.raw_links:
         #     src_node_id = self.id_mapping.get_node_id_from_dpid(link[0])
@@ -127,6 +193,181 @@ class SPRouter(app_manager.RyuApp):
         #     port = link[2]['port']
         #     print(f"src: {src_node_id} - dst: {dst_node_id} - port: {port}")
         print("Controller initialized")
+        if self.PROACTIVE:
+            self.install_proactive_flows()
+
+    def _update_flows(self, routes):
+        """Bring the flows on the switches in line with the routes after a
+        topology change: for every switch whose route towards the hosts of a
+        destination switch changed, the proactive flows are installed again
+        (or deleted if the hosts cannot be reached anymore), and the reactive
+        flows are deleted, so the next packet asks the controller again.
+
+        Args:
+            routes (list): the changed routes as (src_dpid, dst_dpid, out port or None),
+                see NextHopTable.apply
+        """
+        hosts_per_switch = {}
+        for ip, (dpid, _) in self.ipv4_dests.items():
+            hosts_per_switch.setdefault(dpid, []).append(ip)
+
+        num_flow_mods = 0
+        num_routes = 0
+        for src_dpid, dst_dpid, out_port in routes:
+            datapath = self.datapaths.get(src_dpid)
+            if datapath is None or dst_dpid not in hosts_per_switch:
+                continue
+            num_routes += 1
+            ofproto = datapath.ofproto
+            parser = datapath.ofproto_parser
+            prefix = self.destination_prefixes.get(dst_dpid)
+            if not self.PROACTIVE and prefix is not None:
+                # Also deletes the flows of single hosts within the prefix
+                ipv4_dsts = [ipv4_dst_match(None, prefix)[0]]
+            else:
+                ipv4_dsts = hosts_per_switch[dst_dpid]
+            for ipv4_dst in ipv4_dsts:
+                match = parser.OFPMatch(eth_type=ether_types.ETH_TYPE_IP, ipv4_dst=ipv4_dst)
+                if self.PROACTIVE and out_port is not None:
+                    self.add_flow(datapath, 1, match, self._forward_actions(datapath, dst_dpid, out_port))
+                elif self.PROACTIVE:
+                    self.flow_programmer.send(datapath, parser.OFPFlowMod(
+                        datapath=datapath, command=ofproto.OFPFC_DELETE_STRICT, priority=1,
+                        out_port=ofproto.OFPP_ANY, out_group=ofproto.OFPG_ANY, match=match))
+                else:
+                    self.flow_programmer.send(datapath, parser.OFPFlowMod(
+                        datapath=datapath, command=ofproto.OFPFC_DELETE,
+                        out_port=ofproto.OFPP_ANY, out_group=ofproto.OFPG_ANY, match=match))
+                num_flow_mods += 1
+        self.flow_programmer.flush()
+        if num_routes:
+            self.logger.info("Topology changed: %d routes, %d flow mods", num_routes, num_flow_mods)
+
+    def _setup_routing(self, switches, links):
+        """Compute the routing state once the whole topology is discovered."""
+        self.next_hops = NextHopTable(switches, links)
+        # Where every host is, unless already learned from its first packet
+        for ip, location in self.host_locations().items():
+            self.ipv4_dests.setdefault(ip, location)
+        if self.AGGREGATE_PREFIXES:
+            self.destination_prefixes = destination_prefixes(self.host_locations())
+
+    def host_locations(self):
+        """Where every host of the fat-tree is attached.
+
+        Hosts 10.x.z.i hang off port i - 1 of their edge switch, the downstream
+        ports are handed out in host order (see PortPool).
+
+        Returns:
+            dict: mininet IP of the host -> (dpid of its edge switch, port)
+        """
+        graph = self.topo_net.graph
+        hosts = {}
+        for server in self.topo_net.servers:
+            edge_switch = graph.nodes[graph.neighbors_of(server.index)[0]]
+            dpid = self.id_mapping.get_dpid_int(edge_switch.id)
+            port = int(Address(server.id).octets[3]) - 1
+            hosts[self.id_mapping.get_ip(server.id)] = (dpid, port)
+        return hosts
+
+    def proactive_rules(self):
+        """Forwarding rules for every switch: dpid -> list of (destination host IP, out port)."""
+        return self._next_hop_table().host_rules(self.host_locations())
+
+    def install_proactive_flows(self):
+        """Push the proactive_rules to all switches, matching on the destination IP only."""
+        hosts = self.host_locations()
+        for dpid, rules in self.proactive_rules().items():
+            datapath = self.datapaths.get(dpid)
+            if datapath is None:
+                continue
+            parser = datapath.ofproto_parser
+            for ip, port in rules:
+                match = parser.OFPMatch(eth_type=ether_types.ETH_TYPE_IP, ipv4_dst=ip)
+                self.add_flow(datapath, 1, match, self._forward_actions(datapath, hosts[ip][0], port))
+        self.commit_flows("Proactive flows installed")
+
+    def commit_flows(self, description, dpids=None):
+        """Send the queued messages to the switches dpids (default: all known
+        switches) with a barrier each, and report once all of them applied
+        their messages.
+        """
+        if dpids is None:
+            dpids = list(self.datapaths)
+        start = time.perf_counter()
+        remaining = set(dpids)
+
+        def done(dpid):
+            remaining.discard(dpid)
+            if not remaining:
+                elapsed = (time.perf_counter() - start) * 1000
+                self.logger.info("%s on %d switches in %.2f ms (%d messages in %d writes)",
+                                 description, len(dpids), elapsed,
+                                 self.flow_programmer.num_messages, self.flow_programmer.num_writes)
+
+        for dpid in dpids:
+            datapath = self.datapaths.get(dpid)
+            if datapath is None:
+                done(dpid)
+            else:
+                self.flow_programmer.commit(datapath, lambda dpid=dpid: done(dpid))
+
+    @set_ev_cls(ofp_event.EventOFPBarrierReply, [CONFIG_DISPATCHER, MAIN_DISPATCHER])
+    def barrier_reply_handler(self, ev):
+        self.flow_programmer.barrier_reply(ev.msg.datapath.id, ev.msg.xid)
+
+    def _forward_actions(self, datapath, dst_dpid, out_port):
+        """Actions that forward a packet on datapath towards switch dst_dpid: out
+        of out_port, or with ECMP through the select group for dst_dpid.
+        """
+        parser = datapath.ofproto_parser
+        if self.ECMP and datapath.id != dst_dpid:
+            group_id = self._ecmp_group(datapath, dst_dpid)
+            if group_id is not None:
+                return [parser.OFPActionGroup(group_id)]
+        return [parser.OFPActionOutput(out_port)]
+
+    def _ecmp_group(self, datapath, dst_dpid):
+        """Id of the select group on datapath that hashes flows over the
+        equal-cost paths towards dst_dpid, weighted by the number of shortest
+        paths behind each port. The group is added, or modified if the paths
+        changed, first. None if there is only one path and no group yet.
+
+        The group id is dst_dpid, there is one group per destination switch.
+        """
+        key = (datapath.id, dst_dpid)
+        buckets = self._next_hop_table().ecmp_ports(datapath.id, dst_dpid)
+        installed = self.ecmp_groups.get(key)
+        if installed is None and len(buckets) < 2:
+            return None
+        if installed != buckets:
+            ofproto = datapath.ofproto
+            parser = datapath.ofproto_parser
+            command = ofproto.OFPGC_ADD if installed is None else ofproto.OFPGC_MODIFY
+            # Bucket weights are 16 bits
+            scale = max([1] + [weight / 0xFFFF for _, weight in buckets])
+            self.flow_programmer.send(datapath, parser.OFPGroupMod(
+                datapath, command, ofproto.OFPGT_SELECT, dst_dpid,
+                [parser.OFPBucket(weight=max(1, int(weight / scale)), actions=[parser.OFPActionOutput(port)])
+                 for port, weight in buckets]))
+            self.ecmp_groups[key] = buckets
+        return dst_dpid
+
+    def _refresh_ecmp_groups(self):
+        """Update the installed select groups to the equal-cost paths of the current topology."""
+        for dpid, dst_dpid in list(self.ecmp_groups):
+            datapath = self.datapaths.get(dpid)
+            if datapath is not None and dst_dpid in self._next_hop_table().index:
+                self._ecmp_group(datapath, dst_dpid)
+
+    def _next_hop_table(self) -> NextHopTable:
+        """The next hop table for the current topology, built on first use and
+        kept up to date by update_topology once initialized.
+        """
+        if self.next_hops is None:
+            self.raw_links = self.topology.link_list()
+            self.next_hops = NextHopTable(self.topology.switches, self.raw_links)
+        return self.next_hops
 
     @set_ev_cls(ofp_event.EventOFPSwitchFeatures, CONFIG_DISPATCHER)
     def switch_features_handler(self, ev):
@@ -134,66 +375,78 @@ class SPRouter(app_manager.RyuApp):
         ofproto = datapath.ofproto
         parser = datapath.ofproto_parser
 
-        # Install entry-miss flow entry
+        # Install entry-miss flow entries, table 1 is only used by the two-level pipeline of FTRouter.
+        # With proactive flows only ARP has to come to the controller.
         match = parser.OFPMatch()
         actions = [parser.OFPActionOutput(ofproto.OFPP_CONTROLLER,
                                           ofproto.OFPCML_NO_BUFFER)]
-        self.add_flow(datapath, 0, match, actions)
+        miss_actions = [] if self.PROACTIVE else actions
+        self.add_flow(datapath, 0, match, miss_actions)
+        self.add_flow(datapath, 0, match, miss_actions, table_id=1)
+        # ARP requests are answered by the controller at the switch where they come in
+        self.add_flow(datapath, ARP_PRIORITY, parser.OFPMatch(eth_type=ether_types.ETH_TYPE_ARP), actions)
+        self.flow_programmer.flush(datapath)
 
-    def get_next_hop_dpid(self, src_dpid: str, dst_dpid: str) -> Optional[int]:
-        """Obtain a path (in this cast using a shortest path algorithm) from 
-        the source dpid to the destination dpid.
+    def get_next_hop_dpid(self, src_dpid: int, dst_dpid: int) -> Optional[int]:
+        """Obtain the next switch on a shortest path from the source dpid to
+        the destination dpid, from the precomputed next hop table.
 
         Args:
-            src_dpid (str): dpid of source
-            dst_dpid (str): dpid of destination
+            src_dpid (int): dpid of source
+            dst_dpid (int): dpid of destination
 
         Returns:
-            [type]: [description]
+            Optional[int]: dpid of the next hop, None if src_dpid == dst_dpid
         """
-        path = self._construct_shortest_path(src_dpid, dst_dpid)
-        print("path:")
-        print(path)
-        if len(path) == 0:
-            return None
-        return path[1]
+        return self._next_hop_table().next_hop(src_dpid, dst_dpid)
 
     def _get_flooding_ports(self, dpid, port_in):
-        flood_ports = []
-        raw = self.flood_ports_switches[str(dpid)]
-        for port in raw:
-            flood_ports.append(port["port"])
-        if port_in in flood_ports:
-            flood_ports.remove(port_in)
-        return flood_ports
-
-    def _construct_shortest_path(self, src_dpid, dst_dpid):
-        """Path as list of ids to follow
-        """
-        if src_dpid == dst_dpid:
+        # Until all links are known, ports to other switches could pass for ports to hosts
+        if not self.initialized:
             return []
-        src = None
-        dst = None
-        for switch in self.custom_topo.switches:
-            if switch.id == src_dpid:
-                src = switch
-            if switch.id == dst_dpid:
-                dst = switch
-        tp = topo.Paths(self.custom_topo)
-        path = tp.construct_path(src, dst)
-        path = [x.id for x in path]
-        return path
-
-    # Add a flow entry to the flow-table
-    def add_flow(self, datapath, priority, match, actions):
+        # Flooding follows a spanning tree, not the full network
+        return sorted(self.topology.flood_ports(dpid) - {port_in})
+
+    # Add a flow entry to the flow-table table_id, continuing in goto_table after the actions if given.
+    # The FlowMod is queued in flow_programmer and sent with its next flush.
+    def add_flow(self, datapath, priority, match, actions, table_id=0, goto_table=None,
+                 idle_timeout=0, hard_timeout=0):
         ofproto = datapath.ofproto
         parser = datapath.ofproto_parser
 
         # Construct flow_mod message and send it
-        inst = [parser.OFPInstructionActions(ofproto.OFPIT_APPLY_ACTIONS, actions)]
-        mod = parser.OFPFlowMod(datapath=datapath, priority=priority,
-                                match=match, instructions=inst)
-        datapath.send_msg(mod)
+        inst = []
+        if actions:
+            inst.append(parser.OFPInstructionActions(ofproto.OFPIT_APPLY_ACTIONS, actions))
+        if goto_table is not None:
+            inst.append(parser.OFPInstructionGotoTable(goto_table))
+        # The switch reports removed entries, to keep flow_entries up to date
+        mod = parser.OFPFlowMod(datapath=datapath, table_id=table_id, priority=priority,
+                                idle_timeout=idle_timeout, hard_timeout=hard_timeout,
+                                flags=ofproto.OFPFF_SEND_FLOW_REM, match=match, instructions=inst)
+        self.flow_programmer.send(datapath, mod)
+        self.flow_entries.setdefault(datapath.id, set()).add(_entry_key(table_id, priority, match))
+
+    @set_ev_cls(ofp_event.EventOFPFlowRemoved, MAIN_DISPATCHER)
+    def flow_removed_handler(self, ev):
+        msg = ev.msg
+        entries = self.flow_entries.get(msg.datapath.id)
+        if entries is not None:
+            entries.discard(_entry_key(msg.table_id, msg.priority, msg.match))
+
+    def flow_table_sizes(self):
+        """Number of installed flow entries per dpid."""
+        return {dpid: len(entries) for dpid, entries in self.flow_entries.items()}
+
+    def _report_flow_tables(self):
+        last = None
+        while True:
+            hub.sleep(self.FLOW_REPORT_INTERVAL)
+            sizes = self.flow_table_sizes()
+            if sizes and sizes != last:
+                self.logger.info("Flow entries: %d in total, at most %d per switch, per dpid %s",
+                                 sum(sizes.values()), max(sizes.values()), dict(sorted(sizes.items())))
+                last = sizes
 
     @set_ev_cls(ofp_event.EventOFPPacketIn, MAIN_DISPATCHER)
     def _packet_in_handler(self, ev):
@@ -205,34 +458,18 @@ class SPRouter(app_manager.RyuApp):
 
         in_port = msg.match['in_port']
 
-        pkt = packet.Packet(msg.data)
-        eth = pkt.get_protocols(ethernet.ethernet)[0]
-
-        dst_ip = eth.dst
-        src = eth.src
-
-        dpid = datapath.id
-        self.mac_to_port.setdefault(dpid, {})
-
-        # Parsing the data into a packet
-        pkt = packet.Packet(msg.data)
-
-        # Whether request/response is ARP or IP
-        arp_pkt = pkt.get_protocol(arp.arp)
-        ip_pkt = pkt.get_protocol(ipv4.ipv4)
-
-        # LLDP protocol for the Ryu controller, a.k.a. not needed
-        if not arp_pkt and not ip_pkt or eth.ethertype == ether_types.ETH_TYPE_LLDP:
+        # Only the addresses are needed, read once from the packet without parsing it.
+        # Everything but ARP and IP, e.g. LLDP for the Ryu controller, is not needed.
+        headers = decode(msg.data)
+        if headers is None or not (headers.is_arp or headers.is_ipv4):
             return
 
-        if arp_pkt:
-            src = arp_pkt.src_ip
-            dst_ip = arp_pkt.dst_ip
-        else:
-            src = ip_pkt.src
-            dst_ip = ip_pkt.dst
+        if headers.is_arp and self._handle_arp(datapath, in_port, headers):
+            return
+        src = headers.src_ip
+        dst_ip = headers.dst_ip
 
-        print(f"FROM: {src} TO: {dst_ip}")
+        self.logger.debug("Packet-in on switch %s from %s to %s", dpid, src, dst_ip)
 
         ##### Shortest Path Routing #####
 
@@ -249,16 +486,24 @@ class SPRouter(app_manager.RyuApp):
 
             out_port = self.get_port_of_next_hop(dst_ip, src_dpid, dst_dpid)
 
-            # Add flow from src IP to dst IP when at this switch
-            match = parser.OFPMatch(in_port=in_port, ipv4_dst=dst_ip, ipv4_src=src)
-            actions = [parser.OFPActionOutput(out_port)]
-            print(f"Adding flow, dst: {dst_ip} - src: {src} - in_port: {in_port} - out_port: {out_port}")
-            self.add_flow(datapath, 1, match, actions)
+            # The next hop only depends on the destination: one flow per destination host
+            # at its own switch, and per destination switch (on the prefix of its hosts) elsewhere
+            prefix = self.destination_prefixes.get(dst_dpid) if src_dpid != dst_dpid else None
+            ipv4_dst, priority = ipv4_dst_match(dst_ip, prefix)
+            match = parser.OFPMatch(eth_type=ether_types.ETH_TYPE_IP, ipv4_dst=ipv4_dst)
+            actions = self._forward_actions(datapath, dst_dpid, out_port)
+            self.logger.debug("Adding flow on switch %s, dst: %s - out_port: %s", dpid, ipv4_dst, out_port)
+            self.add_flow(datapath, priority, match, actions,
+                          idle_timeout=self.IDLE_TIMEOUT, hard_timeout=self.HARD_TIMEOUT)
 
             data = msg.data
             out = parser.OFPPacketOut(datapath=datapath, buffer_id=msg.buffer_id,
                                   in_port=in_port, actions=actions, data=data)
-            datapath.send_msg(out) 
+            # The barrier makes the switch install the flow before it forwards the packet,
+            # all in one write
+            self.flow_programmer.barrier(datapath)
+            self.flow_programmer.send(datapath, out)
+            self.flow_programmer.flush(datapath)
             return
         else:
             ##### Flooding using mst (Minimal Spanning Tree) #####
@@ -278,30 +523,49 @@ class SPRouter(app_manager.RyuApp):
 
             out = parser.OFPPacketOut(datapath=datapath, buffer_id=msg.buffer_id,
                                     in_port=in_port, actions=actions, data=data)
-            datapath.send_msg(out)
+            self.flow_programmer.send(datapath, out)
+            self.flow_programmer.flush(datapath)
 
-    def get_port_of_next_hop(self, dst_ip, src_dpid, dst_dpid):
-        next_hop_dpid = self.get_next_hop_dpid(src_dpid, dst_dpid)
-        
-        src_node_id = self.id_mapping.get_node_id_from_dpid(src_dpid)
-        dst_node_id = self.id_mapping.get_node_id_from_dpid(dst_dpid)
+    def _handle_arp(self, datapath, in_port, headers):
+        """Learn the sender of an ARP packet and answer it if it is a request
+        for a known host (see ProxyARP).
+
+        Returns:
+            bool: whether the packet was answered, else it is forwarded as before
+        """
+        src_ip = headers.src_ip
+        src_mac = headers.arp_src_mac
+        # ARP is punted at the first switch, so this is where the sender is attached
+        self.proxy_arp.learn(src_ip, src_mac)
+        if src_ip not in self.ipv4_dests:
+            self.ipv4_dests[src_ip] = (datapath.id, in_port)
+        if headers.arp_opcode != ARP_REQUEST:
+            return False
+        reply = self.proxy_arp.reply(src_mac, src_ip, headers.dst_ip)
+        if reply is None:
+            return False
+        ofproto = datapath.ofproto
+        parser = datapath.ofproto_parser
+        out = parser.OFPPacketOut(datapath=datapath, buffer_id=ofproto.OFP_NO_BUFFER,
+                                  in_port=ofproto.OFPP_CONTROLLER,
+                                  actions=[parser.OFPActionOutput(in_port)], data=reply)
+        self.flow_programmer.send(datapath, out)
+        self.flow_programmer.flush(datapath)
+        return True
 
+    def get_port_of_next_hop(self, dst_ip, src_dpid, dst_dpid):
         # Determine out_port
-        if next_hop_dpid is None:
-                # At destination switch, do lookup of port to destination IP/server
+        if src_dpid == dst_dpid:
+            # At destination switch, do lookup of port to destination IP/server
             out_port = self.ipv4_dests[dst_ip][1]
         else:
-                # Not at destination switch yet, find port of next hop
-            dst_dpid = next_hop_dpid
-            out_port = self._get_out_port(src_dpid, dst_dpid)
+            # Not at destination switch yet, find port of next hop
+            out_port = self._next_hop_table().out_port(src_dpid, dst_dpid)
 
-        print(f"next hop from sw {src_node_id} to sw {dst_node_id} via port {out_port}")
+        self.logger.debug("Next hop from switch %s to switch %s via port %s", src_dpid, dst_dpid, out_port)
         return out_port
 
 
-    def _get_out_port(self, src_dpid, dst_dpid):
-        """Returns the port in src_dpid that leads to dst_dpid
-        """
-        for link in self.raw_links:
-            if link[0] == src_dpid and link[1] == dst_dpid:
-                return link[2]['port']
\ No newline at end of file
+def _entry_key(table_id, priority, match):
+    """Identifies a flow entry, also as reported back in a flow removed message."""
+    return table_id, priority, tuple(sorted(match.items()))
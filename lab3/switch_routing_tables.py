@@ -1,4 +1,4 @@
-from address import Address
+from address import Address, bit_mask
 from id_mapping import IDMapping
 
 
@@ -31,12 +31,22 @@ class SwitchRoutingTables:
 
     Edge switches:
         ***switch: 10.0.0.1
+        10.0.0.2/32 -> 1
+        []
+        10.0.0.3/32 -> 2
+        []
         0.0.0.0/0 -> 0
         [{'suffix': '0.0.0.2/8', 'port': 3}, {'suffix': '0.0.0.3/8', 'port': 4}]
 
         ***switch: 10.0.1.1
+        10.0.1.2/32 -> 1
+        []
+        10.0.1.3/32 -> 2
+        []
         0.0.0.0/0 -> 0
         [{'suffix': '0.0.0.2/8', 'port': 4}, {'suffix': '0.0.0.3/8', 'port': 3}]
+
+    Hosts 10.x.z.i hang off port i - 1 of their edge switch (see PortPool).
     """
 
     def __init__(self, k, links, id_mapping: IDMapping) -> None:
@@ -46,6 +56,8 @@ class SwitchRoutingTables:
         self.id_mapping = id_mapping
         # Routing tables in the form prefix/suffix: output port {"10.2.0.0/24": 0}
         self.prefix_tables = {}
+        # prefix_tables compiled for lookups per switch, see _compile
+        self._lookup_tables = {}
 
         # Generate the tables
         self._generate_core_switch_routing_tables()
@@ -54,24 +66,93 @@ class SwitchRoutingTables:
         # print(self)
 
     def lookup_port(self, src_node_id, dst_node_id):
-        dest_address = Address(dst_node_id)
-        # Match on prefix
-        for i in range(0, len(self.prefix_tables[src_node_id])):
-            row = self.prefix_tables[src_node_id][i]
-            if (dest_address.matches(row["prefix"])):
-                return row["port"]
-                
-            # If no prefix found, do lookup in suffix table linked 
-            # to the last entry of the prefix table (0.0.0.0/0)
-            zero_prefix_reached = i == len(self.prefix_tables[src_node_id]) - 1
-            if (zero_prefix_reached):
-                suffix_table = row["suffix_table"]
-                for suffix_row in suffix_table:
-                    suffix_address = Address(suffix_row["suffix"])
-
-                    if (dest_address.matches(suffix_address, mode="right-handed")):
-                        return suffix_row["port"]
-    
+        """Output port on switch src_node_id for destination dst_node_id, following the
+        longest matching prefix and, for the 0.0.0.0/0 prefix, the longest matching suffix.
+        Returns None if nothing matches.
+        """
+        return self._lookup(self._lookup_table(src_node_id), Address(dst_node_id).value)
+
+    def lookup_many(self, src_node_id, dst_node_ids):
+        """lookup_port for many destinations at once, given as node ids or as
+        32-bit integer addresses. Returns the list of ports.
+        """
+        table = self._lookup_table(src_node_id)
+        return [self._lookup(table, dst if isinstance(dst, int) else Address(dst).value)
+                for dst in dst_node_ids]
+
+    def upward_ports(self, switch):
+        """Ports of an edge or aggregation switch towards the layer above,
+        k/2 + 1 .. k (see PortPool). Core switches have none.
+        """
+        if (Address(switch).is_core_address(self.k)):
+            return []
+        return list(range(self.k // 2 + 1, self.k + 1))
+
+    def failover_ports(self, switch, port):
+        """The port followed by its backups: going up, every other upward
+        port of the switch leads to a path as short, tried in turn after port.
+        Only [port] if there is no alternative.
+        """
+        upward = self.upward_ports(switch)
+        if (port not in upward):
+            return [port]
+        start = upward.index(port)
+        return upward[start:] + upward[:start]
+
+    def live_port(self, switch, port, down_ports):
+        """The first of failover_ports(switch, port) that is not in down_ports, or None."""
+        for failover_port in self.failover_ports(switch, port):
+            if (failover_port not in down_ports):
+                return failover_port
+        return None
+
+    def _lookup_table(self, switch):
+        table = self._lookup_tables.get(switch)
+        if (table is None):
+            table = self._compile(self.prefix_tables[switch])
+            self._lookup_tables[switch] = table
+        return table
+
+    @staticmethod
+    def _compile(rows):
+        """Compile the rows of one switch into (mask, {masked address: (port, suffixes)})
+        pairs, longest prefix first, where suffixes is None or a list of
+        (mask, {masked address: port}) pairs for the right-handed suffix match.
+        A lookup then costs one dict access per distinct prefix (suffix) length.
+        """
+        prefixes = {}
+        for row in rows:
+            prefix = row["prefix"]
+            suffixes = None
+            if (row["suffix_table"]):
+                by_length = {}
+                for suffix_row in row["suffix_table"]:
+                    suffix = Address(suffix_row["suffix"])
+                    mask = bit_mask(suffix.prefix_len, "right-handed")
+                    by_length.setdefault(suffix.prefix_len, {}).setdefault(suffix.value & mask, suffix_row["port"])
+                suffixes = [(bit_mask(length, "right-handed"), by_length[length])
+                            for length in sorted(by_length, reverse=True)]
+            mask = bit_mask(prefix.prefix_len)
+            # The first row wins for equal prefixes, as in the linear table
+            prefixes.setdefault(prefix.prefix_len, {}).setdefault(prefix.value & mask, (row["port"], suffixes))
+        return [(bit_mask(length), prefixes[length]) for length in sorted(prefixes, reverse=True)]
+
+    @staticmethod
+    def _lookup(table, value):
+        for mask, entries in table:
+            entry = entries.get(value & mask)
+            if (entry is None):
+                continue
+            port, suffixes = entry
+            if (suffixes is None):
+                return port
+            for suffix_mask, suffix_entries in suffixes:
+                suffix_port = suffix_entries.get(value & suffix_mask)
+                if (suffix_port is not None):
+                    return suffix_port
+            return None
+        return None
+
     def _generate_core_switch_routing_tables(self):
         k = self.k
         for j in range(1, int(k/2) + 1):
@@ -112,6 +193,11 @@ class SwitchRoutingTables:
             for switch in range(0, int(k/2)): # 2 switches 10.x.(0 or 1).1
                 z = switch
 
+                for host_id in range(2, int(k/2)+2):
+                    i = host_id
+                    # Hosts directly connected to the edge switch
+                    self._addPrefix(f"10.{x}.{z}.1", f"10.{x}.{z}.{i}/32", i - 1)
+
                 self._addPrefix(f"10.{x}.{z}.1", f"0.0.0.0/0", 0)
     
                 for host_id in range(2, int(k/2)+2):
@@ -123,6 +209,7 @@ class SwitchRoutingTables:
     def _addPrefix(self, switch, prefix, port):
         prefix_addr = Address(prefix)
         self.prefix_tables.setdefault(switch, [])
+        self._lookup_tables.pop(switch, None)
 
         self.prefix_tables[switch].append({
             "prefix": prefix_addr,
@@ -133,6 +220,7 @@ class SwitchRoutingTables:
 
     def _addSuffix(self, switch, suffix, port):
         last_index = len(self.prefix_tables[switch]) - 1
+        self._lookup_tables.pop(switch, None)
         self.prefix_tables[switch][last_index]["suffix_table"].append({
             "suffix": suffix,
             "port": port
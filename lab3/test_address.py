@@ -25,6 +25,33 @@ class TestAddress(unittest.TestCase):
         assert not Address("10.0.2.1").matches(Address("0.0.0.2/8"), mode="right-handed")
         assert not Address("10.0.2.2").matches(Address("0.0.0.1/8"), mode="right-handed")
 
+    def test_masks(self):
+        assert Address("10.3.1.1").matches(Address("0.0.0.0/0"))
+        assert Address("10.3.1.1").matches(Address("10.3.1.1/32"))
+        assert not Address("10.3.1.2").matches(Address("10.3.1.1/32"))
+        assert Address("10.3.1.2").matches(Address("0.0.1.2/16"), mode="right-handed")
+        # Without mask there is nothing to match against
+        assert not Address("10.3.1.1").matches(Address("10.3.1.1"))
+
+    def test_value(self):
+        addr = Address("10.0.1.1/24")
+        assert addr.value == 0x0A000101 and addr.prefix_len == 24
+        assert addr.mask == "24" and addr.octets[2] == "1"
+        assert Address("10.0.1.1").prefix_len == -1
+        # Parsed addresses are interned
+        assert Address("10.0.1.1/24") is addr
+        assert Address.from_int(0x0A000101, 24) is addr
+        # so they cannot be changed
+        with self.assertRaises(AttributeError):
+            addr.prefix_len = 16
+        assert Address("10.0.1.1/24").prefix_len == 24
+
+    def test_match_many(self):
+        values = [int(Address(ip)) for ip in ["10.0.1.2", "10.1.1.2", "10.0.0.3"]]
+        assert Address.match_many(values, Address("10.0.0.0/16")) == [True, False, True]
+        assert Address.match_many(values, Address("0.0.0.2/8"), mode="right-handed") == [True, True, False]
+        assert Address.match_many(values, Address("10.0.0.0")) == [False] * 3
+
     def test_is_host_address(self):
         k = 4
         assert Address("10.0.0.2").is_host_address(k)
@@ -35,6 +62,13 @@ class TestAddress(unittest.TestCase):
         assert not Address("10.0.0.1").is_host_address(k)
         assert not Address("10.0.1.1").is_host_address(k)
 
+    def test_is_core_address(self):
+        assert Address("10.4.1.2").is_core_address(4)
+        assert not Address("10.4.1.2").is_core_address(8)
+        assert Address("10.8.3.4").is_core_address(8)
+        assert not Address("10.4.1.2").is_host_address(4)
+        assert Address("10.4.1.2").is_host_address(8)
+
     def test_is_pod_address(self):
         k = 4
         assert Address("10.0.0.1").is_pod_address(k)
@@ -0,0 +1,93 @@
+import unittest
+import topo
+from address import Address
+from port_pool import PortPool
+from switch_routing_tables import SwitchRoutingTables
+from detours import affected_hosts, find_detours, hosts_below
+
+def fat_tree_neighbors(k):
+    """switch node id -> {port: neighbor switch node id}, numbered as in fat_tree.py."""
+    fattree = topo.Fattree(k)
+    port_pool = PortPool(k)
+    switches = {switch.id for switch in fattree.switches}
+    neighbors = {switch: {} for switch in switches}
+    for switch in fattree.switches:
+        for edge in switch.edges:
+            a, b = edge.lnode.id, edge.rnode.id
+            if a not in switches or b not in switches or a != switch.id:
+                continue
+            for src, dst in ((a, b), (b, a)):
+                src_addr, dst_addr = Address(src), Address(dst)
+                # Core switches have port pod + 1 to every pod
+                port = int(dst_addr.octets[1]) + 1 if src_addr.is_core_address(k) else port_pool.get_free_port(src_addr, dst_addr)
+                neighbors[src][port] = dst
+    return fattree, neighbors
+
+def route(tables, neighbors, down_ports, detours, switch, host):
+    """Follow the routes from switch to host, returns whether it is reached."""
+    octets = Address(host).octets
+    edge_switch = f"{octets[0]}.{octets[1]}.{octets[2]}.1"
+    for _ in range(10):
+        port = detours.get(switch, {}).get(host)
+        if port is None:
+            port = tables.lookup_port(switch, host)
+            down = down_ports.get(switch, set())
+            if port in down:
+                port = tables.live_port(switch, port, down)
+        if port is None or port in down_ports.get(switch, set()):
+            return False
+        if switch == edge_switch:
+            return port == int(octets[3]) - 1
+        switch = neighbors[switch][port]
+    return False
+
+class TestDetours(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tables = SwitchRoutingTables(4, [], None)
+        cls.fattree, cls.neighbors = fat_tree_neighbors(4)
+        cls.hosts = [server.id for server in cls.fattree.servers]
+
+    def fail(self, down_ports, a, b):
+        """Mark the link between switch a and b down on both ends."""
+        for src, dst in ((a, b), (b, a)):
+            port = [port for port, neighbor in self.neighbors[src].items() if neighbor == dst][0]
+            down_ports.setdefault(src, set()).add(port)
+
+    def test_hosts_below(self):
+        assert hosts_below(4, "10.1.0.1", self.hosts) == ["10.1.0.2", "10.1.0.3"]
+        assert len(hosts_below(4, "10.1.3.1", self.hosts)) == 4
+        assert hosts_below(4, "10.1.1.2", self.hosts) == ["10.1.1.2"]
+        assert hosts_below(4, "10.4.1.1", self.hosts) == []
+
+    def test_no_failures(self):
+        assert find_detours(self.tables, self.neighbors, {}, self.hosts) == {}
+
+    def test_upward_failover(self):
+        # The edge switch fails over by itself, the switches that route down
+        # through the aggregation switch above have to stay away from it
+        down_ports = {}
+        self.fail(down_ports, "10.0.0.1", "10.0.2.1")
+        affected = affected_hosts(self.tables, self.neighbors, down_ports, self.hosts)
+        assert affected == ["10.0.0.2", "10.0.0.3"]
+        detours = find_detours(self.tables, self.neighbors, down_ports, affected)
+        assert detours["10.0.2.1"] == {"10.0.0.2": 2, "10.0.0.3": 2}
+        assert "10.0.0.1" not in detours
+        for switch in self.neighbors:
+            for host in self.hosts:
+                assert route(self.tables, self.neighbors, down_ports, detours, switch, host)
+
+    def test_core_link(self):
+        down_ports = {}
+        self.fail(down_ports, "10.4.1.1", "10.2.2.1")
+        self.fail(down_ports, "10.1.0.1", "10.1.3.1")
+        affected = affected_hosts(self.tables, self.neighbors, down_ports, self.hosts)
+        detours = find_detours(self.tables, self.neighbors, down_ports, affected)
+        assert "10.4.1.1" in detours
+        for switch in self.neighbors:
+            for host in self.hosts:
+                assert route(self.tables, self.neighbors, down_ports, detours, switch, host)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,26 @@
+import unittest
+from address import Address
+from flow_aggregation import destination_prefixes, ipv4_dst_match
+
+class TestFlowAggregation(unittest.TestCase):
+
+    def test_fat_tree(self):
+        # k = 8: hosts 10.x.z.2 .. 10.x.z.5 on edge switch 10.x.z.1
+        hosts = {f"10.{x}.{z}.{i}": (x * 4 + z, i - 1) for x in range(8) for z in range(4) for i in range(2, 6)}
+        prefixes = destination_prefixes(hosts)
+        assert len(prefixes) == 32
+        assert prefixes[5] == Address("10.1.1.0/29")
+        for ip, (dpid, _) in hosts.items():
+            assert Address(ip).matches(prefixes[dpid])
+
+    def test_interleaved(self):
+        # The prefix of switch 1 would cover the host of switch 2
+        hosts = {"10.0.0.2": (1, 1), "10.0.0.5": (1, 2), "10.0.0.3": (2, 1)}
+        assert destination_prefixes(hosts) == {2: Address("10.0.0.3/32")}
+
+    def test_ipv4_dst_match(self):
+        assert ipv4_dst_match("10.0.1.3") == ("10.0.1.3", 33)
+        assert ipv4_dst_match("10.0.1.3", Address("10.0.1.0/29")) == (("10.0.1.0", "255.255.255.248"), 30)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,53 @@
+import unittest
+from flow_compiler import FlowEntry, GroupEntry, compile_failover_groups, compile_two_level_table, dotted_mask
+from switch_routing_tables import SwitchRoutingTables
+
+class TestFlowCompiler(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tables = SwitchRoutingTables(4, [], None)
+
+    def test_dotted_mask(self):
+        assert dotted_mask(24) == "255.255.255.0"
+        assert dotted_mask(0) == "0.0.0.0"
+        assert dotted_mask(32) == "255.255.255.255"
+        assert dotted_mask(8, "right-handed") == "0.0.0.255"
+        assert dotted_mask(16, "right-handed") == "0.0.255.255"
+
+    def test_core(self):
+        entries = compile_two_level_table(self.tables.prefix_tables["10.4.1.1"])
+        assert len(entries) == 4
+        assert entries[2] == FlowEntry(0, 17, ("10.2.0.0", "255.255.0.0"), out_port=3)
+
+    def test_aggr(self):
+        entries = compile_two_level_table(self.tables.prefix_tables["10.0.3.1"])
+        assert entries == [
+            FlowEntry(0, 25, ("10.0.0.0", "255.255.255.0"), out_port=1),
+            FlowEntry(0, 25, ("10.0.1.0", "255.255.255.0"), out_port=2),
+            FlowEntry(0, 1, ("0.0.0.0", "0.0.0.0"), goto_table=1),
+            FlowEntry(1, 9, ("0.0.0.2", "0.0.0.255"), out_port=4),
+            FlowEntry(1, 9, ("0.0.0.3", "0.0.0.255"), out_port=3),
+        ]
+
+    def test_edge(self):
+        entries = compile_two_level_table(self.tables.prefix_tables["10.1.0.1"])
+        assert entries[:2] == [
+            FlowEntry(0, 33, ("10.1.0.2", "255.255.255.255"), out_port=1),
+            FlowEntry(0, 33, ("10.1.0.3", "255.255.255.255"), out_port=2),
+        ]
+        assert [entry.table_id for entry in entries] == [0, 0, 0, 1, 1]
+
+    def test_failover_groups(self):
+        failover = {port: self.tables.failover_ports("10.0.0.1", port) for port in self.tables.upward_ports("10.0.0.1")}
+        assert compile_failover_groups(failover) == [GroupEntry(3, (3, 4)), GroupEntry(4, (4, 3))]
+        entries = compile_two_level_table(self.tables.prefix_tables["10.0.0.1"], failover)
+        # Up through the groups, down to the hosts directly
+        assert entries[0] == FlowEntry(0, 33, ("10.0.0.2", "255.255.255.255"), out_port=1)
+        assert entries[3:] == [
+            FlowEntry(1, 9, ("0.0.0.2", "0.0.0.255"), group_id=3),
+            FlowEntry(1, 9, ("0.0.0.3", "0.0.0.255"), group_id=4),
+        ]
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,92 @@
+import unittest
+from flow_programmer import FlowProgrammer
+
+class Message:
+    """Stands in for an OpenFlow message: its payload is its name."""
+    def __init__(self, name):
+        self.name = name
+        self.xid = None
+        self.buf = None
+
+    def serialize(self):
+        self.buf = self.name.encode()
+
+class Parser:
+    @staticmethod
+    def OFPBarrierRequest(datapath):
+        return Message("|")
+
+class Datapath:
+    """The parts of a Ryu datapath that FlowProgrammer uses, recording the writes."""
+    ofproto_parser = Parser
+
+    def __init__(self, id):
+        self.id = id
+        self.xid = 0
+        self.writes = []
+        self.connected = True
+
+    def set_xid(self, msg):
+        self.xid += 1
+        msg.xid = self.xid
+        return self.xid
+
+    def send(self, buf):
+        if self.connected:
+            self.writes.append(buf)
+        return self.connected
+
+class TestFlowProgrammer(unittest.TestCase):
+
+    def test_batching(self):
+        programmer = FlowProgrammer()
+        datapath = Datapath(1)
+        for name in ["a", "b", "c"]:
+            programmer.send(datapath, Message(name))
+        assert datapath.writes == []
+        assert programmer.flush()
+        assert datapath.writes == [b"abc"]
+        # Nothing left to write
+        programmer.flush(datapath)
+        assert datapath.writes == [b"abc"]
+
+    def test_max_write_bytes(self):
+        programmer = FlowProgrammer()
+        programmer.MAX_WRITE_BYTES = 4
+        datapath = Datapath(1)
+        for name in ["ab", "cd", "e"]:
+            programmer.send(datapath, Message(name))
+        # Flushed on its own once the queue is full
+        assert datapath.writes == [b"abcd"]
+        programmer.send(datapath, Message("fghij"))
+        programmer.flush(datapath)
+        assert datapath.writes == [b"abcd", b"e", b"fghij"]
+
+    def test_barrier(self):
+        programmer = FlowProgrammer()
+        datapaths = [Datapath(1), Datapath(2)]
+        done = []
+        programmer.send(datapaths[0], Message("flow"))
+        xid = programmer.commit(datapaths[0], lambda: done.append(1))
+        programmer.commit(datapaths[1], lambda: done.append(2))
+        # The barrier is written right after the flow, in the same write
+        assert datapaths[0].writes == [b"flow|"]
+        assert programmer.pending_barriers(1) == 1 and done == []
+
+        assert not programmer.barrier_reply(2, xid + 1)
+        assert programmer.barrier_reply(1, xid)
+        assert done == [1] and programmer.pending_barriers(1) == 0
+        # Every reply is handled once
+        assert not programmer.barrier_reply(1, xid)
+
+    def test_disconnected(self):
+        programmer = FlowProgrammer()
+        datapath = Datapath(1)
+        datapath.connected = False
+        programmer.send(datapath, Message("flow"))
+        programmer.barrier(datapath, lambda: self.fail("no reply from a disconnected switch"))
+        assert not programmer.flush(datapath)
+        assert programmer.pending_barriers(1) == 0
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,46 @@
+import socket
+import struct
+import unittest
+from headers import ETH_TYPE_IP, ETH_TYPE_LLDP, decode
+from proxy_arp import ARP_REQUEST, arp_frame
+
+def ipv4_frame(src_ip, dst_ip, vlan=None):
+    ethernet = bytes.fromhex("00000a000102" "00000a000002")
+    if vlan is not None:
+        ethernet += struct.pack("!HH", 0x8100, vlan)
+    ethernet += struct.pack("!H", ETH_TYPE_IP)
+    # Version 4, 20 byte header, TTL 64, ICMP, no checksum
+    ip = struct.pack("!BBHHHBBH4s4s", 0x45, 0, 20, 0, 0, 64, 1, 0,
+                     socket.inet_aton(src_ip), socket.inet_aton(dst_ip))
+    return ethernet + ip
+
+class TestHeaders(unittest.TestCase):
+
+    def test_arp(self):
+        headers = decode(arp_frame(ARP_REQUEST, "00:00:0a:00:00:02", "10.0.0.2", "00:00:00:00:00:00", "10.0.1.2"))
+        assert headers.is_arp and not headers.is_ipv4
+        assert headers.eth_src == "00:00:0a:00:00:02"
+        assert headers.arp_opcode == ARP_REQUEST
+        assert headers.arp_src_mac == "00:00:0a:00:00:02"
+        assert (headers.src_ip, headers.dst_ip) == ("10.0.0.2", "10.0.1.2")
+
+    def test_ipv4(self):
+        for vlan in [None, 5]:
+            headers = decode(ipv4_frame("10.0.0.2", "10.3.1.3", vlan))
+            assert headers.is_ipv4 and headers.ethertype == ETH_TYPE_IP
+            assert headers.eth_dst == "00:00:0a:00:01:02"
+            assert (headers.src_ip, headers.dst_ip) == ("10.0.0.2", "10.3.1.3")
+            assert headers.arp_opcode is None and headers.arp_src_mac is None
+
+    def test_other(self):
+        headers = decode(bytes(12) + struct.pack("!H", ETH_TYPE_LLDP) + bytes(20))
+        assert headers.ethertype == ETH_TYPE_LLDP
+        assert headers.src_ip is None and headers.dst_ip is None
+        # Too short for the headers
+        assert decode(bytes(10)) is None
+        assert decode(ipv4_frame("10.0.0.2", "10.0.0.3")[:30]) is None
+        assert decode(bytearray(arp_frame(ARP_REQUEST, "00:00:0a:00:00:02", "10.0.0.2",
+                                          "00:00:00:00:00:00", "10.0.1.2"))[:40]) is None
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,41 @@
+import unittest
+from id_mapping import IDMapping
+import topo
+
+class TestIDMapping(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.id_mapping = IDMapping(topo.Fattree(4))
+
+    def test_hosts(self):
+        id_mapping = self.id_mapping
+        assert id_mapping.get_mininet_id("10.0.0.2") == "h0"
+        assert id_mapping.get_dpid("10.0.0.3") == "1"
+        assert id_mapping.get_ip("10.1.0.2") == "10.1.0.2"
+        assert id_mapping.get_node_id_from_ip("10.1.0.2") == "10.1.0.2"
+        assert id_mapping.get_node_id_from_ip("10.9.0.2") is None
+        assert id_mapping.get_mac("10.1.0.2") == "00:00:0a:01:00:02"
+        with self.assertRaises(KeyError):
+            id_mapping.get_ip("10.0.2.1")
+
+    def test_switches(self):
+        id_mapping = self.id_mapping
+        dpid = id_mapping.get_dpid_int("10.0.2.1")
+        assert dpid >= 16 and id_mapping.get_dpid("10.0.2.1") == str(dpid)
+        assert id_mapping.get_mininet_id("10.0.2.1") == f"s{dpid}"
+        assert id_mapping.get_node_id_from_dpid(dpid) == "10.0.2.1"
+        assert id_mapping.get_node_id_from_dpid(str(dpid)) == "10.0.2.1"
+        assert id_mapping.get_node_id_from_dpid(1000) is None
+        assert id_mapping.get_dpid("10.9.9.9") is None
+
+    def test_bulk(self):
+        id_mapping = self.id_mapping
+        node_ids = ["10.0.0.2", "10.4.1.1", "10.9.9.9"]
+        dpids = id_mapping.bulk_dpids(node_ids)
+        assert list(dpids) == [0, id_mapping.get_dpid_int("10.4.1.1"), -1]
+        assert id_mapping.bulk_node_ids_from_dpids(dpids[:2]) == node_ids[:2]
+        assert id_mapping.bulk_ips(node_ids) == ["10.0.0.2", None, None]
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,60 @@
+import unittest
+import topo
+from kruskal import SpanningTree, kruskal
+from topo import DisjointSet
+
+def both_ways(links):
+    """Links as reported by Ryu: once per direction, with the port on the source switch."""
+    reported = []
+    for a, port_a, b, port_b in links:
+        reported.append((a, b, {'port': port_a}))
+        reported.append((b, a, {'port': port_b}))
+    return reported
+
+class TestKruskal(unittest.TestCase):
+
+    def test_ring(self):
+        ring = both_ways([(1, 1, 2, 2), (2, 1, 3, 2), (3, 1, 4, 2), (4, 1, 1, 2)])
+        tree = kruskal([1, 2, 3, 4], ring)
+        assert len(tree) == 3
+        # The last link of the ring closes a cycle
+        assert (4, 1, {'port': 1}) not in tree
+
+    def test_weights(self):
+        edges = [(1, 2, 5), (2, 3, 1), (1, 3, 2)]
+        tree = kruskal([1, 2, 3], edges, weight=lambda edge: edge[2])
+        assert tree == [(2, 3, 1), (1, 3, 2)]
+
+    def test_spanning_tree(self):
+        # Ring 0 - 1 - 2 - 3 - 0
+        tree = SpanningTree(4)
+        adjacency = [{1, 3}, {0, 2}, {1, 3}, {2, 0}]
+        assert [tree.add_link(u, v) for u, v in [(0, 1), (1, 2), (2, 3), (3, 0)]] == [True, True, True, False]
+        assert tree.count == 1
+        # The link 3 - 0 takes over from 0 - 1
+        adjacency[0].discard(1)
+        adjacency[1].discard(0)
+        tree.remove_link(0, 1, adjacency)
+        assert tree.tree == [{3}, {2}, {1, 3}, {2, 0}] and tree.count == 1
+        # Without another link between both sides the tree splits
+        adjacency[2].discard(3)
+        adjacency[3].discard(2)
+        tree.remove_link(2, 3, adjacency)
+        assert tree.count == 2
+        assert tree.add_link(1, 0)
+        assert not tree.add_link(2, 3)
+
+    def test_fat_tree(self):
+        fattree = topo.Fattree(8)
+        graph = fattree.graph
+        switches = [switch.index for switch in fattree.switches]
+        links = [(s, n, {'port': n}) for s in switches for n in graph.neighbors_of(s)
+                 if graph.node_types[n] == topo.NodeType.SWITCH.value]
+        tree = kruskal(switches, links)
+        assert len(tree) == len(switches) - 1
+        forest = DisjointSet(graph.num_nodes)
+        for u, v, _ in tree:
+            assert forest.union(u, v)
+
+if __name__ == '__main__':
+    unittest.main()
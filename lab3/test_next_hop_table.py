@@ -0,0 +1,97 @@
+import unittest
+from next_hop_table import NextHopTable
+from topology_manager import TopologyManager
+
+def both_ways(links):
+    """Links as reported by Ryu: once per direction, with the port on the source switch."""
+    reported = []
+    for a, port_a, b, port_b in links:
+        reported.append((a, b, {'port': port_a}))
+        reported.append((b, a, {'port': port_b}))
+    return reported
+
+class TestNextHopTable(unittest.TestCase):
+
+    def test_line(self):
+        table = NextHopTable([1, 2, 3], both_ways([(1, 3, 2, 1), (2, 2, 3, 1)]))
+        assert table.next_hop(1, 3) == 2 and table.out_port(1, 3) == 3
+        assert table.next_hop(3, 1) == 2 and table.out_port(3, 1) == 1
+        assert table.next_hop(2, 3) == 3 and table.out_port(2, 3) == 2
+        assert table.next_hop(2, 2) is None and table.out_port(2, 2) is None
+
+    def test_shortest(self):
+        # Ring 1 - 2 - 3 - 4 - 5 - 1, the way around from 1 to 4 is one hop shorter via 5
+        ring = [(1, 1, 2, 2), (2, 1, 3, 2), (3, 1, 4, 2), (4, 1, 5, 2), (5, 1, 1, 2)]
+        table = NextHopTable([1, 2, 3, 4, 5], both_ways(ring))
+        assert table.next_hop(1, 4) == 5 and table.out_port(1, 4) == 2
+        assert table.next_hop(1, 3) == 2 and table.out_port(1, 3) == 1
+        assert table.next_hop(5, 3) == 4
+
+    def test_unreachable(self):
+        table = NextHopTable([1, 2, 3], both_ways([(1, 1, 2, 1)]))
+        assert table.next_hop(1, 3) is None and table.out_port(3, 1) is None
+        assert table.next_hop(1, 2) == 2
+
+    def test_ecmp_ports(self):
+        # Two equal-cost paths from 1 to 4, via 2 and via 3, and two more behind 3 via 5 and 6
+        square = [(1, 1, 2, 1), (1, 2, 3, 1), (2, 2, 4, 1), (3, 2, 5, 1), (3, 3, 6, 1),
+                  (5, 2, 7, 1), (6, 2, 7, 2), (4, 2, 7, 3)]
+        table = NextHopTable([1, 2, 3, 4, 5, 6, 7], both_ways(square))
+        assert table.ecmp_ports(1, 4) == [(1, 1)]
+        assert table.ecmp_ports(3, 7) == [(2, 1), (3, 1)]
+        assert table.ecmp_ports(1, 7) == [(1, 1), (2, 2)]
+        assert table.ecmp_ports(7, 7) == []
+        assert table.out_port(1, 7) in (1, 2)
+
+    def test_host_rules(self):
+        table = NextHopTable([1, 2, 3], both_ways([(1, 3, 2, 1), (2, 2, 3, 1)]))
+        rules = table.host_rules({"10.0.0.1": (1, 1), "10.0.0.2": (3, 2)})
+        assert sorted(rules[1]) == [("10.0.0.1", 1), ("10.0.0.2", 3)]
+        assert sorted(rules[2]) == [("10.0.0.1", 1), ("10.0.0.2", 2)]
+        assert sorted(rules[3]) == [("10.0.0.1", 1), ("10.0.0.2", 2)]
+
+    def test_changed_routes(self):
+        # Ring 1 - 2 - 3 - 4 - 1, as discovered, then the link 1 - 2 goes down
+        manager = TopologyManager()
+        for dpid in range(1, 5):
+            manager.switch_enter(dpid, [1, 2, 3])
+        ring = [(1, 1, 2, 2), (2, 1, 3, 2), (3, 1, 4, 2), (4, 1, 1, 2)]
+        for link in both_ways(ring):
+            manager.link_add(link[0], link[1], link[2]['port'])
+        manager.flush()
+        table = NextHopTable(manager.switches, manager.link_list())
+        previous = NextHopTable(manager.switches, manager.link_list())
+        manager.link_delete(1, 2)
+        manager.link_delete(2, 1)
+        manager.flush()
+        changed = table.apply(manager.link_changes)
+        fresh = NextHopTable(manager.switches, manager.link_list())
+
+        # 1 and 2 now reach each other the other way around the ring
+        assert (1, 2, 2) in changed and (2, 1, 1) in changed
+        for src, dst, port in changed:
+            assert port == table.out_port(src, dst) != previous.out_port(src, dst)
+        # Routes that did not use the link stay
+        assert (4, 1, 2) not in changed and all(src != dst for src, dst, _ in changed)
+        assert table.changed_routes(previous, [1, 2, 3, 4]) == sorted(changed, key=lambda route: (route[1], route[0]))
+        assert table.distances == fresh.distances
+        assert table.ecmp_ports(1, 3) == fresh.ecmp_ports(1, 3) == [(2, 1)]
+
+        # Back up: the routes around the ring are as short, only 1 and 2 take the link again
+        manager.link_add(1, 2, 1)
+        manager.link_add(2, 1, 2)
+        manager.flush()
+        assert table.apply(manager.link_changes) == [(1, 2, 1), (2, 1, 2)]
+        assert table.ecmp_ports(1, 3) == [(1, 1), (2, 1)]
+        # A switch the table does not know needs a new table
+        assert table.apply([(1, 5, 4)]) is None
+
+    def test_changed_routes_unreachable(self):
+        previous = NextHopTable([1, 2, 3], both_ways([(1, 3, 2, 1), (2, 2, 3, 1)]))
+        # Switch 3 left, with its link
+        table = NextHopTable([1, 2], both_ways([(1, 3, 2, 1)]))
+        assert table.changed_routes(previous, [3]) == [(1, 3, None), (2, 3, None)]
+        assert sorted(table.changed_routes(previous, [1, 2])) == [(3, 1, None), (3, 2, None)]
+
+if __name__ == '__main__':
+    unittest.main()
@@ -22,6 +22,12 @@ class TestPortPool(unittest.TestCase):
         assert pool.get_free_port(Address("10.0.0.1"), Address("10.0.0.3")) == 2
         assert pool.get_free_port(Address("10.0.0.1"), Address("10.0.0.4")) == None
 
+    def test_k8(self):
+        pool = PortPool(8)
+        assert pool.get_free_port(Address("10.0.4.1"), Address("10.8.1.1")) == 5
+        assert pool.get_free_port(Address("10.0.4.1"), Address("10.0.3.1")) == 1
+        assert pool.get_free_port(Address("10.0.0.1"), Address("10.0.4.1")) == 5
+
     def test_aggr_upstream(self):
         pool = PortPool(4)
         assert pool.get_free_port(Address("10.0.2.1"), Address("10.4.1.1")) == 3
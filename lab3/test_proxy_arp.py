@@ -0,0 +1,29 @@
+import unittest
+from proxy_arp import ARP_REPLY, ProxyARP, arp_frame
+
+class TestProxyARP(unittest.TestCase):
+
+    def test_frame(self):
+        frame = arp_frame(ARP_REPLY, "00:00:0a:00:01:02", "10.0.1.2", "00:00:0a:00:00:02", "10.0.0.2")
+        assert len(frame) == 14 + 28
+        # Ethernet: to the target, from the sender, ARP
+        assert frame[:14] == bytes.fromhex("00000a000002" "00000a000102" "0806")
+        # Ethernet/IPv4, reply, sender MAC/IP, target MAC/IP
+        assert frame[14:22] == bytes.fromhex("0001" "0800" "06" "04" "0002")
+        assert frame[22:32] == bytes.fromhex("00000a000102" "0a000102")
+        assert frame[32:42] == bytes.fromhex("00000a000002" "0a000002")
+
+    def test_reply(self):
+        proxy_arp = ProxyARP()
+        proxy_arp.add_host("10.0.1.2", "00:00:0a:00:01:02")
+        assert proxy_arp.reply("00:00:0a:00:00:02", "10.0.0.2", "10.0.1.3") is None
+        assert proxy_arp.reply("00:00:0a:00:00:02", "10.0.0.2", "10.0.1.2") == \
+            arp_frame(ARP_REPLY, "00:00:0a:00:01:02", "10.0.1.2", "00:00:0a:00:00:02", "10.0.0.2")
+
+        # Hosts that are not known up front are learned from their ARP packets
+        assert proxy_arp.learn("10.0.1.3", "aa:bb:cc:dd:ee:ff")
+        assert not proxy_arp.learn("10.0.1.3", "aa:bb:cc:dd:ee:ff")
+        assert proxy_arp.reply("00:00:0a:00:00:02", "10.0.0.2", "10.0.1.3")[6:12] == bytes.fromhex("aabbccddeeff")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,54 @@
+import unittest
+from address import Address
+from switch_routing_tables import SwitchRoutingTables
+
+class TestSwitchRoutingTables(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tables = SwitchRoutingTables(4, [], None)
+
+    def test_core(self):
+        assert self.tables.lookup_port("10.4.1.1", "10.0.1.2") == 1
+        assert self.tables.lookup_port("10.4.2.2", "10.3.0.3") == 4
+
+    def test_aggr(self):
+        # Down into the pod on the subnet prefix, up to the core on the host suffix
+        assert self.tables.lookup_port("10.0.2.1", "10.0.1.3") == 2
+        assert self.tables.lookup_port("10.0.2.1", "10.2.0.2") == 3
+        assert self.tables.lookup_port("10.0.3.1", "10.2.0.2") == 4
+
+    def test_edge(self):
+        assert self.tables.lookup_port("10.1.0.1", "10.1.0.3") == 2
+        assert self.tables.lookup_port("10.1.0.1", "10.1.1.3") == 4
+        assert self.tables.lookup_port("10.1.0.1", "10.1.1.4") is None
+
+    def test_k8(self):
+        tables = SwitchRoutingTables(8, [], None)
+        assert tables.lookup_port("10.8.1.1", "10.5.2.3") == 6
+        assert tables.lookup_port("10.0.4.1", "10.0.2.5") == 3
+        assert tables.lookup_port("10.0.2.1", "10.0.2.5") == 4
+        # Up towards the core, spread over ports 5 .. 8 by host byte
+        assert sorted(tables.lookup_port("10.0.5.1", f"10.3.0.{i}") for i in range(2, 6)) == [5, 6, 7, 8]
+
+    def test_failover_ports(self):
+        assert self.tables.upward_ports("10.4.1.1") == []
+        assert self.tables.upward_ports("10.0.0.1") == [3, 4]
+        assert self.tables.failover_ports("10.0.2.1", 4) == [4, 3]
+        # Down is the only way to a host or subnet
+        assert self.tables.failover_ports("10.0.2.1", 1) == [1]
+        tables = SwitchRoutingTables(8, [], None)
+        assert tables.failover_ports("10.3.1.1", 7) == [7, 8, 5, 6]
+        assert tables.live_port("10.3.1.1", 7, {7, 8}) == 5
+        assert tables.live_port("10.3.1.1", 7, {5, 6, 7, 8}) is None
+        assert tables.live_port("10.3.1.1", 7, set()) == 7
+
+    def test_lookup_many(self):
+        hosts = ["10.0.0.2", "10.0.1.3", "10.3.1.2", "10.1.0.3"]
+        for switch in ["10.4.1.2", "10.0.2.1", "10.0.0.1"]:
+            ports = [self.tables.lookup_port(switch, host) for host in hosts]
+            assert self.tables.lookup_many(switch, hosts) == ports
+            assert self.tables.lookup_many(switch, [Address(host).value for host in hosts]) == ports
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,252 @@
+import unittest
+import topo
+
+class TestGraph(unittest.TestCase):
+
+    def test_csr(self):
+        graph = topo.Graph()
+        for _ in range(4):
+            graph.add_node(topo.NodeType.SWITCH.value)
+        graph.add_edge(0, 1)
+        graph.add_edge(0, 2)
+        graph.add_edge(2, 3)
+        assert list(graph.offsets) == [0, 2, 3, 5, 6]
+        assert list(graph.neighbors_of(0)) == [1, 2]
+        assert list(graph.neighbors_of(2)) == [0, 3]
+        assert graph.has_edge(3, 2)
+        assert not graph.has_edge(1, 3)
+        assert graph.find_edge(2, 0) == 1
+        assert graph.find_edge(1, 3) == -1
+
+    def test_remove_and_reuse(self):
+        graph = topo.Graph()
+        for _ in range(3):
+            graph.add_node(topo.NodeType.SWITCH.value)
+        edge_id = graph.add_edge(0, 1)
+        graph.add_edge(1, 2)
+        graph.remove_edge(edge_id)
+        assert graph.num_edges == 1
+        assert graph.degree(0) == 0
+        assert list(graph.neighbors_of(1)) == [2]
+        # The id of the removed link is handed out again
+        assert graph.add_edge(0, 2) == edge_id
+        assert graph.degree(2) == 2
+
+    def test_node_adapter(self):
+        graph = topo.Graph()
+        a = topo.Node(0, "switch", graph)
+        b = topo.Node(1, "server", graph)
+        assert graph.node_types[b.index] == topo.NodeType.SERVER.value
+        edge = a.add_edge(b)
+        assert a.is_neighbor(b) and b.is_neighbor(a)
+        assert b.edges == [edge]
+        assert edge.lnode is a and edge.rnode is b
+        edge.remove()
+        assert a.edges == [] and not a.is_neighbor(b)
+
+    def test_pending_links_and_listeners(self):
+        graph = topo.Graph()
+        for _ in range(3):
+            graph.add_node(topo.NodeType.SWITCH.value)
+        changes = []
+        graph.subscribe(lambda u, v, added: changes.append((u, v, added)))
+        graph.add_edge(0, 1)
+        graph.offsets
+        edge_id = graph.add_edge(1, 2)
+        # Answered before the CSR arrays are rebuilt
+        assert list(graph.neighbors_of(1)) == [0, 2]
+        graph.remove_edge(edge_id)
+        assert graph.degree(2) == 0 and graph.find_edge(1, 2) == -1
+        assert changes == [(0, 1, True), (1, 2, True), (1, 2, False)]
+
+    def test_connectivity(self):
+        graph = topo.Graph()
+        for _ in range(4):
+            graph.add_node(topo.NodeType.SWITCH.value)
+        edge_id = graph.add_edge(0, 1)
+        graph.add_edge(2, 3)
+        assert graph.connected(1, 0) and not graph.connected(1, 2)
+        graph.add_edge(1, 2)
+        assert graph.is_connected()
+        graph.remove_edge(edge_id)
+        assert graph.connected_components() == [[0], [1, 2, 3]]
+        graph.add_node(topo.NodeType.SERVER.value)
+        assert not graph.connected(3, 4) and len(graph.connected_components()) == 3
+
+    def test_disjoint_set(self):
+        components = topo.DisjointSet(4)
+        assert components.union(0, 1)
+        assert components.union(2, 3)
+        assert not components.union(1, 0)
+        assert components.count == 2
+        assert components.find(0) == components.find(1) != components.find(3)
+        assert components.add() == 4 and components.count == 3
+
+
+class TestTopologies(unittest.TestCase):
+
+    def test_fattree_graph(self):
+        k = 4
+        ft_topo = topo.Fattree(k)
+        graph = ft_topo.graph
+        assert graph.num_nodes == len(ft_topo.servers) + len(ft_topo.switches)
+        # k^3/4 host links, k^3/4 edge-aggr links and k^3/4 aggr-core links
+        assert graph.num_edges == 3 * k**3 // 4
+        for switch in ft_topo.switches:
+            assert graph.degree(switch.index) == k
+        for server in ft_topo.servers:
+            assert graph.degree(server.index) == 1
+
+    def test_jellyfish_graph(self):
+        jf_topo = topo.Jellyfish(16, 20, 4)
+        graph = jf_topo.graph
+        for switch in jf_topo.switches:
+            assert graph.degree(switch.index) <= 4
+        for server in jf_topo.servers:
+            assert graph.degree(server.index) == 1
+
+    def test_jellyfish_wiring(self):
+        num_servers, num_switches, num_ports = 686, 245, 14
+        jf_topo = topo.Jellyfish(num_servers, num_switches, num_ports)
+        graph = jf_topo.graph
+        links = set()
+        components = topo.DisjointSet(graph.num_nodes)
+        for edge_id in range(graph.edge_capacity):
+            a, b = graph.endpoints(edge_id)
+            assert a != b and (min(a, b), max(a, b)) not in links
+            links.add((min(a, b), max(a, b)))
+            components.union(a, b)
+        assert components.count == 1
+        # At most one port is left unused in the whole fabric
+        assert num_switches * num_ports - 2 * (graph.num_edges - num_servers) - num_servers <= 1
+
+    def test_jellyfish_expand(self):
+        jf_topo = topo.Jellyfish(40, 20, 6)
+        paths = topo.Paths(jf_topo)
+        for src in range(0, 60, 5):
+            paths.distances(src)
+        jf_topo.expand(5, 2)
+        graph = jf_topo.graph
+        assert len(jf_topo.switches) == 25 and len(jf_topo.servers) == 50
+        for switch in jf_topo.switches:
+            assert graph.degree(switch.index) <= 6
+        assert all(graph.degree(switch.index) == 6 for switch in jf_topo.switches[20:])
+        # The cached distances were repaired instead of dropped
+        assert len(paths._distances) == 12
+        for src in range(0, 60, 5):
+            dist, _ = paths.shortest_paths(src)
+            assert list(paths.distances(src)) == list(dist)
+
+    def test_mininet_topology(self):
+        links = [(1, 2, {'port': 1}), (2, 1, {'port': 1}), (2, 3, {'port': 2}), (3, 2, {'port': 1})]
+        mn_topo = topo.MininetTopology([1, 2, 3], links)
+        # Links reported in both directions only appear once
+        assert mn_topo.graph.num_edges == 2
+        assert mn_topo.switches[1].is_neighbor(mn_topo.switches[2])
+
+
+class TestPaths(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.ft_topo = topo.Fattree(4)
+        cls.paths = topo.Paths(cls.ft_topo)
+
+    def node(self, node_id):
+        for node in self.ft_topo.servers + self.ft_topo.switches:
+            if node.id == node_id:
+                return node
+
+    def test_bfs_distances(self):
+        src = self.node("10.0.0.2")
+        dist, prev = self.paths.shortest_paths(src.index)
+        assert dist[src.index] == 0 and prev[src.index] == -1
+        assert dist[self.node("10.0.0.3").index] == 2
+        assert dist[self.node("10.0.1.2").index] == 4
+        assert dist[self.node("10.3.1.3").index] == 6
+        assert dist[self.node("10.4.1.1").index] == 3
+
+    def test_construct_path(self):
+        path = self.paths.construct_path(self.node("10.0.0.2"), self.node("10.1.0.2"))
+        assert len(path) == 7
+        for a, b in zip(path, path[1:]):
+            assert a.is_neighbor(b)
+        assert self.paths.construct_path(self.node("10.0.0.2"), self.node("10.0.0.2")) == [self.node("10.0.0.2")]
+
+    def test_weighted(self):
+        links = [(0, 1, {'port': 1}), (0, 2, {'port': 2}), (2, 1, {'port': 1}), (1, 3, {'port': 2})]
+        mn_topo = topo.MininetTopology([0, 1, 2, 3], links)
+        # Weights are indexed by edge id, i.e. the order in which the links were added
+        weights = [5, 1, 1, 1]
+        paths = topo.Paths(mn_topo)
+        assert paths.shortest_path(0, 3) == [0, 1, 3]
+        assert paths.shortest_path(0, 3, weights) == [0, 2, 1, 3]
+        dist, _ = paths.shortest_paths(0, weights=weights)
+        assert list(dist) == [0, 2, 1, 3]
+
+    def test_k_shortest_paths(self):
+        src, dst = self.node("10.0.0.2"), self.node("10.1.0.2")
+        num_edges = self.ft_topo.graph.num_edges
+        paths = self.paths.k_shortest_paths(src, dst, 8)
+        assert len(paths) == 8
+        assert [len(path) for path in paths] == sorted(len(path) for path in paths)
+        # (k/2)^2 shortest paths through the core, then detours
+        assert [len(path) for path in paths[:5]] == [7, 7, 7, 7, 9]
+        assert len(set(tuple(path) for path in paths)) == 8
+        for path in paths:
+            assert path[0] == src and path[-1] == dst
+            assert len(set(path)) == len(path)
+        # The topology is not modified
+        assert self.ft_topo.graph.num_edges == num_edges
+        assert len(self.ft_topo.servers) == 16
+
+    def test_n_way_ecmp(self):
+        paths = self.paths.n_way_ecmp(self.node("10.0.0.2"), self.node("10.1.0.2"), 64)
+        assert len(paths) == 4
+        assert all(len(path) == 7 for path in paths)
+        assert len(self.paths.n_way_ecmp(self.node("10.0.0.2"), self.node("10.1.0.2"), 2)) == 2
+        assert len(self.paths.n_way_ecmp(self.node("10.0.0.2"), self.node("10.0.1.2"), 64)) == 2
+
+    def test_shortest_path_dag(self):
+        src, dst = self.node("10.0.0.2"), self.node("10.1.0.2")
+        dag = self.paths.shortest_path_dag(src.index)
+        assert dag.num_paths[dst.index] == 4
+        assert dag.num_paths[self.node("10.0.1.2").index] == 2
+        paths = list(dag.paths(dst.index))
+        assert len(set(tuple(path) for path in paths)) == 4
+        assert list(dag.paths(dst.index, 3)) == paths[:3]
+        assert sorted(dag.path(dst.index, i) for i in range(4)) == sorted(paths)
+        sampled = dag.sample(dst.index, 3)
+        assert len(set(tuple(path) for path in sampled)) == 3
+        assert all(path in paths for path in sampled)
+        assert list(dag.paths(src.index)) == [[src.index]]
+
+    def test_link_load(self):
+        src, dst = self.node("10.0.0.2"), self.node("10.1.0.2")
+        graph = self.ft_topo.graph
+        ecmp_all, ecmp_two, ksp = self.paths.link_load([(src.index, dst.index)], [
+            (topo.RoutingScheme.ECMP, 64),
+            (topo.RoutingScheme.ECMP, 2),
+            (topo.RoutingScheme.K_SHORTEST, 4),
+        ])
+        access_link = graph.directed_link(graph.find_edge(src.index, self.node("10.0.0.1").index), src.index)
+        assert ecmp_all[access_link] == 4 and ecmp_two[access_link] == 2
+        # 4 paths of 6 hops, and the 4 shortest paths are the ECMP paths
+        assert sum(ecmp_all) == 24 and sum(ecmp_two) == 12
+        assert list(ksp) == list(ecmp_all)
+        # Nothing flows back towards the source
+        assert ecmp_all[access_link ^ 1] == 0
+        # Edge-aggr links carry 2 paths, the 8 links through the core 1 path each
+        ranks = self.paths.link_ranks(ecmp_all)
+        assert len(ranks) == 2 * 32
+        assert ranks[-4:] == [2] * 4 and ranks[-12:-4] == [1] * 8 and ranks[-13] == 0
+
+    def test_unreachable(self):
+        mn_topo = topo.MininetTopology([1, 2, 3], [(1, 2, {'port': 1})])
+        paths = topo.Paths(mn_topo)
+        assert paths.is_path(mn_topo.switches[0], mn_topo.switches[1])
+        assert not paths.is_path(mn_topo.switches[0], mn_topo.switches[2])
+        assert paths.shortest_path(0, 2) == []
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,70 @@
+import unittest
+from topology_manager import TopologyManager
+
+def add_links(manager, links):
+    """Add links once per direction, as reported by Ryu."""
+    for a, port_a, b, port_b in links:
+        manager.link_add(a, b, port_a)
+        manager.link_add(b, a, port_b)
+
+class TestTopologyManager(unittest.TestCase):
+
+    def setUp(self):
+        # Ring 1 - 2 - 3 - 4 - 1, port 3 of every switch leads to a host
+        self.manager = TopologyManager()
+        for dpid in range(1, 5):
+            self.manager.switch_enter(dpid, [1, 2, 3])
+        add_links(self.manager, [(1, 1, 2, 2), (2, 1, 3, 2), (3, 1, 4, 2), (4, 1, 1, 2)])
+
+    def test_flush(self):
+        assert self.manager.has_pending
+        assert self.manager.switches == []
+        assert self.manager.flush()
+        assert not self.manager.has_pending
+        assert sorted(self.manager.switches) == [1, 2, 3, 4]
+        assert len(self.manager.link_list()) == 8
+        assert self.manager.is_connected()
+        # Nothing changes if the same link is reported again
+        self.manager.link_add(1, 2, 1)
+        assert not self.manager.flush()
+
+    def test_spanning_tree(self):
+        self.manager.flush()
+        # The last link of the ring closes a cycle
+        assert self.manager.flood_ports(1) == {1, 3}
+        assert self.manager.flood_ports(4) == {2, 3}
+        num_tree_ports = sum(len(self.manager.flood_ports(dpid) - {3}) for dpid in range(1, 5))
+        assert num_tree_ports == 2 * 3
+
+    def test_replace_tree_link(self):
+        self.manager.flush()
+        self.manager.link_delete(1, 2)
+        self.manager.link_delete(2, 1)
+        assert self.manager.flush()
+        assert self.manager.link_changes == [(1, 2, None), (2, 1, None)]
+        assert self.manager.is_connected()
+        # The link between 4 and 1 takes over
+        assert self.manager.flood_ports(1) == {2, 3}
+        assert self.manager.flood_ports(4) == {1, 2, 3}
+        assert self.manager.flood_ports(2) == {1, 3}
+
+    def test_switch_leave(self):
+        self.manager.flush()
+        self.manager.switch_leave(2)
+        assert self.manager.flush()
+        assert sorted(self.manager.switches) == [1, 3, 4]
+        assert sorted(self.manager.link_changes) == [(1, 2, None), (2, 1, None), (2, 3, None), (3, 2, None)]
+        assert len(self.manager.link_list()) == 4
+        assert self.manager.is_connected()
+        assert self.manager.flood_ports(3) == {1, 3}
+        self.manager.switch_leave(3)
+        self.manager.flush()
+        assert self.manager.is_connected()
+        self.manager.link_delete(4, 1)
+        self.manager.link_delete(1, 4)
+        self.manager.flush()
+        assert not self.manager.is_connected()
+        assert self.manager.flood_ports(1) == {3}
+
+if __name__ == '__main__':
+    unittest.main()
@@ -16,78 +16,400 @@
 # under the License.
 
 import sys
+import heapq
 import random
 import queue
 import argparse
+import weakref
+from array import array
+from collections import OrderedDict
 from enum import Enum, auto
 
 class MininetTopology:
 	def __init__(self, switches, edges):
+		self.graph = Graph()
 		self.switches = []
 		self.servers = []
 		for switch in switches:
-			self.switches.append(Node(switch, "switch"))
+			self.switches.append(Node(switch, "switch", self.graph))
 		self.edges = edges
 		self.generate()
 
 	def generate(self):
+		index = {switch.id: switch.index for switch in self.switches}
+		# Ryu reports every link once per direction, each switch pair only gets one link in the graph
+		linked = set()
 		for edge in self.edges:
 			src, dst, _ = edge
-			src_switch = None
-			dst_switch = None
-			for switch in self.switches:
-				if switch.id == src:
-					src_switch = switch
-				if switch.id == dst:
-					dst_switch = switch
-			if not src_switch or not dst_switch:
+			if src not in index or dst not in index:
 				print("switch not found")
-			src_switch.add_edge(dst_switch)
+				continue
+			pair = (min(index[src], index[dst]), max(index[src], index[dst]))
+			if pair in linked:
+				continue
+			linked.add(pair)
+			self.graph.add_edge(index[src], index[dst])
 
 
-# Class for an edge in the graph
-class Edge:
+class Graph:
+    """Undirected graph stored in compressed sparse row (CSR) form.
+
+    Nodes are the integers 0 .. num_nodes - 1 and every link gets an integer
+    edge id. The neighbors of node u are neighbors[offsets[u]:offsets[u + 1]],
+    and edge_ids holds the id of the link to each of those neighbors at the
+    same position. node_types holds one NodeType value (a byte) per node.
+
+    Links can still be added and removed; the CSR arrays are rebuilt lazily the
+    next time they are read, so a batch of changes costs one O(V + E) rebuild.
+    Until then, the per-node queries (degree, neighbors_of, edges_of, ...) patch
+    the old CSR arrays with the links added since, so they stay O(degree).
+
+    Listeners registered with subscribe are called after every link change.
+
+    Connectivity is tracked with a DisjointSet (union-find) that is updated
+    while links are added; removing a link marks it stale and it is rebuilt
+    in O(V + E) the next time connectivity is queried.
+    """
+
     def __init__(self):
-        self.lnode = None
-        self.rnode = None
-    
+        self.node_types = bytearray()
+        # Node objects adapting the integer ids to the Node/Edge API, indexed by node id
+        self.nodes = []
+
+        # Endpoints of every link, indexed by edge id. Removed links are marked
+        # dead in alive and their ids are reused by later calls to add_edge.
+        self.edge_src = array('q')
+        self.edge_dst = array('q')
+        self.alive = bytearray()
+        self._free_edge_ids = []
+        self._num_edges = 0
+
+        self._offsets = array('q', [0])
+        self._neighbors = array('q')
+        self._edge_ids = array('q')
+        self._dirty = False
+        # Links added since the CSR arrays were built, per node id
+        self._pending = {}
+        self._listeners = []
+        self._components = DisjointSet()
+        self._components_stale = False
+
+    @property
+    def num_nodes(self) -> int:
+        return len(self.node_types)
+
+    @property
+    def num_edges(self) -> int:
+        return self._num_edges
+
+    @property
+    def edge_capacity(self) -> int:
+        """Upper bound (exclusive) of the edge ids in use, for sizing per-edge arrays."""
+        return len(self.alive)
+
+    @property
+    def offsets(self) -> array:
+        self._compact()
+        return self._offsets
+
+    @property
+    def neighbors(self) -> array:
+        self._compact()
+        return self._neighbors
+
+    @property
+    def edge_ids(self) -> array:
+        self._compact()
+        return self._edge_ids
+
+    def add_node(self, node_type: int, node=None) -> int:
+        """Add a node with the given type byte and return its id.
+
+        Args:
+            node_type (int): NodeType value of the node
+            node (Node): adapter object to register for the node id, if any
+        """
+        self.node_types.append(node_type)
+        self.nodes.append(node)
+        self._dirty = True
+        self._components.add()
+        return len(self.node_types) - 1
+
+    def add_edge(self, u: int, v: int) -> int:
+        """Add a link between node u and v and return its edge id."""
+        if self._free_edge_ids:
+            edge_id = self._free_edge_ids.pop()
+            self.edge_src[edge_id] = u
+            self.edge_dst[edge_id] = v
+            self.alive[edge_id] = 1
+        else:
+            edge_id = len(self.alive)
+            self.edge_src.append(u)
+            self.edge_dst.append(v)
+            self.alive.append(1)
+        self._num_edges += 1
+        self._dirty = True
+        self._pending.setdefault(u, []).append(edge_id)
+        self._pending.setdefault(v, []).append(edge_id)
+        if not self._components_stale:
+            self._components.union(u, v)
+        self._notify(u, v, True)
+        return edge_id
+
+    def remove_edge(self, edge_id: int) -> None:
+        if not self.alive[edge_id]:
+            return
+        self.alive[edge_id] = 0
+        self._free_edge_ids.append(edge_id)
+        self._num_edges -= 1
+        self._dirty = True
+        self._components_stale = True
+        self._notify(self.edge_src[edge_id], self.edge_dst[edge_id], False)
+
+    def subscribe(self, callback) -> None:
+        """Call callback(u, v, added) after every link between u and v is added (added=True) or removed.
+
+        Bound methods are referenced weakly, subscribing does not keep their object alive.
+        """
+        if hasattr(callback, '__self__'):
+            self._listeners.append(weakref.WeakMethod(callback))
+        else:
+            self._listeners.append(lambda: callback)
+
+    def _notify(self, u: int, v: int, added: bool) -> None:
+        if not self._listeners:
+            return
+        live = []
+        for ref in self._listeners:
+            callback = ref()
+            if callback is not None:
+                live.append(ref)
+                callback(u, v, added)
+        self._listeners = live
+
+    def endpoints(self, edge_id: int) -> tuple:
+        return self.edge_src[edge_id], self.edge_dst[edge_id]
+
+    def other(self, edge_id: int, u: int) -> int:
+        """Return the endpoint of the link that is not u."""
+        src = self.edge_src[edge_id]
+        return self.edge_dst[edge_id] if src == u else src
+
+    def directed_link(self, edge_id: int, u: int) -> int:
+        """Id of link edge_id traversed starting at node u: 2 * edge_id, plus 1 against the link's direction."""
+        return 2 * edge_id + (u != self.edge_src[edge_id])
+
+    def degree(self, u: int) -> int:
+        if self._dirty:
+            return len(self.edges_of(u))
+        offsets = self._offsets
+        return offsets[u + 1] - offsets[u]
+
+    def neighbors_of(self, u: int) -> array:
+        if self._dirty:
+            return array('q', [self.other(edge_id, u) for edge_id in self.edges_of(u)])
+        offsets = self._offsets
+        return self._neighbors[offsets[u]:offsets[u + 1]]
+
+    def edges_of(self, u: int) -> array:
+        offsets = self._offsets
+        if u + 1 >= len(offsets):
+            stale = array('q')
+        else:
+            stale = self._edge_ids[offsets[u]:offsets[u + 1]]
+        if not self._dirty:
+            return stale
+        # The links of u in the old CSR arrays that are still there, plus the ones added since.
+        # A removed link id can have been reused for another link, so the endpoints are checked too.
+        added = self._pending.get(u, ())
+        edge_ids = array('q')
+        for edge_id in stale:
+            if self.alive[edge_id] and edge_id not in added and u in self.endpoints(edge_id):
+                edge_ids.append(edge_id)
+        for edge_id in added:
+            if self.alive[edge_id] and u in self.endpoints(edge_id) and edge_id not in edge_ids:
+                edge_ids.append(edge_id)
+        return edge_ids
+
+    def find_edge(self, u: int, v: int) -> int:
+        """Return the id of a link between u and v, or -1 if there is none."""
+        for edge_id in self.edges_of(u):
+            if self.other(edge_id, u) == v:
+                return edge_id
+        return -1
+
+    def has_edge(self, u: int, v: int) -> bool:
+        return v in self.neighbors_of(u)
+
+    @property
+    def components(self) -> "DisjointSet":
+        """Union-find of the connected components, rebuilt first if links were removed since."""
+        if self._components_stale:
+            components = DisjointSet(self.num_nodes)
+            for edge_id in range(len(self.alive)):
+                if self.alive[edge_id]:
+                    components.union(self.edge_src[edge_id], self.edge_dst[edge_id])
+            self._components = components
+            self._components_stale = False
+        return self._components
+
+    def connected(self, u: int, v: int) -> bool:
+        """Whether there is a path between node u and v."""
+        components = self.components
+        return components.find(u) == components.find(v)
+
+    def is_connected(self) -> bool:
+        return self.components.count <= 1
+
+    def connected_components(self) -> list:
+        """The node ids of every connected component, as lists ordered by node id."""
+        components = self.components
+        groups = {}
+        for u in range(self.num_nodes):
+            groups.setdefault(components.find(u), []).append(u)
+        return list(groups.values())
+
+    def _compact(self) -> None:
+        """Rebuild the CSR arrays from the live links (counting sort on node id)."""
+        if not self._dirty:
+            return
+        num_nodes = self.num_nodes
+        edge_src = self.edge_src
+        edge_dst = self.edge_dst
+        alive = self.alive
+
+        counts = [0] * (num_nodes + 1)
+        for edge_id in range(len(alive)):
+            if alive[edge_id]:
+                counts[edge_src[edge_id] + 1] += 1
+                counts[edge_dst[edge_id] + 1] += 1
+        for u in range(num_nodes):
+            counts[u + 1] += counts[u]
+
+        position = counts[:num_nodes]
+        neighbors = array('q', bytes(8 * counts[num_nodes]))
+        edge_ids = array('q', bytes(8 * counts[num_nodes]))
+        for edge_id in range(len(alive)):
+            if not alive[edge_id]:
+                continue
+            u = edge_src[edge_id]
+            v = edge_dst[edge_id]
+            neighbors[position[u]] = v
+            edge_ids[position[u]] = edge_id
+            position[u] += 1
+            neighbors[position[v]] = u
+            edge_ids[position[v]] = edge_id
+            position[v] += 1
+
+        self._offsets = array('q', counts)
+        self._neighbors = neighbors
+        self._edge_ids = edge_ids
+        self._dirty = False
+        self._pending = {}
+
+class DisjointSet:
+    """Union-find over the integers 0 .. n-1, with path compression and union by size.
+
+    count is the current number of disjoint sets.
+    """
+
+    def __init__(self, n: int = 0):
+        self.parent = array('q', range(n))
+        self.size = array('q', [1]) * n
+        self.count = n
+
+    def add(self) -> int:
+        """Add a new singleton set and return its element."""
+        x = len(self.parent)
+        self.parent.append(x)
+        self.size.append(1)
+        self.count += 1
+        return x
+
+    def find(self, x: int) -> int:
+        parent = self.parent
+        root = x
+        while parent[root] != root:
+            root = parent[root]
+        while parent[x] != root:
+            parent[x], x = root, parent[x]
+        return root
+
+    def union(self, a: int, b: int) -> bool:
+        """Merge the sets of a and b, returns False if they already were the same set."""
+        a = self.find(a)
+        b = self.find(b)
+        if a == b:
+            return False
+        if self.size[a] < self.size[b]:
+            a, b = b, a
+        self.parent[b] = a
+        self.size[a] += self.size[b]
+        self.count -= 1
+        return True
+
+# Class for an edge in the graph, a view on one link of a Graph
+class Edge:
+    def __init__(self, graph: Graph, id: int):
+        self.graph = graph
+        self.id = id
+
+    @property
+    def lnode(self):
+        return self.graph.nodes[self.graph.edge_src[self.id]]
+
+    @property
+    def rnode(self):
+        return self.graph.nodes[self.graph.edge_dst[self.id]]
+
     def remove(self):
-        self.lnode.edges.remove(self)
-        self.rnode.edges.remove(self)
-        self.lnode = None
-        self.rnode = None
+        self.graph.remove_edge(self.id)
+
+    def __eq__(self, other):
+        return isinstance(other, Edge) and self.graph is other.graph and self.id == other.id
+
+    def __hash__(self):
+        return hash(self.id)
 
-# Class for a node in the graph
+# Class for a node in the graph, a view on one node id of a Graph
 class Node:
-    def __init__(self, id, type):
-        self.edges = []
+    def __init__(self, id, type, graph: Graph):
         self.id = id
         self.type: NodeType = type
+        self.graph = graph
+        self.index = graph.add_node(node_type_value(type), self)
+
+    # Edges connected to this node
+    @property
+    def edges(self):
+        return [Edge(self.graph, edge_id) for edge_id in self.graph.edges_of(self.index)]
 
     # Add an edge connected to another node
     def add_edge(self, node):
-        edge = Edge()
-        edge.lnode = self
-        edge.rnode = node
-        self.edges.append(edge)
-        node.edges.append(edge)
-        return edge
+        return Edge(self.graph, self.graph.add_edge(self.index, node.index))
 
     # Remove an edge from the node
     def remove_edge(self, edge):
-        self.edges.remove(edge)
+        edge.remove()
 
     # Decide if another node is a neighbor
     def is_neighbor(self, node):
-        for edge in self.edges:
-            if edge.lnode == node or edge.rnode == node:
-                return True
-        return False
+        return self.graph.has_edge(self.index, node.index)
 
 class NodeType(Enum):
     SWITCH = auto()
     SERVER = auto()
 
+def node_type_value(type) -> int:
+    """Type byte stored in Graph.node_types, for a NodeType or "switch"/"server"."""
+    if isinstance(type, NodeType):
+        return type.value
+    return NodeType[type.upper()].value
+
+class RoutingScheme(Enum):
+    K_SHORTEST = auto()
+    ECMP = auto()
+
 class FattreeType(Enum):
     CORE_SWITCH = auto()
     AGGREGATE_SWITCH = auto()
@@ -95,109 +417,313 @@ class FattreeType(Enum):
     HOST = auto()
 
 class FattreeNode(Node):
-    # def __init__(self, id, type):
-    #     super().__init__(id, type)
-    def __init__(self, id, type, ft_type: FattreeType):
-        super().__init__(id, type)
+    def __init__(self, id, type, ft_type: FattreeType, graph: Graph):
+        super().__init__(id, type, graph)
         self.ft_type = ft_type
 
     def edges_to_str(self) -> str:
         result = ""
-        for edge in self.edges:
-            lnode: FattreeNode = edge.lnode
-            rnode: FattreeNode = edge.rnode
-            other_node = lnode if self != lnode else rnode
+        for neighbor in self.graph.neighbors_of(self.index):
+            other_node: FattreeNode = self.graph.nodes[neighbor]
             result += f"neighbor: {other_node.id}, {other_node.ft_type}\n"
         return result
 
+# The shortest path DAG of one source: all links (u, v) with dist[v] == dist[u] + 1. Every path from the source
+# through the DAG is a shortest path, so it describes all equal-cost paths from the source at once.
+# num_paths[v] is the number of shortest paths from the source to v, counted once by dynamic programming.
+class ShortestPathDAG:
+	def __init__(self, graph, src, dist):
+		self.graph = graph
+		self.src = src
+		self.dist = dist
+
+		# Count the paths level by level, in order of distance from the source
+		levels = []
+		for v in range(len(dist)):
+			d = dist[v]
+			if d < 0:
+				continue
+			while len(levels) <= d:
+				levels.append([])
+			levels[d].append(v)
+		self.num_paths = [0] * len(dist)
+		self.num_paths[src] = 1
+		for level in levels[1:]:
+			for v in level:
+				self.num_paths[v] = sum(self.num_paths[u] for u in self.predecessors(v))
+
+	# predecessors returns the neighbors of v that are one hop closer to the source
+	def predecessors(self, v):
+		d = self.dist[v] - 1
+		return [u for u in self.graph.neighbors_of(v) if self.dist[u] == d]
+
+	# paths lazily generates up to n (all if n is None) shortest paths from the source to dst as lists of node ids
+	def paths(self, dst, n=None):
+		if self.dist[dst] < 0 or n == 0:
+			return
+		if dst == self.src:
+			yield [dst]
+			return
+		# Depth-first search backwards from dst, with one iterator over the predecessors per level
+		found = 0
+		reverse_path = [dst]
+		stack = [iter(self.predecessors(dst))]
+		while stack:
+			u = next(stack[-1], None)
+			if u is None:
+				stack.pop()
+				reverse_path.pop()
+				continue
+			reverse_path.append(u)
+			if u == self.src:
+				yield reverse_path[::-1]
+				found += 1
+				if n is not None and found >= n:
+					return
+				reverse_path.pop()
+			else:
+				stack.append(iter(self.predecessors(u)))
+
+	# path returns the shortest path to dst with the given rank, 0 <= index < num_paths[dst]
+	def path(self, dst, index):
+		reverse_path = [dst]
+		v = dst
+		while v != self.src:
+			for u in self.predecessors(v):
+				if index < self.num_paths[u]:
+					break
+				index -= self.num_paths[u]
+			reverse_path.append(u)
+			v = u
+		return reverse_path[::-1]
+
+	# sample picks min(n, num_paths[dst]) distinct shortest paths to dst uniformly at random,
+	# like hashing flows onto equal-cost paths would
+	def sample(self, dst, n, rng=random):
+		total = self.num_paths[dst]
+		return [self.path(dst, index) for index in rng.sample(range(total), min(n, total))]
+
 class Paths:
+	# Maximum number of sources whose hop distances are cached by distances
+	cache_size = 256
+
 	def __init__(self, topology):
 		self.topology = topology
-
-	# is_path just checks whether there is a path between src and dst.
-	# it implements dijkstra, just like the dijkstra algorithm, but as soon as dst has a distance,
-	# it can be reached and it returns.
-	def is_path(self, src, dst):
-		Q = set()
-		dist = dict()
-		prev = dict()
-		for v in self.topology.servers + self.topology.switches:
-			dist[v] = sys.maxsize - 1
-			prev[v] = None
-			Q.add(v)
-			
+		self.graph: Graph = topology.graph
+		self._distances = OrderedDict()
+		self.graph.subscribe(self._on_graph_change)
+
+	# shortest_paths is the shortest path engine, all other path functions build on it.
+	# It works on the integer node ids of the topology graph and returns two arrays indexed by node id:
+	# dist (-1 if unreachable) and prev (predecessor on a shortest path, -1 for src and unreachable nodes).
+	# Without weights every link has length 1 and a breadth-first search is used, with weights (indexed by
+	# edge id) Dijkstra's algorithm with a binary heap. If dst is given the search stops as soon as dst is settled.
+	# dist and prev can be passed in to reuse preallocated arrays of length num_nodes.
+	# node_mask and edge_mask (indexed by node id and edge id) hide every node or link with a non-zero entry.
+	def shortest_paths(self, src, dst=-1, weights=None, dist=None, prev=None, node_mask=None, edge_mask=None):
+		graph = self.graph
+		num_nodes = graph.num_nodes
+		if dist is None:
+			dist = array('q' if weights is None else 'd', [-1]) * num_nodes
+		else:
+			dist[:] = array(dist.typecode, [-1]) * num_nodes
+		if prev is None:
+			prev = array('q', [-1]) * num_nodes
+		else:
+			prev[:] = array(prev.typecode, [-1]) * num_nodes
+
+		offsets = graph.offsets
+		neighbors = graph.neighbors
+		edge_ids = graph.edge_ids
+		masked = node_mask is not None or edge_mask is not None
+		if masked:
+			if node_mask is None:
+				node_mask = bytes(num_nodes)
+			if edge_mask is None:
+				edge_mask = bytes(graph.edge_capacity)
 		dist[src] = 0
 
-		while len(Q) != 0:
-			# u ← vertex in Q with min dist[u]
-			minimum = sys.maxsize 
-			for element in Q:
-				if dist[element] < minimum: # Get lowest distance value
-					minimum = dist[element]
-					u = element # Set u to the node with the lowest dist value! 
-			# Now, u <- vertex in Q with min dist[u] (although slightly inefficient)
-
-			# remove u from Q
-			Q.remove(u)
-			# for each neighbour v of u...
-			for edge in u.edges:
-				v = edge.lnode if u.id != edge.lnode.id else edge.rnode # Select all neighbours of u
-				if not v in Q:	# only v that are sill in Q
-					continue
-				# alt ← dist[u] + length(u, v), in our case, the length of the edge connecting u and v is always 1!
+		if weights is None:
+			if src == dst:
+				return dist, prev
+			# Breadth-first search, the queue is a list that is only appended to
+			order = [src]
+			head = 0
+			while head < len(order):
+				u = order[head]
+				head += 1
 				alt = dist[u] + 1
-				if alt < dist[v]:
+				for i in range(offsets[u], offsets[u + 1]):
+					v = neighbors[i]
+					if dist[v] >= 0 or (masked and (node_mask[v] or edge_mask[edge_ids[i]])):
+						continue
+					dist[v] = alt
+					prev[v] = u
+					if v == dst:
+						return dist, prev
+					order.append(v)
+			return dist, prev
+
+		# Dijkstra's algorithm with a binary heap and lazy deletion of outdated heap entries
+		done = bytearray(node_mask) if masked else bytearray(num_nodes)
+		heap = [(0, src)]
+		while heap:
+			d, u = heapq.heappop(heap)
+			if done[u]:
+				continue
+			done[u] = 1
+			if u == dst:
+				break
+			for i in range(offsets[u], offsets[u + 1]):
+				v = neighbors[i]
+				if done[v] or (masked and edge_mask[edge_ids[i]]):
+					continue
+				alt = d + weights[edge_ids[i]]
+				if dist[v] < 0 or alt < dist[v]:
 					dist[v] = alt
 					prev[v] = u
+					heapq.heappush(heap, (alt, v))
+		return dist, prev
 
-			if dist[dst] < sys.maxsize - 1:
-				return True
-		return False
+	# shortest_path returns a shortest path from src to dst as a list of node ids, or [] if there is none.
+	def shortest_path(self, src, dst, weights=None):
+		dist, prev = self.shortest_paths(src, dst, weights)
+		return self._walk_back(prev, src, dst)
+
+	def _walk_back(self, prev, src, dst):
+		if dst != src and prev[dst] < 0:
+			return []
+		path = [dst]
+		u = dst
+		while u != src:
+			u = prev[u]
+			path.append(u)
+		path.reverse()
+		return path
+
+	# distances returns the hop distances from src to all nodes (-1 if unreachable), like shortest_paths.
+	# The arrays of the most recently used sources are cached and repaired in place while the graph changes
+	# (see _on_graph_change), callers must not modify them.
+	def distances(self, src):
+		num_nodes = self.graph.num_nodes
+		dist = self._distances.get(src)
+		if dist is None:
+			dist, _ = self.shortest_paths(src)
+			self._distances[src] = dist
+			if len(self._distances) > self.cache_size:
+				self._distances.popitem(last=False)
+			return dist
+		self._distances.move_to_end(src)
+		if len(dist) < num_nodes:
+			# Nodes added since without any link
+			dist.extend(array('q', [-1]) * (num_nodes - len(dist)))
+		return dist
+
+	# _on_graph_change keeps the cached distances valid after the link u - v was added or removed, by
+	# repairing only the distances that change instead of running a new search for every cached source.
+	def _on_graph_change(self, u, v, added):
+		num_nodes = self.graph.num_nodes
+		for dist in self._distances.values():
+			if len(dist) < num_nodes:
+				dist.extend(array('q', [-1]) * (num_nodes - len(dist)))
+			if added:
+				self._repair_added(dist, u, v)
+			else:
+				self._repair_removed(dist, u, v)
+
+	# An added link can only bring nodes closer: if one endpoint gets closer, the improvement is propagated
+	# breadth-first from there and stops at nodes whose distance does not improve.
+	def _repair_added(self, dist, u, v):
+		du, dv = dist[u], dist[v]
+		if du >= 0 and (dv < 0 or du + 1 < dv):
+			start, dist[v] = v, du + 1
+		elif dv >= 0 and (du < 0 or dv + 1 < du):
+			start, dist[u] = u, dv + 1
+		else:
+			return
+		graph = self.graph
+		order = [start]
+		head = 0
+		while head < len(order):
+			x = order[head]
+			head += 1
+			alt = dist[x] + 1
+			for w in graph.neighbors_of(x):
+				if dist[w] < 0 or dist[w] > alt:
+					dist[w] = alt
+					order.append(w)
+
+	# A removed link only matters if it was the last link from the farther endpoint to the level before it.
+	# The affected nodes, whose every shortest path used the link, are collected level by level; then only
+	# they get new distances, from their unaffected neighbors, with a search restricted to the affected nodes.
+	def _repair_removed(self, dist, u, v):
+		du, dv = dist[u], dist[v]
+		if du < 0 or du == dv:
+			return
+		graph = self.graph
+		affected = set()
+
+		def has_predecessor(w):
+			d = dist[w] - 1
+			return any(dist[x] == d and x not in affected for x in graph.neighbors_of(w))
+
+		far = u if du > dv else v
+		if has_predecessor(far):
+			return
+		affected.add(far)
+		order = [far]
+		head = 0
+		while head < len(order):
+			x = order[head]
+			head += 1
+			for w in graph.neighbors_of(x):
+				if dist[w] == dist[x] + 1 and w not in affected and not has_predecessor(w):
+					affected.add(w)
+					order.append(w)
+
+		for x in affected:
+			dist[x] = -1
+		heap = []
+		for x in affected:
+			for w in graph.neighbors_of(x):
+				if dist[w] >= 0 and w not in affected and (dist[x] < 0 or dist[w] + 1 < dist[x]):
+					dist[x] = dist[w] + 1
+			if dist[x] >= 0:
+				heap.append((dist[x], x))
+		heapq.heapify(heap)
+		while heap:
+			d, x = heapq.heappop(heap)
+			if d != dist[x]:
+				continue
+			for w in graph.neighbors_of(x):
+				if w in affected and (dist[w] < 0 or dist[w] > d + 1):
+					dist[w] = d + 1
+					heapq.heappush(heap, (d + 1, w))
+
+	# is_path just checks whether there is a path between src and dst, with the connectivity kept by the graph.
+	def is_path(self, src, dst):
+		return self.graph.connected(src.index, dst.index)
 
-	# Dijkstra's algorithm according to https://en.wikipedia.org/wiki/Dijkstra%27s_algorithm
+	# dijkstra returns the distances and predecessors of all nodes from src, as dicts keyed on Node
+	# (unreachable nodes have distance sys.maxsize - 1 and predecessor None).
 	def dijkstra(self, src):
-		Q = set()
+		dist_array, prev_array = self.shortest_paths(src.index)
+		nodes = self.graph.nodes
 		dist = dict()
 		prev = dict()
-		for v in self.topology.servers + self.topology.switches:
-			dist[v] = sys.maxsize - 1
-			prev[v] = None
-			Q.add(v)
-			
-		dist[src] = 0
-
-		while len(Q) != 0:
-			# u ← vertex in Q with min dist[u]
-			minimum = sys.maxsize 
-			for element in Q:
-				if dist[element] < minimum: # Get lowest distance value
-					minimum = dist[element]
-					u = element # Set u to the node with the lowest dist value! 
-			# Now, u <- vertex in Q with min dist[u] (although slightly inefficient)
-
-			# remove u from Q
-			Q.remove(u)
-		
-
-			# for each neighbour v of u...
-			for edge in u.edges:
-				v = edge.lnode if u.id != edge.lnode.id else edge.rnode # Select all neighbours of u
-				if not v in Q:	# only v that are sill in Q
-					continue
-				# alt ← dist[u] + length(u, v), in our case, the length of the edge connecting u and v is always 1!
-				alt = dist[u] + 1
-				if alt < dist[v]:
-					dist[v] = alt
-					prev[v] = u				
-
+		for v in nodes:
+			d = dist_array[v.index]
+			dist[v] = d if d >= 0 else sys.maxsize - 1
+			p = prev_array[v.index]
+			prev[v] = nodes[p] if p >= 0 else None
 		return dist, prev
 
-	# construct_path will construct the path between src and dst using Dijkstra's algorithm
+	# construct_path will construct a shortest path between src and dst
 	# The path will be returned as a list of nodes
-	# This is also constructed according to https://en.wikipedia.org/wiki/Dijkstra%27s_algorithm
 	def construct_path(self, src, dst, distances=None, prevnodes=None):
 		if distances == None or prevnodes == None or distances[src] != 0:
-			distances, prevnodes = self.dijkstra(src)
+			nodes = self.graph.nodes
+			return [nodes[v] for v in self.shortest_path(src.index, dst.index)]
 		S = [] # S ← empty sequence
 		u = dst # u ← target
 		if prevnodes[u] != None or u == src: #Do something only if the vertex is reachable (should always be the case)
@@ -206,225 +732,177 @@ class Paths:
 				u = prevnodes[u]
 		return S
 
-	# n_way_ecmp implements Yen's algorithm, but as soon as it encounters the next potential path that has a 
-	# longer length than the previous one, it stops and returns the paths.
-	# TODO: copy Yen's from k_shortest_paths and do actually this ^
-	def n_way_ecmp(self, source, sink, n):
-		# paths = self.k_shortest_paths(source, sink, n)
-		# shortest = len(paths[0]) # list should be sorted by length, starting with shortest!
-		# result = []
-		# for path in paths:
-		# 	if len(path) == shortest:
-		# 		result.append(path)
-		# return result
-
-		A = []
-		#Initialize list of lists
-		for i in range(0, n):
-			A.append([])
-		
-		# Determine the shortest path from the source to the sink. 
-		A[0] = self.construct_path(source, sink) 
-
-		# Initialize the set to store the potential kth shortest path. <<< This is a list rather than a set, wikipedia
-		B = []
-		
-		removedEdges = [] # This list will store tuples of Nodes
-		removedNodes = []
-		for k in range(1, n):
-			# print("k:", k)
+	# yen_paths is Yen's algorithm (https://en.wikipedia.org/wiki/Yen%27s_algorithm) on node ids. It yields up
+	# to K loopless paths from src to dst as lists of node ids, shortest first. The topology is never modified:
+	# the spur searches hide the root path nodes and the links of earlier paths with node/edge bitmasks.
+	# Candidate paths are kept in a heap ordered by length and deduplicated with a set.
+	# With equal_cost it stops before the first path that is longer than the shortest one.
+	def yen_paths(self, src, dst, K, equal_cost=False):
+		graph = self.graph
+		if K < 1:
+			return
+		first = self.shortest_path(src, dst)
+		if not first:
+			return
+		yield first
+
+		A = [first]
+		B = [] # heap of (length, insertion counter, path)
+		seen = {tuple(first)}
+		counter = 0
+
+		num_nodes = graph.num_nodes
+		node_mask = bytearray(num_nodes)
+		edge_mask = bytearray(graph.edge_capacity)
+		dist = array('q', [-1]) * num_nodes
+		prev = array('q', [-1]) * num_nodes
+
+		for _ in range(1, K):
+			previous = A[-1]
 			# The spur node ranges from the first node to the next to last node in the previous k-shortest path.
-			for i in range(0, len(A[k-1]) - 2):
-				# Spur node is retrieved from the previous k-shortest path, k − 1.
-				spurnode = A[k-1][i] # Get ith node in path
-
-				# The sequence of nodes from the source to the spur node of the previous k-shortest path.
-				rootpath = A[k-1][0:i]
-				for p in A: # for each path p in A 
-					if len(p) == 0:
-						continue
-					if rootpath == p[0:i]:
-						# Remove the links that are part of the previous shortest paths which share the same root path.
-						# Here, get the edge that connects node i and node i + 1 from the path p and remove it from the graph
-						# pseudocode: remove p.edge(i, i + 1) from Graph;
-						if len(p) < i + 2:
-							continue
-						current = p[i]
-						other = p[i+1]
-						for edge in current.edges:
-							if edge.lnode == other or edge.rnode == other:
-								removedEdges.append((current, other)) # Save to be restored later
-								edge.remove()
-								break
-						
-				for node in rootpath:
-
-					if node == spurnode:
-						continue
-					# remove node from graph
-					# This is hard with the implementation that is given.
-					# A node can be removed from a graph by breaking all the edges that attach to that specific node.
-					# Then, it must be removed from the server/switch list as well!
-					for edge in node.edges:
-						if node not in removedNodes:
-							removedNodes.append(node)
-						removedEdges.append((edge.lnode, edge.rnode))# Save to be restored later
-						edge.remove()
-
-					# if all edges are disbanded, remove the nodes
-					if node.type == "server":
-						self.topology.servers.remove(node)
-					if node.type == "switch":
-						self.topology.switches.remove(node)
+			for i in range(len(previous) - 1):
+				spurnode = previous[i]
+				rootpath = previous[:i + 1]
+
+				# Hide the links that are part of the previous shortest paths which share the same root path.
+				hidden_edges = []
+				for p in A:
+					if len(p) > i + 1 and p[:i + 1] == rootpath:
+						edge_id = graph.find_edge(p[i], p[i + 1])
+						edge_mask[edge_id] = 1
+						hidden_edges.append(edge_id)
+				# Hide the root path, except the spur node itself.
+				for node in rootpath[:-1]:
+					node_mask[node] = 1
 
 				# Calculate the spur path from the spur node to the sink.
-				spurpath = self.construct_path(spurnode, sink)
-				# Entire path is made up of the root path and spur path.
-				totalpath = rootpath + spurpath
-				# Add the potential k-shortest path to the heap.
-				# ALSO: CHECK IF IT IS ACTUALLY A PATH
-				if totalpath not in B and len(totalpath) > 1 and (totalpath[0] == source and totalpath[-1] == sink):
-					B.append(totalpath)
-
-				# re-add nodes and edges that were removed here.
-				for node in removedNodes:
-					if node.type == "server":
-						self.topology.servers.append(node)
-					else:
-						self.topology.switches.append(node)
-				removedNodes.clear() # Clear the list after restoring the nodes
-				for edge in removedEdges:
-					# restore edges here, then all nodes are "restored" as well!
-					edge[0].add_edge(edge[1])
-				removedEdges.clear() # Clear the list after restoring the edges
-
-
-			if len(B) == 0:
-				# This handles the case of there being no spur paths, or no spur paths left.
-				# This could happen if the spur paths have already been exhausted (added to A), 
-				# or there are no spur paths at all - such as when both the source and sink vertices 
-				# lie along a "dead end".
+				self.shortest_paths(spurnode, dst, dist=dist, prev=prev, node_mask=node_mask, edge_mask=edge_mask)
+				if dist[dst] >= 0:
+					# Entire path is made up of the root path and spur path.
+					totalpath = rootpath[:-1] + self._walk_back(prev, spurnode, dst)
+					key = tuple(totalpath)
+					if key not in seen:
+						seen.add(key)
+						heapq.heappush(B, (len(totalpath), counter, totalpath))
+						counter += 1
+
+				for edge_id in hidden_edges:
+					edge_mask[edge_id] = 0
+				for node in rootpath[:-1]:
+					node_mask[node] = 0
+
+			if not B:
+				# No spur paths (left), e.g. when all of them have already been added to A.
 				break
-			
-			# Sort the potential k-shortest paths by cost. <<< Wikipedia?!? B is a set, remember? 
-			B.sort(key=len)
-			# Add the lowest cost path becomes the k-shortest path.
-			if len(B[0]) == len(A[k-1]):
-				A[k] = B[0]
-			else:
-				A.sort(key=len)
-				A = [x for x in A if x]
-				return A
-			# In fact we should rather use shift since we are removing the first element
-			B = B[1:]
-		A.sort(key=len) # make sure that it is 100% sorted correctly by length
-		return A
-
-
-	# Yen's algorithm computes k paths between source and sink and returns an ordered list of these paths,
-	# starting with the shortest
-	# Pseudocode on https://en.wikipedia.org/wiki/Yen%27s_algorithm
-	def k_shortest_paths(self, source, sink, K):
-		A = []
-		#Initialize list of lists
-		for i in range(0, K):
-			A.append([])
-		
-		# Determine the shortest path from the source to the sink. 
-		A[0] = self.construct_path(source, sink) 
+			length, _, path = heapq.heappop(B)
+			if equal_cost and length > len(first):
+				break
+			A.append(path)
+			yield path
+
+	# shortest_path_dag runs one BFS from src and returns its ShortestPathDAG, which serves ECMP queries
+	# from src to every destination.
+	# The DAG is only valid until the graph changes.
+	def shortest_path_dag(self, src):
+		return ShortestPathDAG(self.graph, src, self.distances(src))
+
+	# ecmp_paths returns up to n equal-cost shortest paths from src to dst as lists of node ids,
+	# enumerated from the shortest path DAG, or sampled uniformly at random if sample is set.
+	def ecmp_paths(self, src, dst, n, sample=False, dag=None):
+		if dag is None:
+			dag = self.shortest_path_dag(src)
+		if sample:
+			return dag.sample(dst, n)
+		return list(dag.paths(dst, n))
+
+	# n_way_ecmp returns up to n equal-cost shortest paths between source and sink as lists of nodes.
+	def n_way_ecmp(self, source, sink, n):
+		nodes = self.graph.nodes
+		return [[nodes[v] for v in path] for path in self.ecmp_paths(source.index, sink.index, n)]
 
-		# Initialize the set to store the potential kth shortest path. <<< This is a list rather than a set, wikipedia
-		B = []
-		
-		removedEdges = [] # This list will store tuples of Nodes
-		removedNodes = []
-		for k in range(1, K):
-			# print("k:", k)
-			# The spur node ranges from the first node to the next to last node in the previous k-shortest path.
-			for i in range(0, len(A[k-1]) - 2):
-				# Spur node is retrieved from the previous k-shortest path, k − 1.
-				spurnode = A[k-1][i] # Get ith node in path
-
-				# The sequence of nodes from the source to the spur node of the previous k-shortest path.
-				rootpath = A[k-1][0:i]
-				for p in A: # for each path p in A 
-					if len(p) == 0:
-						continue
-					if rootpath == p[0:i]:
-						# Remove the links that are part of the previous shortest paths which share the same root path.
-						# Here, get the edge that connects node i and node i + 1 from the path p and remove it from the graph
-						# pseudocode: remove p.edge(i, i + 1) from Graph;
-						if len(p) < i + 2:
-							continue
-						current = p[i]
-						other = p[i+1]
-						for edge in current.edges:
-							if edge.lnode == other or edge.rnode == other:
-								removedEdges.append((current, other)) # Save to be restored later
-								edge.remove()
-								break
-						
-				for node in rootpath:
-
-					if node == spurnode:
+	# Yen's algorithm computes k paths between source and sink and returns an ordered list of these paths
+	# (lists of nodes), starting with the shortest
+	def k_shortest_paths(self, source, sink, K):
+		nodes = self.graph.nodes
+		return [[nodes[v] for v in path] for path in self.yen_paths(source.index, sink.index, K)]
+
+	# link_load routes every (src, dst) pair of node ids in pairs (e.g. a permutation traffic matrix) with each
+	# of the given routing schemes, a list of (RoutingScheme, n) tuples for k-shortest paths or n-way ECMP.
+	# For every scheme it returns an integer array indexed by directed link id (see Graph.directed_link) with
+	# the number of paths on that link. Paths are never collected: ECMP link counts come straight from path
+	# counting on the shortest path DAG when all equal-cost paths are used, otherwise paths are streamed from
+	# the DAG or from Yen's algorithm and counted one by one. All ECMP schemes share one DAG per pair.
+	def link_load(self, pairs, schemes):
+		graph = self.graph
+		loads = [array('q', [0]) * (2 * graph.edge_capacity) for _ in schemes]
+		needs_dag = any(scheme == RoutingScheme.ECMP for scheme, _ in schemes)
+
+		for src, dst in pairs:
+			dag = self.shortest_path_dag(src) if needs_dag else None
+			for (scheme, n), load in zip(schemes, loads):
+				if scheme == RoutingScheme.K_SHORTEST:
+					for path in self.yen_paths(src, dst, n):
+						self._add_path_load(path, load)
+				elif dag.num_paths[dst] <= n:
+					self._add_dag_load(dag, dst, load)
+				else:
+					for path in dag.paths(dst, n):
+						self._add_path_load(path, load)
+		return loads
+
+	def _add_path_load(self, path, load):
+		graph = self.graph
+		for u, v in zip(path, path[1:]):
+			load[graph.directed_link(graph.find_edge(u, v), u)] += 1
+
+	# _add_dag_load adds all shortest paths from dag.src to dst at once: the directed link u -> v of the DAG
+	# is on (paths from src to u) * (paths from v to dst) of them. The paths to dst are counted backwards from
+	# dst, level by level, so only the part of the DAG that leads to dst is visited.
+	def _add_dag_load(self, dag, dst, load):
+		graph = self.graph
+		offsets = graph.offsets
+		neighbors = graph.neighbors
+		edge_ids = graph.edge_ids
+		dist = dag.dist
+		num_paths = dag.num_paths
+
+		to_dst = {dst: 1}
+		level = [dst]
+		while level and dist[level[0]] > 0:
+			previous_level = []
+			for v in level:
+				d = dist[v] - 1
+				for i in range(offsets[v], offsets[v + 1]):
+					u = neighbors[i]
+					if dist[u] != d:
 						continue
-					# remove node from graph
-					# This is hard with the implementation that is given.
-					# A node can be removed from a graph by breaking all the edges that attach to that specific node.
-					# Then, it must be removed from the server/switch list as well!
-					for edge in node.edges:
-						if node not in removedNodes:
-							removedNodes.append(node)
-						removedEdges.append((edge.lnode, edge.rnode))# Save to be restored later
-						edge.remove()
-
-					# if all edges are disbanded, remove the nodes
-					if node.type == "server":
-						self.topology.servers.remove(node)
-					if node.type == "switch":
-						self.topology.switches.remove(node)
-
-				# Calculate the spur path from the spur node to the sink.
-				spurpath = self.construct_path(spurnode, sink)
-				# Entire path is made up of the root path and spur path.
-				totalpath = rootpath + spurpath
-				# Add the potential k-shortest path to the heap.
-				# ALSO: CHECK IF IT IS ACTUALLY A PATH
-				if totalpath not in B and len(totalpath) > 1 and (totalpath[0] == source and totalpath[-1] == sink):
-					B.append(totalpath)
-
-				# re-add nodes and edges that were removed here.
-				for node in removedNodes:
-					if node.type == "server":
-						self.topology.servers.append(node)
-					else:
-						self.topology.switches.append(node)
-				removedNodes.clear() # Clear the list after restoring the nodes
-				for edge in removedEdges:
-					# restore edges here, then all nodes are "restored" as well!
-					edge[0].add_edge(edge[1])
-				removedEdges.clear() # Clear the list after restoring the edges
-
-
-			if len(B) == 0:
-				# This handles the case of there being no spur paths, or no spur paths left.
-				# This could happen if the spur paths have already been exhausted (added to A), 
-				# or there are no spur paths at all - such as when both the source and sink vertices 
-				# lie along a "dead end".
-				break
-			
-			# Sort the potential k-shortest paths by cost. <<< Wikipedia?!? B is a set, remember? 
-			B.sort(key=len)
-			# Add the lowest cost path becomes the k-shortest path.
-			A[k] = B[0]
-			# In fact we should rather use shift since we are removing the first element
-			B = B[1:]
-		A.sort(key=len) # make sure that it is 100% sorted correctly by length
-		return A
+					load[graph.directed_link(edge_ids[i], u)] += num_paths[u] * to_dst[v]
+					if u not in to_dst:
+						to_dst[u] = 0
+						previous_level.append(u)
+					to_dst[u] += to_dst[v]
+			level = previous_level
+
+	# link_ranks returns the loads of all directed switch-to-switch links in increasing order,
+	# i.e. indexed by the rank of the link.
+	def link_ranks(self, load):
+		graph = self.graph
+		switch = NodeType.SWITCH.value
+		ranks = []
+		for edge_id in range(graph.edge_capacity):
+			if not graph.alive[edge_id]:
+				continue
+			if graph.node_types[graph.edge_src[edge_id]] != switch or graph.node_types[graph.edge_dst[edge_id]] != switch:
+				continue
+			ranks.append(load[2 * edge_id])
+			ranks.append(load[2 * edge_id + 1])
+		ranks.sort()
+		return ranks
 
 class Jellyfish:
 
 	def __init__(self, num_servers, num_switches, num_ports):
+		self.graph = Graph()
 		self.servers = []
 		self.switches = []
 		self.generate(num_servers, num_switches, num_ports)
@@ -446,103 +924,212 @@ class Jellyfish:
 		# For the fat-tree topology, every switch in the edge-layer is connected to num_ports/2 servers
 
 		############################## initialize servers and switches ##############################
-		server_to_connect = []
-		switches_to_connect = []
-		for i in range(num_switches):
-			self.switches.append(Node(i, "switch"))
-			switches_to_connect.append(self.switches[i])
-
+		# Connect all servers to a switch round-robin, such that every switch connects to (roughly) the same number of servers
+		free_ports = [num_ports] * num_switches
 		for i in range(num_servers):
-			self.servers.append(Node(i + len(self.switches), "server"))
-			server_to_connect.append(self.servers[i])
+			free_ports[i % num_switches] -= 1
 
-		# Connect all servers to a switch, such that every switch connects to (roughly) the same number of servers
-		while len(server_to_connect) != 0:
-			for switch in self.switches:
-				if len(server_to_connect) == 0:
-					break
-				server_to_connect[0].add_edge(switch) # add a server to a switch
-				server_to_connect = server_to_connect[1:] # remove the server that just got connected from the todo list.
-				
-		
 		############################### connect all switches randomly ###############################
-
-		# loop through all switches, connect switch i with a random other switch on position i + r, where r is a random number.
-		for i in range(len(self.switches)-2):
-			for _ in range(0, num_ports-len(self.switches[i].edges)):
-				looped = False
-				other = random.randint(i + 1, len(self.switches)-1)
-				while len(self.switches[other].edges) >= num_ports or self.switches[i].is_neighbor(self.switches[other]): # Choose new random switch until one is found that has port and is not neighbor
-					other += 1
-					if other >= len(self.switches):
-						if looped:
-							break
-						looped = True
-						other = i + 1
-				if other < len(self.switches):
-					self.switches[i].add_edge(self.switches[other])
-		
-
-		for i in range(len(self.switches)):
-			while num_ports - len(self.switches[i].edges) >= 2:
-				other_a = self.switches[random.randint(0, len(self.switches)-1)]
-				while self.switches[i].is_neighbor(other_a):
-					other_a = self.switches[random.randint(0, len(self.switches)-1)]
-				# Now, we have found a node a that is not the neighbor
-				break_edge = None
-				for edge in other_a.edges:
-					other_b = edge.lnode if edge.lnode != other_a else edge.rnode
-					if other_b.type == "server":
-						continue
-					if self.switches[i].is_neighbor(other_b):
-						continue
-					break_edge = edge
+		# Retry until the graph is a single connected component
+		while True:
+			links = self._random_links(free_ports)
+
+			# Build the graph: switches get node ids 0 .. num_switches - 1 and servers the ids after that
+			self.graph = Graph()
+			self.servers = []
+			self.switches = []
+			for i in range(num_switches):
+				self.switches.append(Node(i, "switch", self.graph))
+			for i in range(num_servers):
+				self.servers.append(Node(i + num_switches, "server", self.graph))
+				self.graph.add_edge(self.servers[i].index, i % num_switches)
+			for a, b in links:
+				self.graph.add_edge(a, b)
+			if self.graph.is_connected():
+				break
+			print("Generated topology has components, retrying...")
+		self.num_ports = num_ports
+
+	# expand grows the topology by num_new_switches switches with servers_per_switch servers each, following the
+	# paper's incremental expansion: a new switch repeatedly takes a random existing link (x, y), such that x and y
+	# are not its neighbors yet, removes it and links itself to x and y, until it has less than two free ports.
+	# Free ports that are left on existing switches are used first. All other links are kept, and every change goes
+	# through the graph, so Paths objects on this topology update their cached distances instead of starting over.
+	# A new switch is linked into the fabric before its servers are attached.
+	def expand(self, num_new_switches, servers_per_switch):
+		graph = self.graph
+		switch_type = NodeType.SWITCH.value
+
+		# Switch-to-switch links as a list of edge ids with their positions, to pick and remove a random one in O(1)
+		links = []
+		for edge_id in range(graph.edge_capacity):
+			src, dst = graph.endpoints(edge_id)
+			if graph.alive[edge_id] and graph.node_types[src] == switch_type and graph.node_types[dst] == switch_type:
+				links.append(edge_id)
+		position = {edge_id: i for i, edge_id in enumerate(links)}
+		# Switches with free ports, and how many
+		free_ports = {}
+		for switch in self.switches:
+			if graph.degree(switch.index) < self.num_ports:
+				free_ports[switch.index] = self.num_ports - graph.degree(switch.index)
+
+		def add_link(a, b):
+			edge_id = graph.add_edge(a, b)
+			position[edge_id] = len(links)
+			links.append(edge_id)
+
+		def remove_link(edge_id):
+			i = position.pop(edge_id)
+			last = links.pop()
+			if last != edge_id:
+				links[i] = last
+				position[last] = i
+			graph.remove_edge(edge_id)
+
+		for _ in range(num_new_switches):
+			new_switch = Node(graph.num_nodes, "switch", graph)
+			self.switches.append(new_switch)
+			s = new_switch.index
+			neighbors = set()
+			free = self.num_ports - servers_per_switch
+
+			for other in list(free_ports):
+				if free == 0:
 					break
-				if not break_edge:
+				add_link(s, other)
+				neighbors.add(other)
+				free -= 1
+				free_ports[other] -= 1
+				if free_ports[other] == 0:
+					del free_ports[other]
+
+			attempts = 0
+			max_attempts = 4 * len(links) + 100
+			while free >= 2 and links and attempts < max_attempts:
+				edge_id = links[random.randrange(len(links))]
+				x, y = graph.endpoints(edge_id)
+				if x in neighbors or y in neighbors:
+					attempts += 1
 					continue
-				break_edge.remove()
-				self.switches[i].add_edge(other_a)
-				self.switches[i].add_edge(other_b)
-		##### check if there are lonely ports and potentially break a link to create two new ones #####
-		lonely_ports = []
-		for switch in self.switches:
-			if len(switch.edges) == num_ports - 1:
-				lonely_ports.append(switch)
+				remove_link(edge_id)
+				add_link(s, x)
+				add_link(s, y)
+				neighbors.update((x, y))
+				free -= 2
+			if free > 0:
+				free_ports[s] = free
+
+			for _ in range(servers_per_switch):
+				server = Node(graph.num_nodes, "server", graph)
+				self.servers.append(server)
+				graph.add_edge(server.index, s)
+
+	# _random_links wires the free switch ports following the paper's procedure and returns the links as (a, b)
+	# switch id pairs with a < b. free_ports[i] is the number of ports of switch i that are not used by servers.
+	# The links are kept in a list with a dict from switch pair to list position, which is both the adjacency
+	# hash set and allows removing a uniformly random link in O(1). Switches with free ports are kept in an
+	# indexable pool in the same way, so the whole procedure runs in near-linear time.
+	def _random_links(self, free_ports):
+		num_switches = len(free_ports)
+		free = list(free_ports)
+		links = []
+		position = {}
+
+		pool = [i for i in range(num_switches) if free[i] > 0]
+		pool_position = [-1] * num_switches
+		for i, switch in enumerate(pool):
+			pool_position[switch] = i
+
+		def pair(a, b):
+			return (a, b) if a < b else (b, a)
+
+		def use_port(switch):
+			free[switch] -= 1
+			if free[switch] == 0:
+				# Swap the switch with the last one in the pool and drop it
+				i = pool_position[switch]
+				last = pool.pop()
+				if last != switch:
+					pool[i] = last
+					pool_position[last] = i
+				pool_position[switch] = -1
+
+		def add_link(a, b):
+			link = pair(a, b)
+			position[link] = len(links)
+			links.append(link)
+			use_port(a)
+			use_port(b)
+
+		def remove_link(link):
+			i = position.pop(link)
+			last = links.pop()
+			if last != link:
+				links[i] = last
+				position[last] = i
+			for switch in link:
+				free[switch] += 1
+				if pool_position[switch] < 0:
+					pool_position[switch] = len(pool)
+					pool.append(switch)
+
+		# "pick a random pair of (switches) with free ports (for the switch-pairs not already neighbors),
+		# join them with a link, and repeat until no further links can be added"
+		failures = 0
+		while len(pool) >= 2:
+			a = pool[random.randrange(len(pool))]
+			b = pool[random.randrange(len(pool))]
+			if a != b and pair(a, b) not in position:
+				add_link(a, b)
+				failures = 0
+				continue
+			failures += 1
+			if failures < 2 * len(pool) + 8:
+				continue
+			# Random picks keep failing, check whether any pair in the (now small) pool can still be linked
+			candidates = [(a, b) for a in pool for b in pool if a < b and (a, b) not in position]
+			if not candidates:
+				break
+			add_link(*random.choice(candidates))
+			failures = 0
+
+		# "If a switch remains with >= 2 free ports (p1, p2), ... remove a uniform-random existing link (x, y),
+		# and add links (p1, x) and (p2, y)"
+		max_attempts = 4 * len(links) + 100
+		for switch in range(num_switches):
+			attempts = 0
+			while free[switch] >= 2 and links and attempts < max_attempts:
+				x, y = links[random.randrange(len(links))]
+				if switch == x or switch == y or pair(switch, x) in position or pair(switch, y) in position:
+					attempts += 1
+					continue
+				remove_link((x, y))
+				add_link(switch, x)
+				add_link(switch, y)
 
+		##### Pair up the switches with a single lonely port, breaking a link if they are already neighbors #####
+		lonely_ports = [i for i in range(num_switches) if free[i] == 1]
+		random.shuffle(lonely_ports)
 		while len(lonely_ports) >= 2:
-			switch_a, switch_b = random.sample(lonely_ports, 2)
-			if not switch_a.is_neighbor(switch_b):
-				switch_a.add_edge(switch_b)
-				lonely_ports.remove(switch_a)
-				lonely_ports.remove(switch_b)
+			switch_a = lonely_ports.pop()
+			switch_b = lonely_ports.pop()
+			if pair(switch_a, switch_b) not in position:
+				add_link(switch_a, switch_b)
 				continue
-			# Get a random switch that has NO connection with switch a or switch b.
-			current = random.choice(self.switches) 
-			while current.is_neighbor(switch_a) or current.is_neighbor(switch_b) or current == switch_a or current == switch_b:
-				current = random.choice(self.switches)
-			
-			for edge in current.edges:
-				other = edge.lnode if current != edge.lnode else edge.rnode
-				if other.type == "server" or other.is_neighbor(switch_a) or other.is_neighbor(switch_b):
+			# Replace a random link (x, y) by (a, x) and (b, y)
+			for _ in range(max_attempts):
+				x, y = links[random.randrange(len(links))]
+				if random.random() < 0.5:
+					x, y = y, x
+				if x in (switch_a, switch_b) or y in (switch_a, switch_b):
 					continue
-				# break edge, add current to switch a, other to switch b
-				edge.remove()
-				current.add_edge(switch_a)
-				other.add_edge(switch_b)
-
-				lonely_ports.remove(switch_a)
-				lonely_ports.remove(switch_b)
+				if pair(switch_a, x) in position or pair(switch_b, y) in position:
+					continue
+				remove_link(pair(x, y))
+				add_link(switch_a, x)
+				add_link(switch_b, y)
 				break
-
-		######### Perform a sanity check to see if graph is fully connected. If not-> retry #########
-		pt = Paths(self)
-		source = self.servers[0]
-		for server in self.servers:
-			if server == source:
-				continue
-			if not pt.is_path(source, server):
-				print("Generated topology has components, retrying...")
-				self.generate(num_servers, num_switches, num_ports)
+		return links
 
 
 class Fattree:
@@ -585,6 +1172,7 @@ class Fattree:
         if (num_ports % 2 != 0 or not (num_ports >= 2) ):
             raise ValueError("num_ports should be an even number starting from 2")
         self.num_ports = num_ports
+        self.graph = Graph()
         self.servers: list[FattreeNode] = []
         self.switches: list[FattreeNode] = []
         
@@ -602,12 +1190,12 @@ class Fattree:
             edge_switches: list[FattreeNode] = []
             for switch_id in range(int(k/2)):
                 # Create aggr and edge switches per pod
-                aggr_switch = FattreeNode(f"10.{pod_number}.{int(switch_id + k/2)}.1", NodeType.SWITCH, FattreeType.AGGREGATE_SWITCH)
-                edge_switch = FattreeNode(f"10.{pod_number}.{switch_id}.1", NodeType.SWITCH, FattreeType.EDGE_SWITCH)
+                aggr_switch = FattreeNode(f"10.{pod_number}.{int(switch_id + k/2)}.1", NodeType.SWITCH, FattreeType.AGGREGATE_SWITCH, self.graph)
+                edge_switch = FattreeNode(f"10.{pod_number}.{switch_id}.1", NodeType.SWITCH, FattreeType.EDGE_SWITCH, self.graph)
                 for host_id in range(int(k/2)):
                     # Connect edge switches to hosts/servers
-                    server = FattreeNode(f"10.{pod_number}.{switch_id}.{host_id + 2}", NodeType.SERVER, FattreeType.HOST)
-                    edge_switch.add_edge(server)
+                    server = FattreeNode(f"10.{pod_number}.{switch_id}.{host_id + 2}", NodeType.SERVER, FattreeType.HOST, self.graph)
+                    self.graph.add_edge(edge_switch.index, server.index)
                     self.servers.append(server)
                 aggr_switches.append(aggr_switch)
                 edge_switches.append(edge_switch)
@@ -617,7 +1205,7 @@ class Fattree:
             # Add edges between switches in pod (fully connected)
             for aggr_switch in aggr_switches:
                 for edge_switch in edge_switches:
-                    aggr_switch.add_edge(edge_switch)
+                    self.graph.add_edge(aggr_switch.index, edge_switch.index)
             
             pod = self.Pod(aggr_switches, edge_switches)
             self.pods.append(pod)
@@ -625,7 +1213,7 @@ class Fattree:
         # Create core switches
         for host_id in range(int(k/2)):
             for switch_id in range(int(k/2)):
-                core_switch = FattreeNode(f"10.{k}.{host_id + 1}.{switch_id + 1}", NodeType.SWITCH, FattreeType.CORE_SWITCH)
+                core_switch = FattreeNode(f"10.{k}.{host_id + 1}.{switch_id + 1}", NodeType.SWITCH, FattreeType.CORE_SWITCH, self.graph)
                 self.core_switches.append(core_switch)
                 self.switches.append(core_switch)
 
@@ -638,7 +1226,7 @@ class Fattree:
             core_index = 0
             for aggr_sw in pod.aggr_switches:
                 for _ in range(int(self.num_ports/2)):
-                    self.core_switches[core_index].add_edge(aggr_sw)
+                    self.graph.add_edge(self.core_switches[core_index].index, aggr_sw.index)
                     core_index += 1
 
         # self._verify()
@@ -649,6 +1237,7 @@ class Fattree:
         """
         assert len(self.core_switches) == int(pow((self.num_ports / 2), 2))
         assert len(self.pods) == self.num_ports
+        assert self.graph.is_connected()
         
         for pod in self.pods:
             print(pod)
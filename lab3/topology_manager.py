@@ -0,0 +1,156 @@
+from typing import Dict, List, Set
+
+import topo
+from kruskal import SpanningTree
+
+
+class TopologyManager:
+    """The switches and links found by topology discovery, kept up to date
+    from the individual switch and link events instead of re-reading the
+    whole topology on every event.
+
+    Events are queued with switch_enter, switch_leave, link_add and
+    link_delete and applied together by flush, so a burst of events (e.g.
+    while a large fabric comes up) is handled in one go. Applying an event
+    costs O(1) amortized, apart from removing a link of the spanning tree.
+
+    Links are (src_dpid, dst_dpid, port on src_dpid) as reported by Ryu, once
+    per direction; the graph has one link per switch pair, as long as either
+    direction is reported. Alongside the graph a SpanningTree is maintained
+    for flooding (see kruskal).
+    """
+    def __init__(self) -> None:
+        self.graph = topo.Graph()
+        # Node id in the graph of every dpid ever seen, and the other way around
+        self.index: Dict[int, int] = {}
+        self.dpids: List[int] = []
+        # Ports of the switches that are currently connected, per dpid
+        self.switch_ports: Dict[int, Set[int]] = {}
+        # (src_dpid, dst_dpid) -> port on src_dpid
+        self.links: Dict[tuple, int] = {}
+        # Edge id in the graph of every linked switch pair, keyed by (min node id, max node id)
+        self._edges: Dict[tuple, int] = {}
+        # Ports that are or were part of a link, per dpid. The others lead to hosts.
+        self.linked_ports: Dict[int, Set[int]] = {}
+        # Neighbors in the graph, per node id. The graph answers connectivity,
+        # these sets stay O(degree) to walk between compactions.
+        self.adjacency: List[Set[int]] = []
+        self.spanning_tree = SpanningTree()
+        # The links changed by the last flush, per direction, as (src_dpid, dst_dpid, port on
+        # src_dpid or None if deleted), e.g. for NextHopTable.apply
+        self.link_changes: List[tuple] = []
+        self._pending = []
+
+    def switch_enter(self, dpid: int, ports) -> None:
+        self._pending.append((self._switch_enter, dpid, set(ports)))
+
+    def switch_leave(self, dpid: int) -> None:
+        self._pending.append((self._switch_leave, dpid))
+
+    def link_add(self, src_dpid: int, dst_dpid: int, port: int) -> None:
+        self._pending.append((self._link_add, src_dpid, dst_dpid, port))
+
+    def link_delete(self, src_dpid: int, dst_dpid: int) -> None:
+        self._pending.append((self._link_delete, src_dpid, dst_dpid))
+
+    @property
+    def has_pending(self) -> bool:
+        return bool(self._pending)
+
+    def flush(self) -> bool:
+        """Apply the queued events, in order.
+
+        Returns:
+            bool: whether the switches or links changed
+        """
+        pending, self._pending = self._pending, []
+        self.link_changes = []
+        changed = False
+        for apply, *args in pending:
+            changed |= apply(*args)
+        return changed
+
+    @property
+    def switches(self) -> List[int]:
+        """dpids of the connected switches."""
+        return list(self.switch_ports)
+
+    def link_list(self) -> list:
+        """The links as (src_dpid, dst_dpid, {'port': port on src_dpid}), like SPRouter builds them."""
+        return [(src, dst, {'port': port}) for (src, dst), port in self.links.items()]
+
+    def num_ports(self) -> int:
+        """Largest number of ports of a connected switch."""
+        return max((len(ports) for ports in self.switch_ports.values()), default=0)
+
+    def is_connected(self) -> bool:
+        """Whether every connected switch can reach every other one."""
+        components = self.graph.components
+        return len({components.find(self.index[dpid]) for dpid in self.switch_ports}) <= 1
+
+    def flood_ports(self, dpid: int) -> Set[int]:
+        """Ports of the switch on the spanning tree, plus the ports to hosts."""
+        u = self.index[dpid]
+        ports = set()
+        for v in self.spanning_tree.tree[u]:
+            port = self.links.get((dpid, self.dpids[v]))
+            if port is not None:
+                ports.add(port)
+        return ports | (self.switch_ports.get(dpid, set()) - self.linked_ports[dpid])
+
+    def _node(self, dpid: int) -> int:
+        u = self.index.get(dpid)
+        if u is None:
+            u = self.graph.add_node(topo.NodeType.SWITCH.value)
+            self.index[dpid] = u
+            self.dpids.append(dpid)
+            self.linked_ports[dpid] = set()
+            self.adjacency.append(set())
+            self.spanning_tree.add_node()
+        return u
+
+    def _switch_enter(self, dpid: int, ports: Set[int]) -> bool:
+        self._node(dpid)
+        changed = self.switch_ports.get(dpid) != ports
+        self.switch_ports[dpid] = ports
+        return changed
+
+    def _switch_leave(self, dpid: int) -> bool:
+        if self.switch_ports.pop(dpid, None) is None:
+            return False
+        u = self.index[dpid]
+        for v in list(self.adjacency[u]):
+            self._link_delete(dpid, self.dpids[v])
+            self._link_delete(self.dpids[v], dpid)
+        return True
+
+    def _link_add(self, src_dpid: int, dst_dpid: int, port: int) -> bool:
+        u = self._node(src_dpid)
+        v = self._node(dst_dpid)
+        if self.links.get((src_dpid, dst_dpid)) == port:
+            return False
+        self.links[(src_dpid, dst_dpid)] = port
+        self.link_changes.append((src_dpid, dst_dpid, port))
+        self.linked_ports[src_dpid].add(port)
+        pair = (min(u, v), max(u, v))
+        if pair not in self._edges:
+            self.spanning_tree.add_link(u, v)
+            self._edges[pair] = self.graph.add_edge(u, v)
+            self.adjacency[u].add(v)
+            self.adjacency[v].add(u)
+        return True
+
+    def _link_delete(self, src_dpid: int, dst_dpid: int) -> bool:
+        if self.links.pop((src_dpid, dst_dpid), None) is None:
+            return False
+        self.link_changes.append((src_dpid, dst_dpid, None))
+        if (dst_dpid, src_dpid) in self.links:
+            # Still reported the other way around
+            return True
+        u = self.index[src_dpid]
+        v = self.index[dst_dpid]
+        self.graph.remove_edge(self._edges.pop((min(u, v), max(u, v))))
+        self.adjacency[u].discard(v)
+        self.adjacency[v].discard(u)
+        self.spanning_tree.remove_link(u, v, self.adjacency)
+        return True